@@ -1,9 +1,9 @@
 from datetime import date
 from prefect import task
-import uuid
 from ...models.config import Config
-from ...models.csv_file import CSVFile
-from ...utils.db import insert_into
+from ...models.row_buffer import RowBuffer
+from ...models.table_spec import TableSpec
+from ...utils.loader import load_tables
 
 class CollectionConfig(Config):
 	def __init__(self, date: date):
@@ -29,10 +29,12 @@ class CollectionConfig(Config):
 		self.collection_translation_on_conflict: list[str] = ["collection_id", "iso_639_1", "iso_3166_1"]
 		self.collection_image_on_conflict: list[str] = ["collection_id", "file_path", "type"]
 
-		# On conflict update
-		self.collection_on_conflict_update: list[str] = [col for col in self.collection_columns if col not in self.collection_on_conflict]
-		self.collection_translation_on_conflict_update: list[str] = [col for col in self.collection_translation_columns if col not in self.collection_translation_on_conflict]
-		self.collection_image_on_conflict_update: list[str] = [col for col in self.collection_image_columns if col not in self.collection_image_on_conflict]
+		# Tables, in load order
+		self.tables: list[TableSpec] = [
+			TableSpec("collection", self.table_collection, self.collection_columns, self.collection_on_conflict, upsert=True),
+			TableSpec("collection_translation", self.table_collection_translation, self.collection_translation_columns, self.collection_translation_on_conflict, upsert=True, parent="collection", parent_key="collection_id", delete=TableSpec.PRUNE),
+			TableSpec("collection_image", self.table_collection_image, self.collection_image_columns, self.collection_image_on_conflict, upsert=True, parent="collection", parent_key="collection_id", delete=TableSpec.PRUNE),
+		]
 
 	@task(cache_policy=None)
 	def prune(self):
@@ -45,6 +47,7 @@ class CollectionConfig(Config):
 						conn.autocommit = False
 						cursor.execute(f"DELETE FROM {self.table_collection} WHERE id IN %s", (tuple(self.extra_collections),))
 						conn.commit()
+						self.reference_ids.discard(self.table_collection, self.extra_collections)
 					except:
 						conn.rollback()
 						raise
@@ -56,100 +59,10 @@ class CollectionConfig(Config):
 			self.db_client.return_connection(conn)
 	
 	@task(cache_policy=None)
-	def push(self, collection_csv: CSVFile, collection_translation_csv: CSVFile, collection_image_csv: CSVFile):
+	def push(self, rows: dict[str, RowBuffer]):
 		"""Push the collections to the database"""
-		conn = self.db_client.get_connection()
 		try:
-			# Clean duplicates from the CSV files
-			collection_csv.clean_duplicates(conflict_columns=self.collection_on_conflict)
-			collection_translation_csv.clean_duplicates(conflict_columns=self.collection_translation_on_conflict)
-			collection_image_csv.clean_duplicates(conflict_columns=self.collection_image_on_conflict)
-
-			with conn.cursor() as cursor:
-				try:
-					conn.autocommit = False
-					temp_collection = f"{self.table_collection.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-					temp_collection_translation = f"{self.table_collection_translation.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-					temp_collection_image = f"{self.table_collection_image.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-
-					cursor.execute(f"""
-						CREATE TEMP TABLE {temp_collection} (LIKE {self.table_collection} INCLUDING ALL);
-						CREATE TEMP TABLE {temp_collection_translation} (LIKE {self.table_collection_translation} INCLUDING ALL);
-						CREATE TEMP TABLE {temp_collection_image} (LIKE {self.table_collection_image} INCLUDING ALL);
-					""")
-
-					with open(collection_csv.file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_collection} ({','.join(self.collection_columns)}) FROM STDIN WITH CSV HEADER", f)
-					with open(collection_translation_csv.file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_collection_translation} ({','.join(self.collection_translation_columns)}) FROM STDIN WITH CSV HEADER", f)
-					with open(collection_image_csv.file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_collection_image} ({','.join(self.collection_image_columns)}) FROM STDIN WITH CSV HEADER", f)
-
-					# Insert collections
-					insert_into(
-						cursor=cursor,
-						table=self.table_collection,
-						temp_table=temp_collection,
-						columns=self.collection_columns,
-						on_conflict=self.collection_on_conflict,
-						on_conflict_update=self.collection_on_conflict_update
-					)
-
-					# Insert translations
-					insert_into(
-						cursor=cursor,
-						table=self.table_collection_translation,
-						temp_table=temp_collection_translation,
-						columns=self.collection_translation_columns,
-						on_conflict=self.collection_translation_on_conflict,
-						on_conflict_update=self.collection_translation_on_conflict_update
-					)
-
-					# Insert images
-					insert_into(
-						cursor=cursor,
-						table=self.table_collection_image,
-						temp_table=temp_collection_image,
-						columns=self.collection_image_columns,
-						on_conflict=self.collection_image_on_conflict,
-						on_conflict_update=self.collection_image_on_conflict_update
-					)
-
-					# Delete outdated translations
-					cursor.execute(f"""
-						DELETE FROM {self.table_collection_translation}
-						WHERE ({', '.join(self.collection_translation_on_conflict)}) NOT IN (
-							SELECT {', '.join(self.collection_translation_on_conflict)}
-							FROM {temp_collection_translation}
-						)
-						AND collection_id IN (
-							SELECT id FROM {temp_collection}
-						);
-					""")
-
-					# Delete outdated images
-					cursor.execute(f"""
-						DELETE FROM {self.table_collection_image}
-						WHERE ({', '.join(self.collection_image_on_conflict)}) NOT IN (
-							SELECT {', '.join(self.collection_image_on_conflict)}
-							FROM {temp_collection_image}
-						)
-						AND collection_id IN (
-							SELECT id FROM {temp_collection}
-						);
-					""")
-					
-					conn.commit()
-
-					collection_csv.delete()
-					collection_translation_csv.delete()
-					collection_image_csv.delete()
-				except Exception as e:
-					conn.rollback()
-					raise
-				finally:
-					conn.autocommit = True
+			load_tables(self.db_client, self.tables, rows, parallelism=self.load_parallelism, mode=self.load_merge_mode)
+			self.reference_ids.add(self.table_collection, rows["collection"].column("id"))
 		except Exception as e:
 			raise ValueError(f"Failed to push collections to the database: {e}")
-		finally:
-			self.db_client.return_connection(conn)
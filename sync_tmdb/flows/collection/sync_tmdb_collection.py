@@ -3,7 +3,7 @@
 # ---------------------------------------------------------------------------- #
 
 from datetime import date
-from more_itertools import chunked
+from functools import partial
 import gc
 
 # ---------------------------------- Prefect --------------------------------- #
@@ -12,7 +12,11 @@ from prefect.logging import get_run_logger
 
 from .config import CollectionConfig
 from .mapper import Mapper
-from ...models.csv_file import CSVFile
+from ...models.row_buffer import RowBuffer
+from ...models.tmdb_fetcher import TMDBNotFoundError
+from ...models.tmdb_request_plan import TMDBRequestPlan
+from ...utils.loader import new_buffers
+from ...utils.retry import process_with_retry_pass
 
 # ---------------------------------------------------------------------------- #
 
@@ -20,69 +24,80 @@ from ...models.csv_file import CSVFile
 #                                    Getters                                   #
 # ---------------------------------------------------------------------------- #
 
-def get_db_collections(config: CollectionConfig) -> set:
-	conn = config.db_client.get_connection()
+async def get_tmdb_collection_details(config: CollectionConfig, collection_id: int) -> dict:
 	try:
-		with conn.cursor() as cursor:
-			cursor.execute(f"SELECT id FROM {config.table_collection}")
-			return {item[0] for item in cursor}
-	except Exception as e:
-		raise ValueError(f"Failed to get database collections: {e}")
-	finally:
-		config.db_client.return_connection(conn)
-
-@task(cache_policy=None, log_prints=False)
-def get_tmdb_collection_details(config: CollectionConfig, collection_id: int) -> dict:
-	try:
-		collection_details = config.tmdb_client.request(f"collection/{collection_id}")
-		collection_translations = config.tmdb_client.request(f"collection/{collection_id}/translations")
-		collection_images = config.tmdb_client.request(f"collection/{collection_id}/images")
+		plan = TMDBRequestPlan(
+			f"collection/{collection_id}",
+			appends=["translations", "images"],
+			image_languages=config.tmdb_client.image_languages,
+		)
+		collection_details = await plan.fetch(config.tmdb_client.fetcher)
+		# The appended responses have no id, unlike the translations and images endpoints read by the mappers
+		collection_translations = {**collection_details.pop("translations", {}), "id": collection_details["id"]}
+		collection_images = {**collection_details.pop("images", {}), "id": collection_details["id"]}
 
 		return {
 			"details": collection_details,
 			"translations": collection_translations,
 			"images": collection_images
 		}
-	except Exception as e:
-		config.logger.error(f"Failed to get collection details for {collection_id}: {e}")
+	except TMDBNotFoundError:
+		# Deleted from TMDB since the export was generated
+		config.logger.warning(f"Collection {collection_id} not found on TMDB")
 		return None
 
 # ---------------------------------------------------------------------------- #
 	
+@task(cache_policy=None)
+def fetch_collections_chunk(config: CollectionConfig, chunk: list) -> dict:
+	"""
+	Fetch and map a chunk of collections (first stage of the pipeline).
+	One Prefect task covers the whole chunk, the ids are fetched by the TMDB fetch engine.
+	The batch keeps the ids of the collections that could not be fetched.
+	"""
+	failed: set = set()
+	rows: dict[str, RowBuffer] = new_buffers(config.tables)
+
+	for collection_id, collection_data in config.tmdb_client.fetch_many(partial(get_tmdb_collection_details, config), chunk):
+		if isinstance(collection_data, Exception):
+			config.logger.error(f"Failed to get collection details for {collection_id}: {collection_data}")
+			failed.add(collection_id)
+			continue
+		if collection_data is not None:
+			rows["collection"].extend(Mapper.collection(collection=collection_data["details"]))
+			rows["collection_translation"].extend(Mapper.collection_translation(collection_data["translations"]))
+			rows["collection_image"].extend(Mapper.collection_image(collection=collection_data["images"]))
+
+	config.logger.info(f"Fetched {len(chunk) - len(failed)}/{len(chunk)} collections ({len(failed)} failed)")
+	return {
+		"rows": rows,
+		"failed": failed,
+	}
+
+def push_collections_chunk(config: CollectionConfig, batch: dict) -> set:
+	"""
+	Push a batch of collections to the database.
+	Returns the ids of the collections that could not be fetched.
+	"""
+	config.logger.info(f"Pushing collections to the database...")
+	push_future = config.push.submit(rows=batch["rows"])
+	push_future.result(raise_on_failure=True)
+	config.logger.info(f"Succesfully submitted collections to the database")
+	return batch["failed"]
+
 def process_missing_collections(config: CollectionConfig):
 	try:
 		if len(config.missing_collections) > 0:
-			chunks = list(chunked(config.missing_collections, 100))
-			for chunk in chunks:
-				collection_csv = CSVFile(
-					columns=config.collection_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=config.flow_name
-				)
-				collection_translation_csv = CSVFile(
-					columns=config.collection_translation_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_translation"
-				)
-				collection_image_csv = CSVFile(
-					columns=config.collection_image_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_image"
-				)
-
-				collections_details_futures = get_tmdb_collection_details.map(config=config, collection_id=chunk)
-
-				for collection_details_response in collections_details_futures:
-					collection_data = collection_details_response.result()
-					if collection_data is not None:
-						collection_csv.append(rows_data=Mapper.collection(collection=collection_data["details"]))
-						collection_translation_csv.append(rows_data=Mapper.collection_translation(collection_data["translations"]))
-						collection_image_csv.append(rows_data=Mapper.collection_image(collection=collection_data["images"]))
-
-				config.logger.info(f"Pushing collections to the database...")
-				push_future = config.push.submit(collection_csv=collection_csv, collection_translation_csv=collection_translation_csv, collection_image_csv=collection_image_csv)
-				push_future.result(raise_on_failure=True)
-				config.logger.info(f"Succesfully submitted collections to the database")
+			process_with_retry_pass(
+				stages=[partial(fetch_collections_chunk, config), partial(push_collections_chunk, config)],
+				ids=config.missing_collections,
+				chunk_size=100,
+				logger=config.logger,
+				name="collections",
+			)
+			config.logger.info(f"TMDB requests: {config.tmdb_client.request_stats()}")
+			config.logger.info(f"TMDB API keys usage: {config.tmdb_client.rate_limit_usage()}")
+			config.logger.info(f"TMDB concurrency limits: {config.tmdb_client.concurrency_limits()}")
 
 	except Exception as e:
 		raise ValueError(f"Failed to process missing collections: {e}")
@@ -100,15 +115,11 @@ def sync_tmdb_collection(date: date = date.today()):
 		# Get the list of collection from TMDB and the database
 		config.log_manager.fetching_data()
 		tmdb_collections_df = config.tmdb_client.get_export_ids(type="collection", date=config.date, columns_to_keep=["id"])
-		tmdb_collections_set = set(tmdb_collections_df["id"])
-		del tmdb_collections_df
-		gc.collect()
-
-		db_collections_set = get_db_collections(config)
 
 		# Compare the collections and process missing collections
-		config.extra_collections = db_collections_set - tmdb_collections_set
-		config.missing_collections = tmdb_collections_set - db_collections_set
+		config.extra_collections, config.missing_collections = config.diff_ids(config.table_collection, tmdb_collections_df["id"].to_numpy())
+		del tmdb_collections_df
+		gc.collect()
 		logger.info(f"Found {len(config.extra_collections)} extra collections and {len(config.missing_collections)} missing collections")
 		config.log_manager.data_fetched()
 
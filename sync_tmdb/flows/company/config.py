@@ -1,9 +1,9 @@
 from datetime import date
 from prefect import task
-import uuid
 from ...models.config import Config
-from ...models.csv_file import CSVFile
-from ...utils.db import insert_into
+from ...models.row_buffer import RowBuffer
+from ...models.table_spec import TableSpec
+from ...utils.loader import load_tables
 
 class CompanyConfig(Config):
 	def __init__(self, date: date):
@@ -29,11 +29,13 @@ class CompanyConfig(Config):
 		self.company_image_on_conflict: list[str] = ["id"]
 		self.company_alternative_name_on_conflict: list[str] = ["company_id", "name"]
 
-		# On conflict update
-		self.company_on_conflict_update: list[str] = [col for col in self.company_columns if col not in self.company_on_conflict]
-		self.company_image_on_conflict_update: list[str] = [col for col in self.company_image_columns if col not in self.company_image_on_conflict]
-		self.company_alternative_name_on_conflict_update: list[str] = [col for col in self.company_alternative_name_columns if col not in self.company_alternative_name_on_conflict]
-	
+		# Tables, in load order
+		self.tables: list[TableSpec] = [
+			TableSpec("company", self.table_company, self.company_columns, self.company_on_conflict, upsert=True),
+			TableSpec("company_image", self.table_company_image, self.company_image_columns, self.company_image_on_conflict, upsert=True, parent="company", parent_key="company_id", delete=TableSpec.PRUNE),
+			TableSpec("company_alternative_name", self.table_company_alternative_name, self.company_alternative_name_columns, self.company_alternative_name_on_conflict, upsert=True, parent="company", parent_key="company_id", delete=TableSpec.PRUNE),
+		]
+
 	@task(cache_policy=None)
 	def prune(self):
 		"""Prune the extra companies from the database"""
@@ -45,6 +47,7 @@ class CompanyConfig(Config):
 					try:
 						cursor.execute(f"DELETE FROM {self.table_company} WHERE id IN %s", (tuple(self.extra_companies),))
 						conn.commit()
+						self.reference_ids.discard(self.table_company, self.extra_companies)
 					except:
 						conn.rollback()
 						raise
@@ -54,99 +57,10 @@ class CompanyConfig(Config):
 			self.db_client.return_connection(conn)
 
 	@task(cache_policy=None)
-	def push(self, company_csv: CSVFile, company_image_csv: CSVFile, company_alternative_name_csv: CSVFile):
+	def push(self, rows: dict[str, RowBuffer]):
 		"""Push the companies to the database"""
-		conn = self.db_client.get_connection()
 		try:
-			# Clean duplicates from the CSV files
-			company_csv.clean_duplicates(conflict_columns=self.company_on_conflict)
-			company_image_csv.clean_duplicates(conflict_columns=self.company_image_on_conflict)
-			company_alternative_name_csv.clean_duplicates(conflict_columns=self.company_alternative_name_on_conflict)
-
-			with conn.cursor() as cursor:
-				try:
-					conn.autocommit = False
-					temp_company = f"{self.table_company.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-					temp_company_image = f"{self.table_company_image.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-					temp_company_alternative_name = f"{self.table_company_alternative_name.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-					cursor.execute(f"""
-						CREATE TEMP TABLE {temp_company} (LIKE {self.table_company} INCLUDING ALL);
-						CREATE TEMP TABLE {temp_company_image} (LIKE {self.table_company_image} INCLUDING ALL);
-						CREATE TEMP TABLE {temp_company_alternative_name} (LIKE {self.table_company_alternative_name} INCLUDING ALL);
-					""")
-
-					with open(company_csv.file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_company} ({','.join(self.company_columns)}) FROM STDIN WITH CSV HEADER", f)
-					with open(company_image_csv.file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_company_image} ({','.join(self.company_image_columns)}) FROM STDIN WITH CSV HEADER", f)
-					with open(company_alternative_name_csv.file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_company_alternative_name} ({','.join(self.company_alternative_name_columns)}) FROM STDIN WITH CSV HEADER", f)
-
-					# Insert companies
-					insert_into(
-						cursor=cursor,
-						table=self.table_company,
-						temp_table=temp_company,
-						columns=self.company_columns,
-						on_conflict=self.company_on_conflict,
-						on_conflict_update=self.company_on_conflict_update
-					)
-
-					# Insert company images
-					insert_into(
-						cursor=cursor,
-						table=self.table_company_image,
-						temp_table=temp_company_image,
-						columns=self.company_image_columns,
-						on_conflict=self.company_image_on_conflict,
-						on_conflict_update=self.company_image_on_conflict_update
-					)
-
-					# Insert company alternative names
-					insert_into(
-						cursor=cursor,
-						table=self.table_company_alternative_name,
-						temp_table=temp_company_alternative_name,
-						columns=self.company_alternative_name_columns,
-						on_conflict=self.company_alternative_name_on_conflict,
-						on_conflict_update=self.company_alternative_name_on_conflict_update
-					)
-
-					# Delete outdated images
-					cursor.execute(f"""
-						DELETE FROM {self.table_company_image}
-						WHERE ({','.join(self.company_image_on_conflict)}) NOT IN (
-							SELECT {','.join(self.company_image_on_conflict)}
-							FROM {temp_company_image}
-						)
-						AND company_id IN (
-							SELECT id FROM {temp_company}
-						);
-					""")
-
-					# Delete outdated alternative names
-					cursor.execute(f"""
-						DELETE FROM {self.table_company_alternative_name}
-						WHERE ({','.join(self.company_alternative_name_on_conflict)}) NOT IN (
-							SELECT {','.join(self.company_alternative_name_on_conflict)}
-							FROM {temp_company_alternative_name}
-						)
-						AND company_id IN (
-							SELECT id FROM {temp_company}
-						);
-					""")
-
-					conn.commit()
-
-					company_csv.delete()
-					company_image_csv.delete()
-					company_alternative_name_csv.delete()
-				except Exception as e:
-					conn.rollback()
-					raise
-				finally:
-					conn.autocommit = True
+			load_tables(self.db_client, self.tables, rows, parallelism=self.load_parallelism, mode=self.load_merge_mode)
+			self.reference_ids.add(self.table_company, rows["company"].column("id"))
 		except Exception as e:
 			raise ValueError(f"Failed to push companies to the database: {e}")
-		finally:
-			self.db_client.return_connection(conn)
@@ -3,7 +3,7 @@
 # ---------------------------------------------------------------------------- #
 
 from datetime import date
-from more_itertools import chunked
+from functools import partial
 import gc
 
 # ---------------------------------- Prefect --------------------------------- #
@@ -12,7 +12,10 @@ from prefect.logging import get_run_logger
 
 from .config import CompanyConfig
 from .mapper import Mapper
-from ...models.csv_file import CSVFile
+from ...models.row_buffer import RowBuffer
+from ...models.tmdb_fetcher import TMDBNotFoundError
+from ...utils.loader import new_buffers
+from ...utils.retry import process_with_retry_pass
 
 # ---------------------------------------------------------------------------- #
 
@@ -20,63 +23,68 @@ from ...models.csv_file import CSVFile
 #                                    Getters                                   #
 # ---------------------------------------------------------------------------- #
 
-def get_db_companies(config: CompanyConfig) -> set:
-	conn = config.db_client.get_connection()
+async def get_tmdb_company_details(config: CompanyConfig, company_id: int) -> dict:
 	try:
-		with conn.cursor() as cursor:
-			cursor.execute(f"SELECT id FROM {config.table_company}")
-			return {item[0] for item in cursor}
-	except Exception as e:
-		raise ValueError(f"Failed to get database companies: {e}")
-	finally:
-		config.db_client.return_connection(conn)
-
-@task(cache_policy=None, log_prints=False)
-def get_tmdb_company_details(config: CompanyConfig, company_id: int) -> dict:
-	try:
-		company_details = config.tmdb_client.request(f"company/{company_id}", {"append_to_response": "alternative_names,images"})
+		company_details = await config.tmdb_client.fetcher.get(f"company/{company_id}", {"append_to_response": "alternative_names,images"})
 		return company_details
-	except Exception as e:
-		config.logger.error(f"Failed to get company details for {company_id}: {e}")
+	except TMDBNotFoundError:
+		# Deleted from TMDB since the export was generated
+		config.logger.warning(f"Company {company_id} not found on TMDB")
 		return None
 
 # ---------------------------------------------------------------------------- #
 	
+@task(cache_policy=None)
+def fetch_companies_chunk(config: CompanyConfig, chunk: list) -> dict:
+	"""
+	Fetch and map a chunk of companies (first stage of the pipeline).
+	One Prefect task covers the whole chunk, the ids are fetched by the TMDB fetch engine.
+	The batch keeps the ids of the companies that could not be fetched.
+	"""
+	failed: set = set()
+	rows: dict[str, RowBuffer] = new_buffers(config.tables)
+
+	for company_id, company_data in config.tmdb_client.fetch_many(partial(get_tmdb_company_details, config), chunk):
+		if isinstance(company_data, Exception):
+			config.logger.error(f"Failed to get company details for {company_id}: {company_data}")
+			failed.add(company_id)
+			continue
+		if company_data is not None:
+			rows["company"].extend(Mapper.company(company=company_data))
+			rows["company_image"].extend(Mapper.company_image(company=company_data))
+			rows["company_alternative_name"].extend(Mapper.company_alternative_name(company=company_data))
+
+	config.logger.info(f"Fetched {len(chunk) - len(failed)}/{len(chunk)} companies ({len(failed)} failed)")
+	return {
+		"rows": rows,
+		"failed": failed,
+	}
+
+def push_companies_chunk(config: CompanyConfig, batch: dict) -> set:
+	"""
+	Push a batch of companies to the database.
+	Returns the ids of the companies that could not be fetched.
+	"""
+	config.logger.info(f"Pushing companies to the database...")
+	push_future = config.push.submit(rows=batch["rows"])
+	push_future.result(raise_on_failure=True)
+	config.logger.info(f"Succesfully submitted companies to the database")
+	return batch["failed"]
+
 def process_missing_companies(config: CompanyConfig):
 	try:
 		if len(config.missing_companies) > 0:
-			chunks = list(chunked(config.missing_companies, 100))
-			for chunk in chunks:
-				company_csv = CSVFile(
-					columns=config.company_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=config.flow_name
-				)
-				company_image_csv = CSVFile(
-					columns=config.company_image_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_image"
-				)
-				company_alternative_name_csv = CSVFile(
-					columns=config.company_alternative_name_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_alternative_name"
-				)
-
-				companies_details_futures = get_tmdb_company_details.map(config=config, company_id=chunk)
-
-				for company_details_response in companies_details_futures:
-					company_data = company_details_response.result()
-					if company_data is not None:
-						company_csv.append(rows_data=Mapper.company(company=company_data))
-						company_image_csv.append(rows_data=Mapper.company_image(company=company_data))
-						company_alternative_name_csv.append(rows_data=Mapper.company_alternative_name(company=company_data))
-				
-				config.logger.info(f"Pushing companies to the database...")
-				push_future = config.push.submit(company_csv=company_csv, company_image_csv=company_image_csv, company_alternative_name_csv=company_alternative_name_csv)
-				push_future.result(raise_on_failure=True)
-				config.logger.info(f"Succesfully submitted companies to the database")
-		
+			process_with_retry_pass(
+				stages=[partial(fetch_companies_chunk, config), partial(push_companies_chunk, config)],
+				ids=config.missing_companies,
+				chunk_size=100,
+				logger=config.logger,
+				name="companies",
+			)
+			config.logger.info(f"TMDB requests: {config.tmdb_client.request_stats()}")
+			config.logger.info(f"TMDB API keys usage: {config.tmdb_client.rate_limit_usage()}")
+			config.logger.info(f"TMDB concurrency limits: {config.tmdb_client.concurrency_limits()}")
+
 	except Exception as e:
 		raise ValueError(f"Failed to process missing companies: {e}")
 
@@ -93,15 +101,11 @@ def sync_tmdb_company(date: date = date.today()):
 		# Get the list of companies from TMDB and the database
 		config.log_manager.fetching_data()
 		tmdb_companies_df = config.tmdb_client.get_export_ids(type="production_company", date=config.date, columns_to_keep=["id"])
-		tmdb_companies_set = set(tmdb_companies_df["id"])
-		del tmdb_companies_df
-		gc.collect()
-
-		db_companies_set = get_db_companies(config)
 
 		# Compare the companies
-		config.extra_companies = db_companies_set - tmdb_companies_set
-		config.missing_companies = tmdb_companies_set - db_companies_set
+		config.extra_companies, config.missing_companies = config.diff_ids(config.table_company, tmdb_companies_df["id"].to_numpy())
+		del tmdb_companies_df
+		gc.collect()
 		logger.info(f"Found {len(config.extra_companies)} extra companies and {len(config.missing_companies)} missing companies")
 		config.log_manager.data_fetched()
 
@@ -46,6 +46,7 @@ def process_extra_countries(config: CountryConfig, extra_countries: set):
 					try:
 						cursor.execute(f"DELETE FROM {config.table_country} WHERE {config.country_column} IN %s", (tuple(extra_countries),))
 						conn.commit()
+						config.reference_ids.discard(config.table_country, extra_countries, column=config.country_column)
 					except Exception as e:
 						conn.rollback()
 						raise
@@ -68,6 +69,7 @@ def process_missing_countries(config: CountryConfig, missing_countries_set: set)
 						""", [(country,) for country in missing_countries_set])
 						
 						conn.commit()
+						config.reference_ids.add(config.table_country, missing_countries_set, column=config.country_column)
 					except Exception as e:
 						conn.rollback()
 						raise
@@ -10,8 +10,4 @@ class GenreConfig(Config):
 		self.table_genre: str = self.config.get("db_tables", {}).get("genre", "tmdb.genre")
 		self.table_genre_translation: str = self.config.get("db_tables", {}).get("genre_translation", "tmdb.genre_translation")
 
-		# CSV file containing the missing genres
-		self.genre: str = None
-		self.genre_translation: str = None
-
 
@@ -9,7 +9,7 @@ import uuid
 from prefect import flow
 from prefect.logging import get_run_logger
 
-from ...utils.file_manager import create_csv, get_csv_header
+from ...utils.pg_copy import copy_rows
 from .config import GenreConfig
 from .mappers import Mappers
 
@@ -69,6 +69,7 @@ def process_extra_genres(config: GenreConfig, extra_genres: set):
 					try:
 						cursor.execute(f"DELETE FROM {config.table_genre} WHERE id IN %s", (tuple(extra_genres),))
 						conn.commit()
+						config.reference_ids.discard(config.table_genre, extra_genres)
 					except Exception as e:
 						conn.rollback()
 						raise
@@ -83,11 +84,7 @@ def process_missing_genres(config: GenreConfig, tmdb_genres: list, missing_genre
 		# Initialize the mappers
 		mappers = Mappers(genres=tmdb_genres, default_language=config.default_language, extra_languages=config.extra_languages)
 
-		# Generate the CSV files
-		config.genre = create_csv(data=mappers.genre, tmp_directory=config.tmp_directory, prefix="genre")
-		config.genre_translation = create_csv(data=mappers.genre_translation, tmp_directory=config.tmp_directory, prefix="genre_translation")
-
-		# Load the CSV files into the database using copy
+		# Stream the genres into the database using copy
 		with config.db_client.connection() as conn:
 			with conn.cursor() as cursor:
 				conn.autocommit = False
@@ -95,14 +92,12 @@ def process_missing_genres(config: GenreConfig, tmdb_genres: list, missing_genre
 					temp_genre = f"{config.table_genre.replace('.', '_')}_temp_{uuid.uuid4().hex}"
 					temp_genre_translation = f"{config.table_genre_translation.replace('.', '_')}_temp_{uuid.uuid4().hex}"
 					cursor.execute(f"""
-						CREATE TEMP TABLE {temp_genre} (LIKE {config.table_genre} INCLUDING ALL);
-						CREATE TEMP TABLE {temp_genre_translation} (LIKE {config.table_genre_translation} INCLUDING ALL);
+						CREATE TEMP TABLE {temp_genre} (LIKE {config.table_genre} INCLUDING ALL) ON COMMIT DROP;
+						CREATE TEMP TABLE {temp_genre_translation} (LIKE {config.table_genre_translation} INCLUDING ALL) ON COMMIT DROP;
 					""")
 
-					with open(config.genre, "r") as f:
-						cursor.copy_expert(f"COPY {temp_genre} ({','.join(get_csv_header(f))}) FROM STDIN WITH CSV HEADER", f)
-					with open(config.genre_translation, "r") as f:
-						cursor.copy_expert(f"COPY {temp_genre_translation} ({','.join(get_csv_header(f))}) FROM STDIN WITH CSV HEADER", f)
+					copy_rows(cursor, temp_genre, list(mappers.genre.columns), mappers.genre.itertuples(index=False, name=None), like=config.table_genre)
+					copy_rows(cursor, temp_genre_translation, list(mappers.genre_translation.columns), mappers.genre_translation.itertuples(index=False, name=None), like=config.table_genre_translation)
 
 					cursor.execute(f"""
 						INSERT INTO {config.table_genre} (id)
@@ -118,6 +113,7 @@ def process_missing_genres(config: GenreConfig, tmdb_genres: list, missing_genre
                     """)
 					
 					conn.commit()
+					config.reference_ids.add(config.table_genre, missing_genres_set)
 				except Exception as e:
 					conn.rollback()
 					raise
@@ -10,24 +10,8 @@ import uuid
 from prefect import flow
 from prefect.logging import get_run_logger
 
-from ...utils.file_manager import create_csv, get_csv_header
+from ...utils.pg_copy import copy_rows
 from .config import KeywordConfig
-from ...models.csv_file import CSVFile
-
-# ---------------------------------------------------------------------------- #
-
-# ---------------------------------------------------------------------------- #
-#                                    Getters                                   #
-# ---------------------------------------------------------------------------- #
-
-def get_db_keywords(config: KeywordConfig) -> set:
-	try:
-		with config.db_client.connection() as conn:
-			with conn.cursor() as cursor:
-				cursor.execute(f"SELECT id FROM {config.table_keyword}")
-				return {item[0] for item in cursor}
-	except Exception as e:
-		raise ValueError(f"Failed to get database keywords: {e}")
 
 # ---------------------------------------------------------------------------- #
 
@@ -41,6 +25,7 @@ def process_extra_keywords(config: KeywordConfig, extra_keywords: set):
 					try:
 						cursor.execute(f"DELETE FROM {config.table_keyword} WHERE id IN %s", (tuple(extra_keywords),))
 						conn.commit()
+						config.reference_ids.discard(config.table_keyword, extra_keywords)
 					except Exception as e:
 						conn.rollback()
 						raise
@@ -52,26 +37,17 @@ def process_missing_keywords(config: KeywordConfig, missing_keywords: pd.DataFra
 		if len(missing_keywords) > 0:
 			config.logger.warning(f"Found {len(missing_keywords)} missing keywords in the database")
 
-			keyword_csv = CSVFile(
-				columns=['id', 'name'],
-				tmp_directory=config.tmp_directory,
-				prefix=config.flow_name
-			)
-
-			keyword_csv.append(rows_data=missing_keywords)
-
-			# Load the CSV files into the database using copy
+			# Stream the keywords into the database using copy
 			with config.db_client.connection() as conn:
 				with conn.cursor() as cursor:
 					conn.autocommit = False
 					try:
 						temp_keyword = f"{config.table_keyword.replace('.', '_')}_temp_{uuid.uuid4().hex}"
 						cursor.execute(f"""
-							CREATE TEMP TABLE {temp_keyword} (LIKE {config.table_keyword} INCLUDING ALL);
+							CREATE TEMP TABLE {temp_keyword} (LIKE {config.table_keyword} INCLUDING ALL) ON COMMIT DROP;
 						""")
 
-						with open(keyword_csv.file_path, "r") as f:
-							cursor.copy_expert(f"COPY {temp_keyword} ({','.join(get_csv_header(f))}) FROM STDIN WITH CSV HEADER", f)
+						copy_rows(cursor, temp_keyword, ["id", "name"], missing_keywords[["id", "name"]].itertuples(index=False, name=None), like=config.table_keyword)
 					
 						cursor.execute(f"""
 							INSERT INTO {config.table_keyword} (id, name)
@@ -81,8 +57,7 @@ def process_missing_keywords(config: KeywordConfig, missing_keywords: pd.DataFra
 						""")
 						
 						conn.commit()
-
-						keyword_csv.delete()
+						config.reference_ids.add(config.table_keyword, missing_keywords["id"].to_numpy())
 					except Exception as e:
 						conn.rollback()
 						raise
@@ -101,13 +76,10 @@ def sync_tmdb_keyword(date: date = date.today()):
 		# Get the list of keyword from TMDB and the database
 		config.log_manager.fetching_data()
 		tmdb_keywords_df = config.tmdb_client.get_export_ids(type="keyword", date=config.date, columns_to_keep=["id", "name"])
-		tmdb_keywords_set = set(tmdb_keywords_df["id"])
-		db_keywords_set = get_db_keywords(config)
-		config.log_manager.data_fetched()
 
 		# Compare the keywords
-		extra_keywords: set = db_keywords_set - tmdb_keywords_set
-		missing_keywords: set = tmdb_keywords_set - db_keywords_set
+		extra_keywords, missing_keywords = config.diff_ids(config.table_keyword, tmdb_keywords_df["id"].to_numpy())
+		config.log_manager.data_fetched()
 
 		# Process extra and missing keywords
 		config.log_manager.syncing_to_db()
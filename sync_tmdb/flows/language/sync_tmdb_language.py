@@ -9,7 +9,6 @@ from psycopg2.extras import execute_values
 from prefect import flow
 from prefect.logging import get_run_logger
 
-from ...utils.file_manager import create_csv, get_csv_header
 from .config import LanguageConfig
 
 # ---------------------------------------------------------------------------- #
@@ -47,6 +46,7 @@ def process_extra_languages(config: LanguageConfig, extra_languages: set):
 					try:
 						cursor.execute(f"DELETE FROM {config.table_language} WHERE {config.language_column} IN %s", (tuple(extra_languages),))
 						conn.commit()
+						config.reference_ids.discard(config.table_language, extra_languages, column=config.language_column)
 					except Exception as e:
 						conn.rollback()
 						raise
@@ -70,6 +70,7 @@ def process_missing_languages(config: LanguageConfig, missing_languages_set: set
 						""", [(lang,) for lang in missing_languages_set])
 						
 						conn.commit()
+						config.reference_ids.add(config.table_language, missing_languages_set, column=config.language_column)
 					except Exception as e:
 						conn.rollback()
 						raise
@@ -3,7 +3,7 @@
 # ---------------------------------------------------------------------------- #
 
 from datetime import date
-from more_itertools import chunked
+from functools import partial
 import gc
 
 # ---------------------------------- Prefect --------------------------------- #
@@ -12,7 +12,12 @@ from prefect.logging import get_run_logger
 
 from .config import MovieConfig
 from .mapper import Mapper
-from ...models.csv_file import CSVFile
+from ...models.export_snapshot import PopularityUpdate
+from ...models.row_buffer import RowBuffer
+from ...models.tmdb_fetcher import TMDBNotFoundError
+from ...models.tmdb_request_plan import TMDBRequestPlan
+from ...utils.loader import new_buffers
+from ...utils.retry import process_with_retry_pass
 
 # ---------------------------------------------------------------------------- #
 
@@ -20,17 +25,6 @@ from ...models.csv_file import CSVFile
 #                                    Getters                                   #
 # ---------------------------------------------------------------------------- #
 
-def get_db_movies(config: MovieConfig) -> set:
-	conn = config.db_client.get_connection()
-	try:
-		with conn.cursor() as cursor:
-			cursor.execute(f"SELECT id FROM {config.table_movie}")
-			return {item[0] for item in cursor}
-	except Exception as e:
-		raise ValueError(f"Failed to get database movies: {e}")
-	finally:
-		config.db_client.return_connection(conn)
-	
 def get_tmdb_movies_changed(config: MovieConfig):
 	try:
 		config.logger.info("Getting changed movies...")
@@ -39,147 +33,132 @@ def get_tmdb_movies_changed(config: MovieConfig):
 	except Exception as e:
 		raise ValueError(f"Failed to get changed movies: {e}")
 
-@task(cache_policy=None, log_prints=False)
-def get_tmdb_movie_details(config: MovieConfig, movie_id: int) -> dict:
+async def get_tmdb_movie_details(config: MovieConfig, movie_id: int) -> dict:
 	try:
-		main_video_languages = "en,fr,es,ja,de"
-		# TMDB limit the number of languages to 5 
-		movie = config.tmdb_client.request(f"movie/{movie_id}", {"append_to_response": "alternative_titles,credits,external_ids,keywords,release_dates,translations,videos", "include_video_language": main_video_languages})
+		main_video_languages = ["en", "fr", "es", "ja", "de"]
+		plan = TMDBRequestPlan(
+			f"movie/{movie_id}",
+			appends=["alternative_titles", "credits", "external_ids", "keywords", "release_dates", "translations", "videos", "images"],
+			video_languages=main_video_languages,
+			image_languages=config.tmdb_client.image_languages,
+		)
+		movie = await plan.fetch(config.tmdb_client.fetcher)
 
 		# Protect against adult content
 		if movie["adult"]:
 			return None
-		images = config.tmdb_client.request(f"movie/{movie_id}/images")
-		# Add images to the movie details
-		movie["images"] = images
 		return movie
-	except Exception as e:
-		config.logger.error(f"Failed to get movie details for {movie_id}: {e}")
+	except TMDBNotFoundError:
+		# Deleted from TMDB since the export was generated
+		config.logger.warning(f"Movie {movie_id} not found on TMDB")
 		return None
 
 # ---------------------------------------------------------------------------- #
 	
+@task(cache_policy=None)
+def fetch_movies_chunk(config: MovieConfig, chunk: list) -> dict:
+	"""
+	Fetch and map a chunk of movies (first stage of the pipeline).
+	One Prefect task covers the whole chunk, the ids are fetched by the TMDB fetch engine.
+	The batch keeps the ids of the movies that could not be fetched.
+	"""
+	failed: set = set()
+	unchanged: set = set()
+	rows: dict[str, RowBuffer] = new_buffers(config.tables)
+	fingerprints = config.fingerprints.get(chunk)
+
+	typesense_documents = []
+	fingerprint_rows = []
+
+	for movie_id, movie_details in config.tmdb_client.fetch_many(partial(get_tmdb_movie_details, config), chunk):
+		if isinstance(movie_details, Exception):
+			config.logger.error(f"Failed to get movie details for {movie_id}: {movie_details}")
+			failed.add(movie_id)
+			continue
+		if movie_details is not None:
+			movie_credits, movie_roles = Mapper.movie_credits(config=config,movie=movie_details)
+			movie_rows = {
+				"movie": Mapper.movie(config=config,movie=movie_details),
+				"movie_alternative_titles": Mapper.movie_alternative_titles(config=config,movie=movie_details),
+				"movie_external_ids": Mapper.movie_external_ids(config=config,movie=movie_details),
+				"movie_genres": Mapper.movie_genres(config=config,movie=movie_details),
+				"movie_images": Mapper.movie_images(config=config,movie=movie_details),
+				"movie_keywords": Mapper.movie_keywords(config=config,movie=movie_details),
+				"movie_origin_country": Mapper.movie_origin_country(config=config,movie=movie_details),
+				"movie_production_companies": Mapper.movie_production_companies(config=config,movie=movie_details),
+				"movie_production_countries": Mapper.movie_production_countries(config=config,movie=movie_details),
+				"movie_release_dates": Mapper.movie_release_dates(config=config,movie=movie_details),
+				"movie_spoken_languages": Mapper.movie_spoken_languages(config=config,movie=movie_details),
+				"movie_translations": Mapper.movie_translations(config=config,movie=movie_details),
+				"movie_videos": Mapper.movie_videos(config=config,movie=movie_details),
+				"movie_credits": movie_credits,
+				"movie_roles": movie_roles,
+			}
+			typesense_document = Mapper.typesense(config=config,movie=movie_details)
+
+			# Skip the movie when nothing we store changed since it was last loaded
+			fingerprint = config.fingerprints.compute(movie_rows, typesense_document)
+			if fingerprint == fingerprints.get(movie_id):
+				unchanged.add(movie_id)
+			else:
+				for name, entity_rows in movie_rows.items():
+					rows[name].extend(entity_rows)
+				fingerprint_rows.append(config.fingerprints.row(movie_id, fingerprint))
+				typesense_documents.append(typesense_document)
+
+		# Release the payload as soon as it is mapped, not when the next one arrives
+		del movie_details
+
+	config.logger.info(f"Fetched {len(chunk) - len(failed)}/{len(chunk)} movies ({len(failed)} failed, {len(unchanged)} unchanged)")
+	return {
+		"rows": rows,
+		"typesense_documents": typesense_documents,
+		"fingerprints": fingerprint_rows,
+		"failed": failed,
+	}
+
+def push_movies_chunk(config: MovieConfig, batch: dict) -> dict:
+	"""
+	Push a batch of movies to the database.
+	"""
+	config.logger.info(f"Pushing movies to the database...")
+	push_future = config.push.submit(rows=batch["rows"])
+	push_future.result(raise_on_failure=True)
+	config.logger.info(f"Successfully pushed movies to the database")
+	return batch
+
+def index_movies_chunk(config: MovieConfig, batch: dict) -> set:
+	"""
+	Push a batch of movies to Typesense.
+	Returns the ids of the movies that could not be fetched.
+	"""
+	# Push to Typesense
+	if batch["typesense_documents"]:
+		config.logger.info("Upserting movies to Typesense...")
+		config.typesense_client.upsert_documents("movies", batch["typesense_documents"])
+		config.logger.info("Successfully upserted movies to Typesense")
+
+	# Saved once indexed, so that a movie whose indexing failed is loaded and indexed again by the next run
+	config.fingerprints.save(batch["fingerprints"])
+
+	return batch["failed"]
+
 def process_missing_movies(config: MovieConfig):
 	try:
 		if len(config.missing_movies) > 0:
 			config.get_db_data()
-			chunks = list(chunked(config.missing_movies, 500))
-			for chunk in chunks:
-				csv: dict[str, CSVFile] = {}
-				csv["movie"] = CSVFile(
-					columns=config.movie_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=config.flow_name
-				)
-				csv["movie_alternative_titles"] = CSVFile(
-					columns=config.movie_alternative_titles_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_alternative_titles"
-				)
-				csv["movie_credits"] = CSVFile(
-					columns=config.movie_credits_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_credits"
-				)
-				csv["movie_external_ids"] = CSVFile(
-					columns=config.movie_external_ids_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_external_ids"
-				)
-				csv["movie_genres"] = CSVFile(
-					columns=config.movie_genres_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_genres"
-				)
-				csv["movie_images"] = CSVFile(
-					columns=config.movie_images_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_images"
-				)
-				csv["movie_keywords"] = CSVFile(
-					columns=config.movie_keywords_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_keywords"
-				)
-				csv["movie_origin_country"] = CSVFile(
-					columns=config.movie_origin_country_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_origin_country"
-				)
-				csv["movie_production_companies"] = CSVFile(
-					columns=config.movie_production_companies_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_production_companies"
-				)
-				csv["movie_production_countries"] = CSVFile(
-					columns=config.movie_production_countries_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_production_countries"
-				)
-				csv["movie_release_dates"] = CSVFile(
-					columns=config.movie_release_dates_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_release_dates"
-				)
-				csv["movie_roles"] = CSVFile(
-					columns=config.movie_roles_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_roles"
-				)
-				csv["movie_spoken_languages"] = CSVFile(
-					columns=config.movie_spoken_languages_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_spoken_languages"
-				)
-				csv["movie_translations"] = CSVFile(
-					columns=config.movie_translations_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_translations"
-				)
-				csv["movie_videos"] = CSVFile(
-					columns=config.movie_videos_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_videos"
-				)
-
-				typesense_documents = []
-
-				movies_details_futures = get_tmdb_movie_details.map(config=config, movie_id=chunk)
-				movies_details_results = []
-				for movie_details_response in movies_details_futures:
-					movie_details = movie_details_response.result()
-					if movie_details is not None:
-						movies_details_results.append(movie_details)
-						csv["movie"].append(rows_data=Mapper.movie(config=config,movie=movie_details))
-						csv["movie_alternative_titles"].append(rows_data=Mapper.movie_alternative_titles(config=config,movie=movie_details))
-						movie_credits_df, movie_roles_df = Mapper.movie_credits(config=config,movie=movie_details)
-						csv["movie_credits"].append(rows_data=movie_credits_df)
-						csv["movie_roles"].append(rows_data=movie_roles_df)
-						csv["movie_external_ids"].append(rows_data=Mapper.movie_external_ids(config=config,movie=movie_details))
-						csv["movie_genres"].append(rows_data=Mapper.movie_genres(config=config,movie=movie_details))
-						csv["movie_images"].append(rows_data=Mapper.movie_images(config=config,movie=movie_details))
-						csv["movie_keywords"].append(rows_data=Mapper.movie_keywords(config=config,movie=movie_details))
-						csv["movie_origin_country"].append(rows_data=Mapper.movie_origin_country(config=config,movie=movie_details))
-						csv["movie_production_companies"].append(rows_data=Mapper.movie_production_companies(config=config,movie=movie_details))
-						csv["movie_production_countries"].append(rows_data=Mapper.movie_production_countries(config=config,movie=movie_details))
-						csv["movie_release_dates"].append(rows_data=Mapper.movie_release_dates(config=config,movie=movie_details))
-						csv["movie_spoken_languages"].append(rows_data=Mapper.movie_spoken_languages(config=config,movie=movie_details))
-						csv["movie_translations"].append(rows_data=Mapper.movie_translations(config=config,movie=movie_details))
-						csv["movie_videos"].append(rows_data=Mapper.movie_videos(config=config,movie=movie_details))
-
-						# Mapper Typesense
-						typesense_documents.append(Mapper.typesense(config=config,movie=movie_details))
-
-				config.logger.info(f"Pushing movies to the database...")
-				push_future = config.push.submit(csv=csv)
-				push_future.result(raise_on_failure=True)
-				config.logger.info(f"Successfully pushed movies to the database")
-
-				# Push to Typesense
-				if typesense_documents:
-					config.logger.info("Upserting movies to Typesense...")
-					config.typesense_client.upsert_documents("movies", typesense_documents)
-					config.logger.info("Successfully upserted movies to Typesense")
+			failed = process_with_retry_pass(
+				stages=[partial(fetch_movies_chunk, config), partial(push_movies_chunk, config), partial(index_movies_chunk, config)],
+				ids=config.missing_movies,
+				chunk_size=500,
+				logger=config.logger,
+				name="movies",
+			)
+			config.logger.info(f"TMDB requests: {config.tmdb_client.request_stats()}")
+			config.logger.info(f"TMDB API keys usage: {config.tmdb_client.rate_limit_usage()}")
+			config.logger.info(f"TMDB concurrency limits: {config.tmdb_client.concurrency_limits()}")
+			return failed
+		return set()
 
 	except Exception as e:
 		raise ValueError(f"Failed to process missing movies: {e}")
@@ -197,19 +176,15 @@ def sync_tmdb_movie(date: date = date.today(), update_popularity: bool = True):
 		# Get the list of movie from TMDB and the database
 		config.log_manager.fetching_data()
 		tmdb_movies_df = config.tmdb_client.get_export_ids(type="movie", date=config.date)
-		tmdb_movies_set = set(tmdb_movies_df["id"])
-		if update_popularity and 'popularity' in tmdb_movies_df.columns:
-			tmdb_movies_popularity = tmdb_movies_df.set_index('id')['popularity'].to_dict()
-		else:
-			tmdb_movies_popularity = {}
-		db_movies_set = get_db_movies(config)
+
+		# Compare the movies with the previous export snapshot (or the database) and process missing movies
+		config.extra_movies, config.missing_movies, tmdb_movies_popularity = config.diff_export(type="movie", table_name=config.table_movie, export=tmdb_movies_df)
+		if not update_popularity:
+			tmdb_movies_popularity = PopularityUpdate.empty()
 
 		del tmdb_movies_df
 		gc.collect()
 
-		# Compare the movies and process missing movies
-		config.extra_movies = db_movies_set - tmdb_movies_set
-		config.missing_movies = tmdb_movies_set - db_movies_set
 		get_tmdb_movies_changed(config)
 		logger.info(f"Found {len(config.extra_movies)} extra movies and {len(config.missing_movies)} missing movies")
 		config.log_manager.data_fetched()
@@ -217,7 +192,7 @@ def sync_tmdb_movie(date: date = date.today(), update_popularity: bool = True):
 		# Sync the movies to the database
 		config.log_manager.syncing_to_db()
 		config.prune()
-		process_missing_movies(config=config)
+		failed_movies = process_missing_movies(config=config)
 
 		if update_popularity:
 			config.log_manager.updating_popularity()
@@ -226,6 +201,8 @@ def sync_tmdb_movie(date: date = date.today(), update_popularity: bool = True):
 				table_name=config.table_movie,
 				content_type=config.flow_name,
 			)
+		# Saved even when the popularity is not updated, the next run then compares with the previous popularity
+		config.save_export_snapshot(type="movie", failed=failed_movies, popularity_updated=update_popularity)
 		
 		config.log_manager.success()
 	except Exception as e:
@@ -1,9 +1,9 @@
 from datetime import date
 from prefect import task
-import uuid
 from ...models.config import Config
-from ...models.csv_file import CSVFile
-from ...utils.db import insert_into
+from ...models.row_buffer import RowBuffer
+from ...models.table_spec import TableSpec
+from ...utils.loader import load_tables
 
 class NetworkConfig(Config):
 	def __init__(self, date: date):
@@ -29,11 +29,13 @@ class NetworkConfig(Config):
 		self.network_image_on_conflict: list[str] = ["id"]
 		self.network_alternative_name_on_conflict: list[str] = ["network_id", "name", "type"]
 
-		# On conflict update
-		self.network_on_conflict_update: list[str] = [col for col in self.network_columns if col not in self.network_on_conflict]
-		self.network_image_on_conflict_update: list[str] = [col for col in self.network_image_columns if col not in self.network_image_on_conflict]
-		self.network_alternative_name_on_conflict_update: list[str] = [col for col in self.network_alternative_name_columns if col not in self.network_alternative_name_on_conflict]
-	
+		# Tables, in load order
+		self.tables: list[TableSpec] = [
+			TableSpec("network", self.table_network, self.network_columns, self.network_on_conflict, upsert=True),
+			TableSpec("network_image", self.table_network_image, self.network_image_columns, self.network_image_on_conflict, parent="network", parent_key="network_id", delete=TableSpec.REPLACE),
+			TableSpec("network_alternative_name", self.table_network_alternative_name, self.network_alternative_name_columns, self.network_alternative_name_on_conflict, parent="network", parent_key="network_id", delete=TableSpec.REPLACE),
+		]
+
 	@task(cache_policy=None)
 	def prune(self):
 		"""Prune the extra networks from the database"""
@@ -45,6 +47,7 @@ class NetworkConfig(Config):
 					try:
 						cursor.execute(f"DELETE FROM {self.table_network} WHERE id IN %s", (tuple(self.extra_networks),))
 						conn.commit()
+						self.reference_ids.discard(self.table_network, self.extra_networks)
 					except:
 						conn.rollback()
 						raise
@@ -54,91 +57,10 @@ class NetworkConfig(Config):
 			self.db_client.return_connection(conn)
 
 	@task(cache_policy=None)
-	def push(self, network_csv: CSVFile, network_image_csv: CSVFile, network_alternative_name_csv: CSVFile):
+	def push(self, rows: dict[str, RowBuffer]):
 		"""Push the networks to the database"""
-		conn = self.db_client.get_connection()
 		try:
-			# Clean duplicates from the CSV files
-			network_csv.clean_duplicates(conflict_columns=self.network_on_conflict)
-			network_image_csv.clean_duplicates(conflict_columns=self.network_image_on_conflict)
-			network_alternative_name_csv.clean_duplicates(conflict_columns=self.network_alternative_name_on_conflict)
-
-			with conn.cursor() as cursor:
-				try:
-					conn.autocommit = False
-					temp_network = f"{self.table_network.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-					temp_network_image = f"{self.table_network_image.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-					temp_network_alternative_name = f"{self.table_network_alternative_name.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-					cursor.execute(f"""
-						CREATE TEMP TABLE {temp_network} (LIKE {self.table_network} INCLUDING ALL);
-						CREATE TEMP TABLE {temp_network_image} (LIKE {self.table_network_image} INCLUDING ALL);
-						CREATE TEMP TABLE {temp_network_alternative_name} (LIKE {self.table_network_alternative_name} INCLUDING ALL);
-					""")
-
-					with open(network_csv.file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_network} ({','.join(self.network_columns)}) FROM STDIN WITH CSV HEADER", f)
-					with open(network_image_csv.file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_network_image} ({','.join(self.network_image_columns)}) FROM STDIN WITH CSV HEADER", f)
-					with open(network_alternative_name_csv.file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_network_alternative_name} ({','.join(self.network_alternative_name_columns)}) FROM STDIN WITH CSV HEADER", f)
-
-					# Delete all previous images
-					cursor.execute(f"""
-						DELETE FROM {self.table_network_image}
-						WHERE {self.network_image_columns[1]} IN (
-						SELECT id FROM {temp_network}
-						)
-					""")
-
-					# Delete all previous alternative names
-					cursor.execute(f"""
-						DELETE FROM {self.table_network_alternative_name}
-						WHERE {self.network_alternative_name_columns[0]} IN (
-						SELECT id FROM {temp_network}
-						)
-					""")
-
-					# Insert networks
-					insert_into(
-						cursor=cursor,
-						table=self.table_network,
-						temp_table=temp_network,
-						columns=self.network_columns,
-						on_conflict=self.network_on_conflict,
-						on_conflict_update=self.network_on_conflict_update
-					)
-
-					# Insert network images
-					insert_into(
-						cursor=cursor,
-						table=self.table_network_image,
-						temp_table=temp_network_image,
-						columns=self.network_image_columns,
-						# on_conflict=self.network_image_on_conflict,
-						# on_conflict_update=self.network_image_on_conflict_update
-					)
-
-					# Insert network alternative names
-					insert_into(
-						cursor=cursor,
-						table=self.table_network_alternative_name,
-						temp_table=temp_network_alternative_name,
-						columns=self.network_alternative_name_columns,
-						# on_conflict=self.network_alternative_name_on_conflict,
-						# on_conflict_update=self.network_alternative_name_on_conflict_update
-					)
-
-					conn.commit()
-
-					network_csv.delete()
-					network_image_csv.delete()
-					network_alternative_name_csv.delete()
-				except Exception as e:
-					conn.rollback()
-					raise
-				finally:
-					conn.autocommit = True
+			load_tables(self.db_client, self.tables, rows, parallelism=self.load_parallelism, mode=self.load_merge_mode)
+			self.reference_ids.add(self.table_network, rows["network"].column("id"))
 		except Exception as e:
 			raise ValueError(f"Failed to push networks to the database: {e}")
-		finally:
-			self.db_client.return_connection(conn)
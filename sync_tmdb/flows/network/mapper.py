@@ -1,51 +1,43 @@
-import pandas as pd
-
 class Mapper:
 	@staticmethod
-	def network(network: dict) -> pd.DataFrame:
-		network_data = [
-			{
-				"id": network.get("id"),
-				"name": network.get("name", None),
-				"headquarters": network.get("headquarters", None),
-				"homepage": network.get("homepage", None),
-				"origin_country": network.get("origin_country", None),
-			}
+	def network(network: dict) -> list[tuple]:
+		# ["id", "name", "headquarters", "homepage", "origin_country"]
+		return [
+			(
+				network.get("id"),
+				network.get("name", None),
+				network.get("headquarters", None),
+				network.get("homepage", None),
+				network.get("origin_country", None),
+			)
 		]
-		return pd.DataFrame(network_data)
 	
 	@staticmethod
-	def network_image(network: dict) -> pd.DataFrame:
+	def network_image(network: dict) -> list[tuple]:
+		# ["id", "network_id", "file_path", "file_type", "aspect_ratio", "height", "width", "vote_average", "vote_count"]
 		networkId = network["id"]
 		images = network.get("images", {}).get("logos", [])
-		network_image_data = [
-			{
-				"id": image["id"],
-				"network_id": networkId,
-				"file_path": image["file_path"],
-				"file_type": image["file_type"],
-				"aspect_ratio": image["aspect_ratio"],
-				"height": image["height"],
-				"width": image["width"],
-				"vote_average": image["vote_average"],
-				"vote_count": image["vote_count"],
-			}
+		return [
+			(
+				image["id"],
+				networkId,
+				image["file_path"],
+				image["file_type"],
+				image["aspect_ratio"],
+				image["height"],
+				image["width"],
+				image["vote_average"],
+				image["vote_count"],
+			)
 			for image in images
 		]
-
-		return pd.DataFrame(network_image_data)
 	
 	@staticmethod
-	def network_alternative_name(network: dict) -> pd.DataFrame:
+	def network_alternative_name(network: dict) -> list[tuple]:
+		# ["network_id", "name", "type"]
 		networkId = network["id"]
 		alternative_names = network.get("alternative_names", {}).get("results", [])
-		network_alternative_name_data = [
-			{
-				"network_id": networkId,
-				"name": alternative_name["name"],
-				"type": alternative_name["type"],
-			}
+		return [
+			(networkId, alternative_name["name"], alternative_name["type"])
 			for alternative_name in alternative_names
-		]
-
-		return pd.DataFrame(network_alternative_name_data)
\ No newline at end of file
+		]
\ No newline at end of file
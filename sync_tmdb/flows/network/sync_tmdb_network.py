@@ -3,7 +3,7 @@
 # ---------------------------------------------------------------------------- #
 
 from datetime import date
-from more_itertools import chunked
+from functools import partial
 import gc
 
 # ---------------------------------- Prefect --------------------------------- #
@@ -12,7 +12,10 @@ from prefect.logging import get_run_logger
 
 from .config import NetworkConfig
 from .mapper import Mapper
-from ...models.csv_file import CSVFile
+from ...models.row_buffer import RowBuffer
+from ...models.tmdb_fetcher import TMDBNotFoundError
+from ...utils.loader import new_buffers
+from ...utils.retry import process_with_retry_pass
 
 # ---------------------------------------------------------------------------- #
 
@@ -20,63 +23,67 @@ from ...models.csv_file import CSVFile
 #                                    Getters                                   #
 # ---------------------------------------------------------------------------- #
 
-def get_db_networks(config: NetworkConfig) -> set:
-	conn = config.db_client.get_connection()
+async def get_tmdb_network_details(config: NetworkConfig, network_id: int) -> dict:
 	try:
-		with conn.cursor() as cursor:
-			cursor.execute(f"SELECT id FROM {config.table_network}")
-			return {item[0] for item in cursor}
-	except Exception as e:
-		raise ValueError(f"Failed to get database networks: {e}")
-	finally:
-		config.db_client.return_connection(conn)
-
-@task(cache_policy=None, log_prints=False)
-def get_tmdb_network_details(config: NetworkConfig, network_id: int) -> dict:
-	try:
-		network_details = config.tmdb_client.request(f"network/{network_id}", {"append_to_response": "alternative_names,images"})
+		network_details = await config.tmdb_client.fetcher.get(f"network/{network_id}", {"append_to_response": "alternative_names,images"})
 		return network_details
-	except Exception as e:
-		config.logger.error(f"Failed to get network details for {network_id}: {e}")
+	except TMDBNotFoundError:
+		# Deleted from TMDB since the export was generated
+		config.logger.warning(f"Network {network_id} not found on TMDB")
 		return None
 
 # ---------------------------------------------------------------------------- #
 	
+@task(cache_policy=None)
+def fetch_networks_chunk(config: NetworkConfig, chunk: list) -> dict:
+	"""
+	Fetch and map a chunk of networks (first stage of the pipeline).
+	One Prefect task covers the whole chunk, the ids are fetched by the TMDB fetch engine.
+	The batch keeps the ids of the networks that could not be fetched.
+	"""
+	failed: set = set()
+	rows: dict[str, RowBuffer] = new_buffers(config.tables)
+
+	for network_id, network_data in config.tmdb_client.fetch_many(partial(get_tmdb_network_details, config), chunk):
+		if isinstance(network_data, Exception):
+			config.logger.error(f"Failed to get network details for {network_id}: {network_data}")
+			failed.add(network_id)
+			continue
+		if network_data is not None:
+			rows["network"].extend(Mapper.network(network=network_data))
+			rows["network_image"].extend(Mapper.network_image(network=network_data))
+			rows["network_alternative_name"].extend(Mapper.network_alternative_name(network=network_data))
+
+	config.logger.info(f"Fetched {len(chunk) - len(failed)}/{len(chunk)} networks ({len(failed)} failed)")
+	return {
+		"rows": rows,
+		"failed": failed,
+	}
+
+def push_networks_chunk(config: NetworkConfig, batch: dict) -> set:
+	"""
+	Push a batch of networks to the database.
+	Returns the ids of the networks that could not be fetched.
+	"""
+	config.logger.info(f"Pushing networks to the database...")
+	push_future = config.push.submit(rows=batch["rows"])
+	push_future.result(raise_on_failure=True)
+	config.logger.info(f"Succesfully submitted networks to the database")
+	return batch["failed"]
+
 def process_missing_networks(config: NetworkConfig):
 	try:
 		if len(config.missing_networks) > 0:
-			chunks = list(chunked(config.missing_networks, 100))
-			for chunk in chunks:
-				network_csv = CSVFile(
-					columns=config.network_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=config.flow_name
-				)
-				network_image_csv = CSVFile(
-					columns=config.network_image_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_image"
-				)
-				network_alternative_name_csv = CSVFile(
-					columns=config.network_alternative_name_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_alternative_name"
-				)
-
-				networks_details_futures = get_tmdb_network_details.map(config=config, network_id=chunk)
-
-
-				for network_details_response in networks_details_futures:
-					network_data = network_details_response.result()
-					if network_data is not None:
-						network_csv.append(rows_data=Mapper.network(network=network_data))
-						network_image_csv.append(rows_data=Mapper.network_image(network=network_data))
-						network_alternative_name_csv.append(rows_data=Mapper.network_alternative_name(network=network_data))
-				
-				config.logger.info(f"Pushing networks to the database...")
-				push_future = config.push.submit(network_csv=network_csv, network_image_csv=network_image_csv, network_alternative_name_csv=network_alternative_name_csv)
-				push_future.result(raise_on_failure=True)
-				config.logger.info(f"Succesfully submitted networks to the database")
+			process_with_retry_pass(
+				stages=[partial(fetch_networks_chunk, config), partial(push_networks_chunk, config)],
+				ids=config.missing_networks,
+				chunk_size=100,
+				logger=config.logger,
+				name="networks",
+			)
+			config.logger.info(f"TMDB requests: {config.tmdb_client.request_stats()}")
+			config.logger.info(f"TMDB API keys usage: {config.tmdb_client.rate_limit_usage()}")
+			config.logger.info(f"TMDB concurrency limits: {config.tmdb_client.concurrency_limits()}")
 
 	except Exception as e:
 		raise ValueError(f"Failed to process missing networks: {e}")
@@ -94,15 +101,11 @@ def sync_tmdb_network(date: date = date.today()):
 		# Get the list of networks from TMDB and the database
 		config.log_manager.fetching_data()
 		tmdb_networks_df = config.tmdb_client.get_export_ids(type="tv_network", date=config.date, columns_to_keep=["id"])
-		tmdb_networks_set = set(tmdb_networks_df["id"])
-		del tmdb_networks_df
-		gc.collect()
-
-		db_networks_set = get_db_networks(config)
 
 		# Compare the networks
-		config.extra_networks = db_networks_set - tmdb_networks_set
-		config.missing_networks = tmdb_networks_set - db_networks_set
+		config.extra_networks, config.missing_networks = config.diff_ids(config.table_network, tmdb_networks_df["id"].to_numpy())
+		del tmdb_networks_df
+		gc.collect()
 		logger.info(f"Found {len(config.extra_networks)} extra networks and {len(config.missing_networks)} missing networks")
 		config.log_manager.data_fetched()
 
@@ -1,9 +1,10 @@
 from datetime import date
 from prefect import task
-import uuid
 from ...models.config import Config
-from ...models.csv_file import CSVFile
-from ...utils.db import insert_into
+from ...models.fingerprint import FingerprintStore
+from ...models.row_buffer import RowBuffer
+from ...models.table_spec import TableSpec
+from ...utils.loader import load_tables
 
 class PersonConfig(Config):
 	def __init__(self, date: date):
@@ -16,6 +17,7 @@ class PersonConfig(Config):
 		self.table_person_image: str = self.config.get("db_tables", {}).get("person_image", "tmdb.person_image")
 		self.table_person_external_id: str = self.config.get("db_tables", {}).get("person_external_id", "tmdb.person_external_id")
 		self.table_person_also_known_as: str = self.config.get("db_tables", {}).get("person_also_known_as", "tmdb.person_also_known_as")
+		self.table_sync_fingerprint: str = self.config.get("db_tables", {}).get("sync_fingerprint", "tmdb.sync_fingerprint")
 
 		# Ids
 		self.extra_persons: set = None
@@ -35,12 +37,17 @@ class PersonConfig(Config):
 		self.person_external_id_on_conflict: list[str] = ["person_id", "source"]
 		self.person_also_known_as_on_conflict: list[str] = ["person_id", "name"]
 
-		# On conflict update
-		self.person_on_conflict_update: list[str] = [col for col in self.person_columns if col not in self.person_on_conflict]
-		self.person_translation_on_conflict_update: list[str] = [col for col in self.person_translation_columns if col not in self.person_translation_on_conflict]
-		self.person_image_on_conflict_update: list[str] = [col for col in self.person_image_columns if col not in self.person_image_on_conflict]
-		self.person_external_id_on_conflict_update: list[str] = [col for col in self.person_external_id_columns if col not in self.person_external_id_on_conflict]
-		self.person_also_known_as_on_conflict_update: list[str] = [col for col in self.person_also_known_as_columns if col not in self.person_also_known_as_on_conflict]
+		# Tables, in load order
+		self.tables: list[TableSpec] = [
+			TableSpec("person", self.table_person, self.person_columns, self.person_on_conflict, upsert=True),
+			TableSpec("person_translation", self.table_person_translation, self.person_translation_columns, self.person_translation_on_conflict, upsert=True, parent="person", parent_key="person_id", delete=TableSpec.PRUNE),
+			TableSpec("person_image", self.table_person_image, self.person_image_columns, self.person_image_on_conflict, upsert=True, parent="person", parent_key="person_id", delete=TableSpec.PRUNE),
+			TableSpec("person_external_id", self.table_person_external_id, self.person_external_id_columns, self.person_external_id_on_conflict, upsert=True, parent="person", parent_key="person_id", delete=TableSpec.PRUNE),
+			TableSpec("person_also_known_as", self.table_person_also_known_as, self.person_also_known_as_columns, self.person_also_known_as_on_conflict, upsert=True, parent="person", parent_key="person_id", delete=TableSpec.PRUNE),
+		]
+
+		# Fingerprints of the loaded persons, saved once they are indexed
+		self.fingerprints = FingerprintStore(db_client=self.db_client, table=self.table_sync_fingerprint, type=self.flow_name, specs=self.tables, filter_references=self.fk_filter_mode == "sql", logger=self.logger)
 
 	@task(cache_policy=None)
 	def prune(self):
@@ -53,7 +60,9 @@ class PersonConfig(Config):
 					conn.autocommit = False
 					try:
 						cursor.execute(f"DELETE FROM {self.table_person} WHERE id IN %s", (tuple(self.extra_persons),))
+						self.fingerprints.delete(cursor, self.extra_persons)
 						conn.commit()
+						self.reference_ids.discard(self.table_person, self.extra_persons)
 					except:
 						conn.rollback()
 						raise
@@ -74,151 +83,10 @@ class PersonConfig(Config):
 
 
 	@task(cache_policy=None)
-	def push(self, person_csv: CSVFile, person_translation_csv: CSVFile, person_image_csv: CSVFile, person_external_id_csv: CSVFile, person_also_known_as_csv: CSVFile):
+	def push(self, rows: dict[str, RowBuffer]):
 		"""Push the persons to the database"""
-		conn = self.db_client.get_connection()
 		try:
-			# Clean duplicates from the CSV files
-			person_csv.clean_duplicates(conflict_columns=self.person_on_conflict)
-			person_translation_csv.clean_duplicates(conflict_columns=self.person_translation_on_conflict)
-			person_image_csv.clean_duplicates(conflict_columns=self.person_image_on_conflict)
-			person_external_id_csv.clean_duplicates(conflict_columns=self.person_external_id_on_conflict)
-			person_also_known_as_csv.clean_duplicates(conflict_columns=self.person_also_known_as_on_conflict)
-
-			with conn.cursor() as cursor:
-				try:
-					conn.autocommit = False
-					temp_person = f"{self.table_person.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-					temp_person_translation = f"{self.table_person_translation.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-					temp_person_image = f"{self.table_person_image.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-					temp_person_external_id = f"{self.table_person_external_id.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-					temp_person_also_known_as = f"{self.table_person_also_known_as.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-
-					cursor.execute(f"""
-						CREATE TEMP TABLE {temp_person} (LIKE {self.table_person} INCLUDING ALL);
-						CREATE TEMP TABLE {temp_person_translation} (LIKE {self.table_person_translation} INCLUDING ALL);
-						CREATE TEMP TABLE {temp_person_image} (LIKE {self.table_person_image} INCLUDING ALL);
-						CREATE TEMP TABLE {temp_person_external_id} (LIKE {self.table_person_external_id} INCLUDING ALL);
-						CREATE TEMP TABLE {temp_person_also_known_as} (LIKE {self.table_person_also_known_as} INCLUDING ALL);
-					""")
-
-					with open(person_csv.file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_person} ({','.join(self.person_columns)}) FROM STDIN WITH CSV HEADER", f)
-					with open(person_translation_csv.file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_person_translation} ({','.join(self.person_translation_columns)}) FROM STDIN WITH CSV HEADER", f)
-					with open(person_image_csv.file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_person_image} ({','.join(self.person_image_columns)}) FROM STDIN WITH CSV HEADER", f)
-					with open(person_external_id_csv.file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_person_external_id} ({','.join(self.person_external_id_columns)}) FROM STDIN WITH CSV HEADER", f)
-					with open(person_also_known_as_csv.file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_person_also_known_as} ({','.join(self.person_also_known_as_columns)}) FROM STDIN WITH CSV HEADER", f)
-
-					insert_into(
-						cursor=cursor,
-						table=self.table_person,
-						temp_table=temp_person,
-						columns=self.person_columns,
-						on_conflict=self.person_on_conflict,
-						on_conflict_update=self.person_on_conflict_update
-					)
-
-					insert_into(
-						cursor=cursor,
-						table=self.table_person_translation,
-						temp_table=temp_person_translation,
-						columns=self.person_translation_columns,
-						on_conflict=self.person_translation_on_conflict,
-						on_conflict_update=self.person_translation_on_conflict_update
-					)
-
-					insert_into(
-						cursor=cursor,
-						table=self.table_person_image,
-						temp_table=temp_person_image,
-						columns=self.person_image_columns,
-						on_conflict=self.person_image_on_conflict,
-						on_conflict_update=self.person_image_on_conflict_update
-					)
-
-					insert_into(
-						cursor=cursor,
-						table=self.table_person_external_id,
-						temp_table=temp_person_external_id,
-						columns=self.person_external_id_columns,
-						on_conflict=self.person_external_id_on_conflict,
-						on_conflict_update=self.person_external_id_on_conflict_update
-					)
-
-					insert_into(
-						cursor=cursor,
-						table=self.table_person_also_known_as,
-						temp_table=temp_person_also_known_as,
-						columns=self.person_also_known_as_columns,
-						on_conflict=self.person_also_known_as_on_conflict,
-						on_conflict_update=self.person_also_known_as_on_conflict_update
-					)
-
-					# Delete outdated  translations
-					cursor.execute(f"""
-						DELETE FROM {self.table_person_translation}
-						WHERE ({','.join(self.person_translation_on_conflict)}) NOT IN (
-							SELECT {','.join(self.person_translation_on_conflict)}
-							FROM {temp_person_translation}
-						)
-						AND person_id IN (
-							SELECT id FROM {temp_person}
-						);
-					""")
-
-					# Delete outdated images
-					cursor.execute(f"""
-						DELETE FROM {self.table_person_image}
-						WHERE ({','.join(self.person_image_on_conflict)}) NOT IN (
-							SELECT {','.join(self.person_image_on_conflict)}
-							FROM {temp_person_image}
-						)
-						AND person_id IN (
-							SELECT id FROM {temp_person}
-						);
-					""")
-
-					# Delete outdated external ids
-					cursor.execute(f"""
-						DELETE FROM {self.table_person_external_id}
-						WHERE ({','.join(self.person_external_id_on_conflict)}) NOT IN (
-							SELECT {','.join(self.person_external_id_on_conflict)}
-							FROM {temp_person_external_id}
-						)
-						AND person_id IN (
-							SELECT id FROM {temp_person}
-						);
-					""")
-
-					# Delete outdated also known as
-					cursor.execute(f"""
-						DELETE FROM {self.table_person_also_known_as}
-						WHERE ({','.join(self.person_also_known_as_on_conflict)}) NOT IN (
-							SELECT {','.join(self.person_also_known_as_on_conflict)}
-							FROM {temp_person_also_known_as}
-						)
-						AND person_id IN (
-							SELECT id FROM {temp_person}
-						);
-					""")
-				
-					conn.commit()
-
-					person_csv.delete()
-					person_translation_csv.delete()
-					person_image_csv.delete()
-					person_external_id_csv.delete()
-					person_also_known_as_csv.delete()
-				except Exception as e:
-					conn.rollback()
-					raise
-				finally:
-					conn.autocommit = True
+			load_tables(self.db_client, self.tables, rows, parallelism=self.load_parallelism, mode=self.load_merge_mode)
+			self.reference_ids.add(self.table_person, rows["person"].column("id"))
 		except Exception as e:
 			raise ValueError(f"Failed to push persons to the database: {e}")
-		finally:
-			self.db_client.return_connection(conn)
@@ -3,7 +3,7 @@
 # ---------------------------------------------------------------------------- #
 
 from datetime import date
-from more_itertools import chunked
+from functools import partial
 import gc
 
 # ---------------------------------- Prefect --------------------------------- #
@@ -12,7 +12,11 @@ from prefect.logging import get_run_logger
 
 from .config import PersonConfig
 from .mapper import Mapper
-from ...models.csv_file import CSVFile
+from ...models.export_snapshot import PopularityUpdate
+from ...models.row_buffer import RowBuffer
+from ...models.tmdb_fetcher import TMDBNotFoundError
+from ...utils.loader import new_buffers
+from ...utils.retry import process_with_retry_pass
 
 # ---------------------------------------------------------------------------- #
 
@@ -20,17 +24,6 @@ from ...models.csv_file import CSVFile
 #                                    Getters                                   #
 # ---------------------------------------------------------------------------- #
 
-def get_db_persons(config: PersonConfig) -> set:
-	conn = config.db_client.get_connection()
-	try:
-		with conn.cursor() as cursor:
-			cursor.execute(f"SELECT id FROM {config.table_person}")
-			return {item[0] for item in cursor}
-	except Exception as e:
-		raise ValueError(f"Failed to get database persons: {e}")
-	finally:
-		config.db_client.return_connection(conn)
-	
 def get_tmdb_persons_changed(config: PersonConfig):
 	try:
 		config.logger.info("Getting changed persons...")
@@ -39,76 +32,111 @@ def get_tmdb_persons_changed(config: PersonConfig):
 	except Exception as e:
 		raise ValueError(f"Failed to get changed persons: {e}")
 
-@task(cache_policy=None, log_prints=False)
-def get_tmdb_person_details(config: PersonConfig, person_id: int) -> dict:
+async def get_tmdb_person_details(config: PersonConfig, person_id: int) -> dict:
 	try:
 		# Get persons details from TMDB in the default language and the extra languages
-		person = config.tmdb_client.request(f"person/{person_id}", {"append_to_response": "images,external_ids,translations"})
+		person = await config.tmdb_client.fetcher.get(f"person/{person_id}", {"append_to_response": "images,external_ids,translations"})
 
 		return person
-	except Exception as e:
-		config.logger.error(f"Failed to get person details for {person_id}: {e}")
+	except TMDBNotFoundError:
+		# Deleted from TMDB since the export was generated
+		config.logger.warning(f"Person {person_id} not found on TMDB")
 		return None
 
 # ---------------------------------------------------------------------------- #
 	
+@task(cache_policy=None)
+def fetch_persons_chunk(config: PersonConfig, chunk: list) -> dict:
+	"""
+	Fetch and map a chunk of persons (first stage of the pipeline).
+	One Prefect task covers the whole chunk, the ids are fetched by the TMDB fetch engine.
+	The batch keeps the ids of the persons that could not be fetched.
+	"""
+	failed: set = set()
+	unchanged: set = set()
+	rows: dict[str, RowBuffer] = new_buffers(config.tables)
+	fingerprints = config.fingerprints.get(chunk)
+
+	typesense_documents = []
+	fingerprint_rows = []
+
+	for person_id, person_details in config.tmdb_client.fetch_many(partial(get_tmdb_person_details, config), chunk):
+		if isinstance(person_details, Exception):
+			config.logger.error(f"Failed to get person details for {person_id}: {person_details}")
+			failed.add(person_id)
+			continue
+		if person_details is not None:
+			person_rows = {
+				"person": Mapper.person(person=person_details),
+				"person_translation": Mapper.person_translation(person=person_details),
+				"person_image": Mapper.person_image(person=person_details),
+				"person_external_id": Mapper.person_external_id(person=person_details),
+				"person_also_known_as": Mapper.person_also_known_as(person=person_details),
+			}
+			typesense_document = Mapper.typesense(person=person_details)
+
+			# Skip the person when nothing we store changed since it was last loaded
+			fingerprint = config.fingerprints.compute(person_rows, typesense_document)
+			if fingerprint == fingerprints.get(person_id):
+				unchanged.add(person_id)
+			else:
+				for name, entity_rows in person_rows.items():
+					rows[name].extend(entity_rows)
+				fingerprint_rows.append(config.fingerprints.row(person_id, fingerprint))
+				typesense_documents.append(typesense_document)
+
+		# Release the payload as soon as it is mapped, not when the next one arrives
+		del person_details
+
+	config.logger.info(f"Fetched {len(chunk) - len(failed)}/{len(chunk)} persons ({len(failed)} failed, {len(unchanged)} unchanged)")
+	return {
+		"rows": rows,
+		"typesense_documents": typesense_documents,
+		"fingerprints": fingerprint_rows,
+		"failed": failed,
+	}
+
+def push_persons_chunk(config: PersonConfig, batch: dict) -> dict:
+	"""
+	Push a batch of persons to the database.
+	"""
+	config.logger.info(f"Push persons to the database...")
+	push_future = config.push.submit(rows=batch["rows"])
+	push_future.result(raise_on_failure=True)
+	config.logger.info(f"Succesfully submitted persons to the database")
+	return batch
+
+def index_persons_chunk(config: PersonConfig, batch: dict) -> set:
+	"""
+	Push a batch of persons to Typesense.
+	Returns the ids of the persons that could not be fetched.
+	"""
+	# Push to Typesense
+	if batch["typesense_documents"]:
+		config.logger.info("Upserting persons to Typesense...")
+		config.typesense_client.upsert_documents("persons", batch["typesense_documents"])
+		config.logger.info("Succesfully upserted persons to Typesense")
+
+	# Saved once indexed, so that a person whose indexing failed is loaded and indexed again by the next run
+	config.fingerprints.save(batch["fingerprints"])
+
+	return batch["failed"]
+
 def process_missing_persons(config: PersonConfig):
 	try:
 		if len(config.missing_persons) > 0:
-			chunks = list(chunked(config.missing_persons, 500))
-			for chunk in chunks:
-				person_csv = CSVFile(
-					columns=config.person_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=config.flow_name
-				)
-				person_translation_csv = CSVFile(
-					columns=config.person_translation_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_translation"
-				)
-				person_image_csv = CSVFile(
-					columns=config.person_image_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_image"
-				)
-				person_external_id_csv = CSVFile(
-					columns=config.person_external_id_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_external_ids"
-				)
-				person_also_known_as_csv = CSVFile(
-					columns=config.person_also_known_as_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_also_known_as"
-				)
-
-				typesense_documents = []
-
-				persons_details_futures = get_tmdb_person_details.map(config=config, person_id=chunk)
-
-				for person_details_response in persons_details_futures:
-					person_details = person_details_response.result()
-					if person_details is not None:
-						person_csv.append(rows_data=Mapper.person(person=person_details))
-						person_translation_csv.append(rows_data=Mapper.person_translation(person=person_details))
-						person_image_csv.append(rows_data=Mapper.person_image(person=person_details))
-						person_external_id_csv.append(rows_data=Mapper.person_external_id(person=person_details))
-						person_also_known_as_csv.append(rows_data=Mapper.person_also_known_as(person=person_details))
-
-						# Mapper Typesense
-						typesense_documents.append(Mapper.typesense(person=person_details))
-				
-				config.logger.info(f"Push persons to the database...")
-				push_future = config.push.submit(person_csv=person_csv, person_translation_csv=person_translation_csv, person_image_csv=person_image_csv, person_external_id_csv=person_external_id_csv, person_also_known_as_csv=person_also_known_as_csv)
-				push_future.result(raise_on_failure=True)
-				config.logger.info(f"Succesfully submitted persons to the database")
-
-				# Push to Typesense
-				if typesense_documents:
-					config.logger.info("Upserting persons to Typesense...")
-					config.typesense_client.upsert_documents("persons", typesense_documents)
-					config.logger.info("Succesfully upserted persons to Typesense")
+			failed = process_with_retry_pass(
+				stages=[partial(fetch_persons_chunk, config), partial(push_persons_chunk, config), partial(index_persons_chunk, config)],
+				ids=config.missing_persons,
+				chunk_size=500,
+				logger=config.logger,
+				name="persons",
+			)
+			config.logger.info(f"TMDB requests: {config.tmdb_client.request_stats()}")
+			config.logger.info(f"TMDB API keys usage: {config.tmdb_client.rate_limit_usage()}")
+			config.logger.info(f"TMDB concurrency limits: {config.tmdb_client.concurrency_limits()}")
+			return failed
+		return set()
 
 	except Exception as e:
 		raise ValueError(f"Failed to process missing persons: {e}")
@@ -126,19 +154,15 @@ def sync_tmdb_person(date: date = date.today(), update_popularity: bool = True):
 		# Get the list of person from TMDB and the database
 		config.log_manager.fetching_data()
 		tmdb_persons_df = config.tmdb_client.get_export_ids(type="person", date=config.date)
-		tmdb_persons_set = set(tmdb_persons_df["id"])
-		if update_popularity and 'popularity' in tmdb_persons_df.columns:
-			tmdb_persons_popularity = tmdb_persons_df.set_index('id')['popularity'].to_dict()
-		else:
-			tmdb_persons_popularity = {}
-		db_persons_set = get_db_persons(config)
+
+		# Compare the persons with the previous export snapshot (or the database) and process missing persons
+		config.extra_persons, config.missing_persons, tmdb_persons_popularity = config.diff_export(type="person", table_name=config.table_person, export=tmdb_persons_df)
+		if not update_popularity:
+			tmdb_persons_popularity = PopularityUpdate.empty()
 
 		del tmdb_persons_df
 		gc.collect()
 
-		# Compare the persons and process missing persons
-		config.extra_persons = db_persons_set - tmdb_persons_set
-		config.missing_persons = tmdb_persons_set - db_persons_set
 		get_tmdb_persons_changed(config)
 		logger.info(f"Found {len(config.extra_persons)} extra persons and {len(config.missing_persons)} missing persons")
 		config.log_manager.data_fetched()
@@ -146,7 +170,7 @@ def sync_tmdb_person(date: date = date.today(), update_popularity: bool = True):
 		# Sync the persons to the database
 		config.log_manager.syncing_to_db()
 		config.prune()
-		process_missing_persons(config=config)
+		failed_persons = process_missing_persons(config=config)
 
 		if update_popularity:
 			config.log_manager.updating_popularity()
@@ -155,6 +179,8 @@ def sync_tmdb_person(date: date = date.today(), update_popularity: bool = True):
 				table_name=config.table_person,
 				content_type=config.flow_name,
 			)
+		# Saved even when the popularity is not updated, the next run then compares with the previous popularity
+		config.save_export_snapshot(type="person", failed=failed_persons, popularity_updated=update_popularity)
 		
 		config.log_manager.success()
 	except Exception as e:
@@ -1,9 +1,11 @@
 from datetime import date
 from prefect import task
-import uuid
 from ...models.config import Config
-from ...models.csv_file import CSVFile
-from ...utils.db import insert_into
+from ...models.fingerprint import FingerprintStore
+from ...models.reference_ids import AllIds, IdBitmap
+from ...models.row_buffer import RowBuffer
+from ...models.table_spec import TableSpec
+from ...utils.loader import load_tables
 
 class SerieConfig(Config):
 	def __init__(self, date: date):
@@ -13,12 +15,12 @@ class SerieConfig(Config):
 		# Data
 		self.db_languages: set = None
 		self.db_countries: set = None
-		self.db_genres: set = None
-		self.db_keywords: set = None
-		self.db_collections: set = None
-		self.db_companies: set = None
-		self.db_persons: set = None
-		self.db_networks: set = None
+		self.db_genres: IdBitmap | AllIds = None
+		self.db_keywords: IdBitmap | AllIds = None
+		self.db_collections: IdBitmap | AllIds = None
+		self.db_companies: IdBitmap | AllIds = None
+		self.db_persons: IdBitmap | AllIds = None
+		self.db_networks: IdBitmap | AllIds = None
 
 		self.tmp_credit_ids: set = set()
 
@@ -59,6 +61,7 @@ class SerieConfig(Config):
 		self.table_network: str = self.config.get("db_tables", {}).get("network", "tmdb.network")
 		self.table_company: str = self.config.get("db_tables", {}).get("company", "tmdb.company")
 		self.table_person: str = self.config.get("db_tables", {}).get("person", "tmdb.person")
+		self.table_sync_fingerprint: str = self.config.get("db_tables", {}).get("sync_fingerprint", "tmdb.sync_fingerprint")
 
 		# Ids
 		self.extra_series: set = None
@@ -119,52 +122,55 @@ class SerieConfig(Config):
 		# Episodes
 		self.serie_episode_on_conflict: list[str] = ["id"]
 		self.serie_episode_credits_on_conflict: list[str] = ["credit_id", "tv_episode_id"]
-		# On conflict update
-		self.serie_on_conflict_update: list[str] = [col for col in self.serie_columns if col not in self.serie_on_conflict]
-		self.serie_alternative_titles_on_conflict_update: list[str] = [col for col in self.serie_alternative_titles_columns if col not in self.serie_alternative_titles_on_conflict]
-		self.serie_content_ratings_on_conflict_update: list[str] = [col for col in self.serie_content_ratings_columns if col not in self.serie_content_ratings_on_conflict]
-		self.serie_external_ids_on_conflict_update: list[str] = [col for col in self.serie_external_ids_columns if col not in self.serie_external_ids_on_conflict]
-		self.serie_genres_on_conflict_update: list[str] = [col for col in self.serie_genres_columns if col not in self.serie_genres_on_conflict]
-		self.serie_images_on_conflict_update: list[str] = [col for col in self.serie_images_columns if col not in self.serie_images_on_conflict]
-		self.serie_keywords_on_conflict_update: list[str] = [col for col in self.serie_keywords_columns if col not in self.serie_keywords_on_conflict]
-		self.serie_languages_on_conflict_update: list[str] = [col for col in self.serie_languages_columns if col not in self.serie_languages_on_conflict]
-		self.serie_networks_on_conflict_update: list[str] = [col for col in self.serie_networks_columns if col not in self.serie_networks_on_conflict]
-		self.serie_origin_country_on_conflict_update: list[str] = [col for col in self.serie_origin_country_columns if col not in self.serie_origin_country_on_conflict]
-		self.serie_production_companies_on_conflict_update: list[str] = [col for col in self.serie_production_companies_columns if col not in self.serie_production_companies_on_conflict]
-		self.serie_production_countries_on_conflict_update: list[str] = [col for col in self.serie_production_countries_columns if col not in self.serie_production_countries_on_conflict]
-		self.serie_spoken_languages_on_conflict_update: list[str] = [col for col in self.serie_spoken_languages_columns if col not in self.serie_spoken_languages_on_conflict]
-		self.serie_translations_on_conflict_update: list[str] = [col for col in self.serie_translations_columns if col not in self.serie_translations_on_conflict]
-		self.serie_videos_on_conflict_update: list[str] = [col for col in self.serie_videos_columns if col not in self.serie_videos_on_conflict]
-		self.serie_credits_on_conflict_update: list[str] = [col for col in self.serie_credits_columns if col not in self.serie_credits_on_conflict]
-		self.serie_roles_on_conflict_update: list[str] = [col for col in self.serie_roles_columns if col not in self.serie_roles_on_conflict]
 
-		# Seasons
-		self.serie_season_on_conflict_update: list[str] = [col for col in self.serie_season_columns if col not in self.serie_season_on_conflict]
-		self.serie_season_credits_on_conflict_update: list[str] = [col for col in self.serie_season_credits_columns if col not in self.serie_season_credits_on_conflict]
-		self.serie_season_translations_on_conflict_update: list[str] = [col for col in self.serie_season_translations_columns if col not in self.serie_season_translations_on_conflict]
+		# Tables, in load order
+		self.tables: list[TableSpec] = [
+			TableSpec("serie", self.table_serie, self.serie_columns, self.serie_on_conflict, upsert=True),
+			TableSpec("serie_alternative_titles", self.table_serie_alternative_titles, self.serie_alternative_titles_columns, self.serie_alternative_titles_on_conflict, parent="serie", parent_key="tv_series_id", delete=TableSpec.REPLACE),
+			TableSpec("serie_content_ratings", self.table_serie_content_ratings, self.serie_content_ratings_columns, self.serie_content_ratings_on_conflict, parent="serie", parent_key="tv_series_id", delete=TableSpec.REPLACE),
+			TableSpec("serie_external_ids", self.table_serie_external_ids, self.serie_external_ids_columns, self.serie_external_ids_on_conflict, parent="serie", parent_key="tv_series_id", delete=TableSpec.REPLACE),
+			TableSpec("serie_genres", self.table_serie_genres, self.serie_genres_columns, self.serie_genres_on_conflict, parent="serie", parent_key="tv_series_id", delete=TableSpec.REPLACE, references={"genre_id": self.table_genre}),
+			TableSpec("serie_images", self.table_serie_images, self.serie_images_columns, self.serie_images_on_conflict, parent="serie", parent_key="tv_series_id", delete=TableSpec.REPLACE),
+			TableSpec("serie_keywords", self.table_serie_keywords, self.serie_keywords_columns, self.serie_keywords_on_conflict, parent="serie", parent_key="tv_series_id", delete=TableSpec.REPLACE, references={"keyword_id": self.table_keyword}),
+			TableSpec("serie_languages", self.table_serie_languages, self.serie_languages_columns, self.serie_languages_on_conflict, parent="serie", parent_key="tv_series_id", delete=TableSpec.REPLACE),
+			TableSpec("serie_networks", self.table_serie_networks, self.serie_networks_columns, self.serie_networks_on_conflict, parent="serie", parent_key="tv_series_id", delete=TableSpec.REPLACE, references={"network_id": self.table_network}),
+			TableSpec("serie_origin_country", self.table_serie_origin_country, self.serie_origin_country_columns, self.serie_origin_country_on_conflict, parent="serie", parent_key="tv_series_id", delete=TableSpec.REPLACE),
+			TableSpec("serie_production_companies", self.table_serie_production_companies, self.serie_production_companies_columns, self.serie_production_companies_on_conflict, parent="serie", parent_key="tv_series_id", delete=TableSpec.REPLACE, references={"company_id": self.table_company}),
+			TableSpec("serie_production_countries", self.table_serie_production_countries, self.serie_production_countries_columns, self.serie_production_countries_on_conflict, parent="serie", parent_key="tv_series_id", delete=TableSpec.REPLACE),
+			TableSpec("serie_spoken_languages", self.table_serie_spoken_languages, self.serie_spoken_languages_columns, self.serie_spoken_languages_on_conflict, parent="serie", parent_key="tv_series_id", delete=TableSpec.REPLACE),
+			TableSpec("serie_translations", self.table_serie_translations, self.serie_translations_columns, self.serie_translations_on_conflict, parent="serie", parent_key="tv_series_id", delete=TableSpec.REPLACE),
+			TableSpec("serie_videos", self.table_serie_videos, self.serie_videos_columns, self.serie_videos_on_conflict, parent="serie", parent_key="tv_series_id", delete=TableSpec.REPLACE),
+			TableSpec("serie_credits", self.table_serie_credits, self.serie_credits_columns, self.serie_credits_on_conflict, parent="serie", parent_key="tv_series_id", delete=TableSpec.REPLACE, references={"person_id": self.table_person}),
+			TableSpec("serie_roles", self.table_serie_roles, self.serie_roles_columns, self.serie_roles_on_conflict, references={"credit_id": self.table_serie_credits}),
+
+			# Seasons
+			TableSpec("serie_season", self.table_serie_season, self.serie_season_columns, self.serie_season_on_conflict, upsert=True, key_columns=["tv_series_id", "season_number"], before_insert=self.replace_seasons_and_episodes),
+			TableSpec("serie_season_credits", self.table_serie_season_credits, self.serie_season_credits_columns, self.serie_season_credits_on_conflict, parent="serie_season", parent_key="tv_season_id", delete=TableSpec.REPLACE, references={"credit_id": self.table_serie_credits}),
+			TableSpec("serie_season_translations", self.table_serie_season_translations, self.serie_season_translations_columns, self.serie_season_translations_on_conflict, parent="serie_season", parent_key="tv_season_id", delete=TableSpec.REPLACE),
+
+			# Episodes
+			TableSpec("serie_episode", self.table_serie_episode, self.serie_episode_columns, self.serie_episode_on_conflict, upsert=True, key_columns=["tv_season_id", "episode_number"]),
+			TableSpec("serie_episode_credits", self.table_serie_episode_credits, self.serie_episode_credits_columns, self.serie_episode_credits_on_conflict, parent="serie_episode", parent_key="tv_episode_id", delete=TableSpec.REPLACE, references={"credit_id": self.table_serie_credits}),
+		]
+
+		# Fingerprints of the loaded series, saved once they are indexed
+		self.fingerprints = FingerprintStore(db_client=self.db_client, table=self.table_sync_fingerprint, type=self.flow_name, specs=self.tables, filter_references=self.fk_filter_mode == "sql", logger=self.logger)
 
-		# Episodes
-		self.serie_episode_on_conflict_update: list[str] = [col for col in self.serie_episode_columns if col not in self.serie_episode_on_conflict]
-		self.serie_episode_credits_on_conflict_update: list[str] = [col for col in self.serie_episode_credits_columns if col not in self.serie_episode_credits_on_conflict]
-	
 	@task(cache_policy=None)
 	def get_db_data(self):
-		"""Get the data from the database"""
+		"""Get the ids of the reference tables, shared with the other subflows"""
 		try:
-			db_languages = self.db_client.get_table(table_name=self.table_language, columns=["iso_639_1"])
-			self.db_languages = set([item[0] for item in db_languages])
-			db_countries = self.db_client.get_table(table_name=self.table_country, columns=["iso_3166_1"])
-			self.db_countries = set([item[0] for item in db_countries])
-			db_genres = self.db_client.get_table(table_name=self.table_genre, columns=["id"])
-			self.db_genres = set([item[0] for item in db_genres])
-			db_keywords = self.db_client.get_table(table_name=self.table_keyword, columns=["id"])
-			self.db_keywords = set([item[0] for item in db_keywords])
-			db_networks = self.db_client.get_table(table_name=self.table_network, columns=["id"])
-			self.db_networks = set([item[0] for item in db_networks])
-			db_companies = self.db_client.get_table(table_name=self.table_company, columns=["id"])
-			self.db_companies = set([item[0] for item in db_companies])
-			db_persons = self.db_client.get_table(table_name=self.table_person, columns=["id"])
-			self.db_persons = set([item[0] for item in db_persons])
+			self.db_languages = self.reference_ids.get(self.table_language, column="iso_639_1")
+			self.db_countries = self.reference_ids.get(self.table_country, column="iso_3166_1")
+			if self.fk_filter_mode == "sql":
+				# Filtered by the merge, the mappers keep every row
+				self.db_genres = self.db_keywords = self.db_networks = self.db_companies = self.db_persons = AllIds()
+			else:
+				self.db_genres = self.reference_ids.get(self.table_genre)
+				self.db_keywords = self.reference_ids.get(self.table_keyword)
+				self.db_networks = self.reference_ids.get(self.table_network)
+				self.db_companies = self.reference_ids.get(self.table_company)
+				self.db_persons = self.reference_ids.get(self.table_person)
 		except Exception as e:
 			raise ValueError(f"Failed to get the data from the database: {e}")
 	@task(cache_policy=None)
@@ -178,7 +184,9 @@ class SerieConfig(Config):
 					conn.autocommit = False
 					try:
 						cursor.execute(f"DELETE FROM {self.table_serie} WHERE id IN %s", (tuple(self.extra_series),))
+						self.fingerprints.delete(cursor, self.extra_series)
 						conn.commit()
+						self.reference_ids.discard(self.table_serie, self.extra_series)
 					except:
 						conn.rollback()
 						raise
@@ -197,548 +205,76 @@ class SerieConfig(Config):
 			raise ValueError(f"Failed to prune extra series from Typesense: {e}")
 
 	@task(cache_policy=None)
-	def push(self, csv: dict[str, CSVFile]):
+	def push(self, rows: dict[str, RowBuffer]):
 		"""Push the series to the database"""
-		conn = self.db_client.get_connection()
 		try:
-			# Clean duplicates from the CSV files
-			csv["serie"].clean_duplicates(conflict_columns=self.serie_on_conflict)
-			csv["serie_alternative_titles"].clean_duplicates(conflict_columns=self.serie_alternative_titles_on_conflict)
-			csv["serie_content_ratings"].clean_duplicates(conflict_columns=self.serie_content_ratings_on_conflict)
-			csv["serie_external_ids"].clean_duplicates(conflict_columns=self.serie_external_ids_on_conflict)
-			csv["serie_genres"].clean_duplicates(conflict_columns=self.serie_genres_on_conflict)
-			csv["serie_images"].clean_duplicates(conflict_columns=self.serie_images_on_conflict)
-			csv["serie_keywords"].clean_duplicates(conflict_columns=self.serie_keywords_on_conflict)
-			csv["serie_languages"].clean_duplicates(conflict_columns=self.serie_languages_on_conflict)
-			csv["serie_networks"].clean_duplicates(conflict_columns=self.serie_networks_on_conflict)
-			csv["serie_origin_country"].clean_duplicates(conflict_columns=self.serie_origin_country_on_conflict)
-			csv["serie_production_companies"].clean_duplicates(conflict_columns=self.serie_production_companies_on_conflict)
-			csv["serie_production_countries"].clean_duplicates(conflict_columns=self.serie_production_countries_on_conflict)
-			csv["serie_spoken_languages"].clean_duplicates(conflict_columns=self.serie_spoken_languages_on_conflict)
-			csv["serie_translations"].clean_duplicates(conflict_columns=self.serie_translations_on_conflict)
-			csv["serie_videos"].clean_duplicates(conflict_columns=self.serie_videos_on_conflict)
-			csv["serie_credits"].clean_duplicates(conflict_columns=self.serie_credits_on_conflict)
-			csv["serie_roles"].clean_duplicates(conflict_columns=self.serie_roles_on_conflict)
-			csv["serie_season"].clean_duplicates(conflict_columns=["tv_series_id", "season_number"])
-			csv["serie_season_credits"].clean_duplicates(conflict_columns=self.serie_season_credits_on_conflict)
-			csv["serie_season_translations"].clean_duplicates(conflict_columns=self.serie_season_translations_on_conflict)
-			csv["serie_episode"].clean_duplicates(conflict_columns=["tv_season_id", "episode_number"])
-			csv["serie_episode_credits"].clean_duplicates(conflict_columns=self.serie_episode_credits_on_conflict)
-
-			with conn.cursor() as cursor:
-				try:
-					conn.autocommit = False
-
-					temp_serie = f"{self.table_serie.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-					temp_serie_alternative_titles = f"{self.table_serie_alternative_titles.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-					temp_serie_content_ratings = f"{self.table_serie_content_ratings.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-					temp_serie_external_ids = f"{self.table_serie_external_ids.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-					temp_serie_genres = f"{self.table_serie_genres.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-					temp_serie_images = f"{self.table_serie_images.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-					temp_serie_keywords = f"{self.table_serie_keywords.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-					temp_serie_languages = f"{self.table_serie_languages.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-					temp_serie_networks = f"{self.table_serie_networks.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-					temp_serie_origin_country = f"{self.table_serie_origin_country.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-					temp_serie_production_companies = f"{self.table_serie_production_companies.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-					temp_serie_production_countries = f"{self.table_serie_production_countries.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-					temp_serie_spoken_languages = f"{self.table_serie_spoken_languages.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-					temp_serie_translations = f"{self.table_serie_translations.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-					temp_serie_videos = f"{self.table_serie_videos.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-					temp_serie_credits = f"{self.table_serie_credits.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-					temp_serie_roles = f"{self.table_serie_roles.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-					temp_serie_season = f"{self.table_serie_season.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-					temp_serie_season_credits = f"{self.table_serie_season_credits.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-					temp_serie_season_translations = f"{self.table_serie_season_translations.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-					temp_serie_episode = f"{self.table_serie_episode.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-					temp_serie_episode_credits = f"{self.table_serie_episode_credits.replace('.', '_')}_temp_{uuid.uuid4().hex}"
-
-					cursor.execute(f"""
-						CREATE TEMP TABLE {temp_serie} (LIKE {self.table_serie} INCLUDING ALL);
-						CREATE TEMP TABLE {temp_serie_alternative_titles} (LIKE {self.table_serie_alternative_titles} INCLUDING ALL);
-						CREATE TEMP TABLE {temp_serie_content_ratings} (LIKE {self.table_serie_content_ratings} INCLUDING ALL);
-						CREATE TEMP TABLE {temp_serie_external_ids} (LIKE {self.table_serie_external_ids} INCLUDING ALL);
-						CREATE TEMP TABLE {temp_serie_genres} (LIKE {self.table_serie_genres} INCLUDING ALL);
-						CREATE TEMP TABLE {temp_serie_images} (LIKE {self.table_serie_images} INCLUDING ALL);
-						CREATE TEMP TABLE {temp_serie_keywords} (LIKE {self.table_serie_keywords} INCLUDING ALL);
-						CREATE TEMP TABLE {temp_serie_languages} (LIKE {self.table_serie_languages} INCLUDING ALL);
-						CREATE TEMP TABLE {temp_serie_networks} (LIKE {self.table_serie_networks} INCLUDING ALL);
-						CREATE TEMP TABLE {temp_serie_origin_country} (LIKE {self.table_serie_origin_country} INCLUDING ALL);
-						CREATE TEMP TABLE {temp_serie_production_companies} (LIKE {self.table_serie_production_companies} INCLUDING ALL);
-						CREATE TEMP TABLE {temp_serie_production_countries} (LIKE {self.table_serie_production_countries} INCLUDING ALL);
-						CREATE TEMP TABLE {temp_serie_spoken_languages} (LIKE {self.table_serie_spoken_languages} INCLUDING ALL);
-						CREATE TEMP TABLE {temp_serie_translations} (LIKE {self.table_serie_translations} INCLUDING ALL);
-						CREATE TEMP TABLE {temp_serie_videos} (LIKE {self.table_serie_videos} INCLUDING ALL);
-						CREATE TEMP TABLE {temp_serie_credits} (LIKE {self.table_serie_credits} INCLUDING ALL);
-						CREATE TEMP TABLE {temp_serie_roles} (LIKE {self.table_serie_roles} INCLUDING ALL);
-						CREATE TEMP TABLE {temp_serie_season} (LIKE {self.table_serie_season} INCLUDING ALL);
-						CREATE TEMP TABLE {temp_serie_season_credits} (LIKE {self.table_serie_season_credits} INCLUDING ALL);
-						CREATE TEMP TABLE {temp_serie_season_translations} (LIKE {self.table_serie_season_translations} INCLUDING ALL);
-						CREATE TEMP TABLE {temp_serie_episode} (LIKE {self.table_serie_episode} INCLUDING ALL);
-						CREATE TEMP TABLE {temp_serie_episode_credits} (LIKE {self.table_serie_episode_credits} INCLUDING ALL);
-					""")
-
-					with open(csv["serie"].file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_serie} ({','.join(self.serie_columns)}) FROM STDIN WITH CSV HEADER", f)
-					with open(csv["serie_alternative_titles"].file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_serie_alternative_titles} ({','.join(self.serie_alternative_titles_columns)}) FROM STDIN WITH CSV HEADER", f)
-					with open(csv["serie_content_ratings"].file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_serie_content_ratings} ({','.join(self.serie_content_ratings_columns)}) FROM STDIN WITH CSV HEADER", f)
-					with open(csv["serie_external_ids"].file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_serie_external_ids} ({','.join(self.serie_external_ids_columns)}) FROM STDIN WITH CSV HEADER", f)
-					with open(csv["serie_genres"].file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_serie_genres} ({','.join(self.serie_genres_columns)}) FROM STDIN WITH CSV HEADER", f)
-					with open(csv["serie_images"].file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_serie_images} ({','.join(self.serie_images_columns)}) FROM STDIN WITH CSV HEADER", f)
-					with open(csv["serie_keywords"].file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_serie_keywords} ({','.join(self.serie_keywords_columns)}) FROM STDIN WITH CSV HEADER", f)
-					with open(csv["serie_languages"].file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_serie_languages} ({','.join(self.serie_languages_columns)}) FROM STDIN WITH CSV HEADER", f)
-					with open(csv["serie_networks"].file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_serie_networks} ({','.join(self.serie_networks_columns)}) FROM STDIN WITH CSV HEADER", f)
-					with open(csv["serie_origin_country"].file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_serie_origin_country} ({','.join(self.serie_origin_country_columns)}) FROM STDIN WITH CSV HEADER", f)
-					with open(csv["serie_production_companies"].file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_serie_production_companies} ({','.join(self.serie_production_companies_columns)}) FROM STDIN WITH CSV HEADER", f)
-					with open(csv["serie_production_countries"].file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_serie_production_countries} ({','.join(self.serie_production_countries_columns)}) FROM STDIN WITH CSV HEADER", f)
-					with open(csv["serie_spoken_languages"].file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_serie_spoken_languages} ({','.join(self.serie_spoken_languages_columns)}) FROM STDIN WITH CSV HEADER", f)
-					with open(csv["serie_translations"].file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_serie_translations} ({','.join(self.serie_translations_columns)}) FROM STDIN WITH CSV HEADER", f)
-					with open(csv["serie_videos"].file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_serie_videos} ({','.join(self.serie_videos_columns)}) FROM STDIN WITH CSV HEADER", f)
-					with open(csv["serie_credits"].file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_serie_credits} ({','.join(self.serie_credits_columns)}) FROM STDIN WITH CSV HEADER", f)
-					with open(csv["serie_roles"].file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_serie_roles} ({','.join(self.serie_roles_columns)}) FROM STDIN WITH CSV HEADER", f)
-					with open(csv["serie_season"].file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_serie_season} ({','.join(self.serie_season_columns)}) FROM STDIN WITH CSV HEADER", f)
-					with open(csv["serie_season_credits"].file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_serie_season_credits} ({','.join(self.serie_season_credits_columns)}) FROM STDIN WITH CSV HEADER", f)
-					with open(csv["serie_season_translations"].file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_serie_season_translations} ({','.join(self.serie_season_translations_columns)}) FROM STDIN WITH CSV HEADER", f)
-					with open(csv["serie_episode"].file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_serie_episode} ({','.join(self.serie_episode_columns)}) FROM STDIN WITH CSV HEADER", f)
-					with open(csv["serie_episode_credits"].file_path, "r") as f:
-						cursor.copy_expert(f"COPY {temp_serie_episode_credits} ({','.join(self.serie_episode_credits_columns)}) FROM STDIN WITH CSV HEADER", f)
-
-					# Delete all outdated alternative titles before inserting
-					cursor.execute(f"""
-						DELETE FROM {self.table_serie_alternative_titles}
-						WHERE {self.serie_alternative_titles_columns[0]} IN (
-							SELECT id FROM {temp_serie}
-						);
-					""")
-
-					# Delete all outdated content ratings before inserting
-					cursor.execute(f"""
-						DELETE FROM {self.table_serie_content_ratings}
-						WHERE {self.serie_content_ratings_columns[0]} IN (
-							SELECT id FROM {temp_serie}
-						);
-					""")
-
-					# Delete all outdated external ids before inserting
-					cursor.execute(f"""
-						DELETE FROM {self.table_serie_external_ids}
-						WHERE {self.serie_external_ids_columns[0]} IN (
-							SELECT id FROM {temp_serie}
-						);
-					""")
-
-					# Delete all outdated genres before inserting
-					cursor.execute(f"""
-						DELETE FROM {self.table_serie_genres}
-						WHERE {self.serie_genres_columns[0]} IN (
-							SELECT id FROM {temp_serie}
-						);
-					""")
-
-					# Delete all outdated images before inserting
-					cursor.execute(f"""
-						DELETE FROM {self.table_serie_images}
-						WHERE {self.serie_images_columns[0]} IN (
-							SELECT id FROM {temp_serie}
-						);
-					""")
-
-					# Delete all outdated keywords before inserting
-					cursor.execute(f"""
-						DELETE FROM {self.table_serie_keywords}
-						WHERE {self.serie_keywords_columns[0]} IN (
-							SELECT id FROM {temp_serie}
-						);
-					""")
-
-					# Delete all outdated languages before inserting
-					cursor.execute(f"""
-						DELETE FROM {self.table_serie_languages}
-						WHERE {self.serie_languages_columns[0]} IN (
-							SELECT id FROM {temp_serie}
-						);
-					""")
-
-					# Delete all outdated networks before inserting
-					cursor.execute(f"""
-						DELETE FROM {self.table_serie_networks}
-						WHERE {self.serie_networks_columns[0]} IN (
-							SELECT id FROM {temp_serie}
-						);
-					""")
-
-					# Delete all outdated origin countries before inserting
-					cursor.execute(f"""
-						DELETE FROM {self.table_serie_origin_country}
-						WHERE {self.serie_origin_country_columns[0]} IN (
-							SELECT id FROM {temp_serie}
-						);
-					""")
-					
-					# Delete all outdated production companies before inserting
-					cursor.execute(f"""
-						DELETE FROM {self.table_serie_production_companies}
-						WHERE {self.serie_production_companies_columns[0]} IN (
-							SELECT id FROM {temp_serie}
-						);
-					""")
-
-					# Delete all outdated production countries before inserting
-					cursor.execute(f"""
-						DELETE FROM {self.table_serie_production_countries}
-						WHERE {self.serie_production_countries_columns[0]} IN (
-							SELECT id FROM {temp_serie}
-						);
-					""")
-
-					# Delete all outdated spoken languages before inserting
-					cursor.execute(f"""
-						DELETE FROM {self.table_serie_spoken_languages}
-						WHERE {self.serie_spoken_languages_columns[0]} IN (
-							SELECT id FROM {temp_serie}
-						);
-					""")
-
-					# Delete all outdated translations before inserting
-					cursor.execute(f"""
-						DELETE FROM {self.table_serie_translations}
-						WHERE {self.serie_translations_columns[0]} IN (
-							SELECT id FROM {temp_serie}
-						);
-					""")
-
-					# Delete all outdated videos before inserting
-					cursor.execute(f"""
-						DELETE FROM {self.table_serie_videos}
-						WHERE {self.serie_videos_columns[1]} IN (
-							SELECT id FROM {temp_serie}
-						);
-					""")
-
-					# Delete all outdated credits before inserting
-					cursor.execute(f"""
-						DELETE FROM {self.table_serie_credits}
-						WHERE {self.serie_credits_columns[1]} IN (
-							SELECT id FROM {temp_serie}
-						);
-					""")
-
-					# Delete all outdated seasons before inserting
-					cursor.execute(f"""
-						DELETE FROM {self.table_serie_season}
-						WHERE {self.serie_season_columns[1]} IN (SELECT id FROM {temp_serie})
-							AND NOT EXISTS (
-								SELECT 1 FROM {temp_serie_season} temp
-								WHERE temp.tv_series_id = {self.table_serie_season}.tv_series_id
-								AND temp.season_number = {self.table_serie_season}.season_number
-							);
-					""")
-
-					cursor.execute(f"""
-						DELETE FROM {self.table_serie_episode}
-						WHERE {self.serie_episode_columns[1]} IN (SELECT id FROM {temp_serie_season})
-							AND NOT EXISTS (
-								SELECT 1 FROM {temp_serie_episode} temp
-								WHERE temp.tv_season_id = {self.table_serie_episode}.tv_season_id
-								AND temp.episode_number = {self.table_serie_episode}.episode_number
-							);
-					""")
-
-					cursor.execute(f"""
-						UPDATE {self.table_serie_season} AS s
-						SET id = -s.id
-						FROM {temp_serie} AS ts
-						WHERE s.tv_series_id = ts.id;
-					""")
-
-					cursor.execute(f"""
-						UPDATE {self.table_serie_season} AS s
-						SET id = temp.id
-						FROM {temp_serie_season} AS temp
-						WHERE s.tv_series_id = temp.tv_series_id
-							AND s.season_number = temp.season_number
-							AND s.id < 0;
-					""")
-
-					cursor.execute(f"""
-						UPDATE {self.table_serie_episode} AS e
-						SET id = -e.id
-						FROM {temp_serie_season} AS ts
-						WHERE e.tv_season_id = ts.id;
-					""")
-
-					cursor.execute(f"""
-						UPDATE {self.table_serie_episode} AS e
-						SET id = temp.id
-						FROM {temp_serie_episode} AS temp
-						WHERE e.tv_season_id = temp.tv_season_id
-							AND e.episode_number = temp.episode_number
-							AND e.id < 0;
-					""")
-
-					cursor.execute(f"""
-						DELETE FROM {self.table_serie_season_credits}
-						WHERE {self.serie_season_credits_columns[1]} IN (SELECT id FROM {temp_serie_season});
-					""")
-
-					cursor.execute(f"""
-						DELETE FROM {self.table_serie_season_translations}
-						WHERE {self.serie_season_translations_columns[0]} IN (SELECT id FROM {temp_serie_season});
-					""")
-
-					cursor.execute(f"""
-						DELETE FROM {self.table_serie_episode_credits}
-						WHERE {self.serie_episode_credits_columns[1]} IN (SELECT id FROM {temp_serie_episode});
-					""")
-
-					insert_into(
-						cursor=cursor,
-						table=self.table_serie,
-						temp_table=temp_serie,
-						columns=self.serie_columns,
-						on_conflict=self.serie_on_conflict,
-						on_conflict_update=self.serie_on_conflict_update
-					)
-
-					insert_into(
-						cursor=cursor,
-						table=self.table_serie_alternative_titles,
-						temp_table=temp_serie_alternative_titles,
-						columns=self.serie_alternative_titles_columns,
-						# on_conflict=self.serie_alternative_titles_on_conflict,
-						# on_conflict_update=self.serie_alternative_titles_on_conflict_update
-					)
-
-					insert_into(
-						cursor=cursor,
-						table=self.table_serie_content_ratings,
-						temp_table=temp_serie_content_ratings,
-						columns=self.serie_content_ratings_columns,
-						# on_conflict=self.serie_content_ratings_on_conflict,
-						# on_conflict_update=self.serie_content_ratings_on_conflict_update
-					)
-
-					insert_into(
-						cursor=cursor,
-						table=self.table_serie_external_ids,
-						temp_table=temp_serie_external_ids,
-						columns=self.serie_external_ids_columns,
-						# on_conflict=self.serie_external_ids_on_conflict,
-						# on_conflict_update=self.serie_external_ids_on_conflict_update
-					)
-
-					insert_into(
-						cursor=cursor,
-						table=self.table_serie_genres,
-						temp_table=temp_serie_genres,
-						columns=self.serie_genres_columns,
-						# on_conflict=self.serie_genres_on_conflict,
-						# on_conflict_update=self.serie_genres_on_conflict_update
-					)
-
-					insert_into(
-						cursor=cursor,
-						table=self.table_serie_images,
-						temp_table=temp_serie_images,
-						columns=self.serie_images_columns,
-						# on_conflict=self.serie_images_on_conflict,
-						# on_conflict_update=self.serie_images_on_conflict_update
-					)
-
-					insert_into(
-						cursor=cursor,
-						table=self.table_serie_keywords,
-						temp_table=temp_serie_keywords,
-						columns=self.serie_keywords_columns,
-						# on_conflict=self.serie_keywords_on_conflict,
-						# on_conflict_update=self.serie_keywords_on_conflict_update
-					)
-
-					insert_into(
-						cursor=cursor,
-						table=self.table_serie_languages,
-						temp_table=temp_serie_languages,
-						columns=self.serie_languages_columns,
-						# on_conflict=self.serie_languages_on_conflict,
-						# on_conflict_update=self.serie_languages_on_conflict_update
-					)
-
-					insert_into(
-						cursor=cursor,
-						table=self.table_serie_networks,
-						temp_table=temp_serie_networks,
-						columns=self.serie_networks_columns,
-						# on_conflict=self.serie_networks_on_conflict,
-						# on_conflict_update=self.serie_networks_on_conflict_update
-					)
-
-					insert_into(
-						cursor=cursor,
-						table=self.table_serie_origin_country,
-						temp_table=temp_serie_origin_country,
-						columns=self.serie_origin_country_columns,
-						# on_conflict=self.serie_origin_country_on_conflict,
-						# on_conflict_update=self.serie_origin_country_on_conflict_update
-					)
-
-					insert_into(
-						cursor=cursor,
-						table=self.table_serie_production_companies,
-						temp_table=temp_serie_production_companies,
-						columns=self.serie_production_companies_columns,
-						# on_conflict=self.serie_production_companies_on_conflict,
-						# on_conflict_update=self.serie_production_companies_on_conflict_update
-					)
-
-					insert_into(
-						cursor=cursor,
-						table=self.table_serie_production_countries,
-						temp_table=temp_serie_production_countries,
-						columns=self.serie_production_countries_columns,
-						# on_conflict=self.serie_production_countries_on_conflict,
-						# on_conflict_update=self.serie_production_countries_on_conflict_update
-					)
-
-					insert_into(
-						cursor=cursor,
-						table=self.table_serie_spoken_languages,
-						temp_table=temp_serie_spoken_languages,
-						columns=self.serie_spoken_languages_columns,
-						# on_conflict=self.serie_spoken_languages_on_conflict,
-						# on_conflict_update=self.serie_spoken_languages_on_conflict_update
-					)
-
-					insert_into(
-						cursor=cursor,
-						table=self.table_serie_translations,
-						temp_table=temp_serie_translations,
-						columns=self.serie_translations_columns,
-						# on_conflict=self.serie_translations_on_conflict,
-						# on_conflict_update=self.serie_translations_on_conflict_update
-					)
-
-					insert_into(
-						cursor=cursor,
-						table=self.table_serie_videos,
-						temp_table=temp_serie_videos,
-						columns=self.serie_videos_columns,
-						# on_conflict=self.serie_videos_on_conflict,
-						# on_conflict_update=self.serie_videos_on_conflict_update
-					)
-
-					insert_into(
-						cursor=cursor,
-						table=self.table_serie_credits,
-						temp_table=temp_serie_credits,
-						columns=self.serie_credits_columns,
-						# on_conflict=self.serie_credits_on_conflict,
-						# on_conflict_update=self.serie_credits_on_conflict_update
-					)
-
-					insert_into(
-						cursor=cursor,
-						table=self.table_serie_roles,
-						temp_table=temp_serie_roles,
-						columns=self.serie_roles_columns,
-						# on_conflict=self.serie_roles_on_conflict,
-						# on_conflict_update=self.serie_roles_on_conflict_update
-					)
-
-					insert_into(
-						cursor=cursor,
-						table=self.table_serie_season,
-						temp_table=temp_serie_season,
-						columns=self.serie_season_columns,
-						on_conflict=self.serie_season_on_conflict,
-						on_conflict_update=self.serie_season_on_conflict_update
-					)
-
-					insert_into(
-						cursor=cursor,
-						table=self.table_serie_season_credits,
-						temp_table=temp_serie_season_credits,
-						columns=self.serie_season_credits_columns,
-						# on_conflict=self.serie_season_credits_on_conflict,
-						# on_conflict_update=self.serie_season_credits_on_conflict_update
-					)
-
-					insert_into(
-						cursor=cursor,
-						table=self.table_serie_season_translations,
-						temp_table=temp_serie_season_translations,
-						columns=self.serie_season_translations_columns,
-						# on_conflict=self.serie_season_translations_on_conflict,
-						# on_conflict_update=self.serie_season_translations_on_conflict_update
-					)
-
-					insert_into(
-						cursor=cursor,
-						table=self.table_serie_episode,
-						temp_table=temp_serie_episode,
-						columns=self.serie_episode_columns,
-						on_conflict=self.serie_episode_on_conflict,
-						on_conflict_update=self.serie_episode_on_conflict_update
-					)
-
-					insert_into(
-						cursor=cursor,
-						table=self.table_serie_episode_credits,
-						temp_table=temp_serie_episode_credits,
-						columns=self.serie_episode_credits_columns,
-						# on_conflict=self.serie_episode_credits_on_conflict,
-						# on_conflict_update=self.serie_episode_credits_on_conflict_update
-					)
-
-					conn.commit()
-
-					# Delete the CSV files
-					csv["serie"].delete()
-					csv["serie_alternative_titles"].delete()
-					csv["serie_content_ratings"].delete()
-					csv["serie_external_ids"].delete()
-					csv["serie_genres"].delete()
-					csv["serie_images"].delete()
-					csv["serie_keywords"].delete()
-					csv["serie_languages"].delete()
-					csv["serie_networks"].delete()
-					csv["serie_origin_country"].delete()
-					csv["serie_production_companies"].delete()
-					csv["serie_production_countries"].delete()
-					csv["serie_spoken_languages"].delete()
-					csv["serie_translations"].delete()
-					csv["serie_videos"].delete()
-					csv["serie_credits"].delete()
-					csv["serie_roles"].delete()
-					csv["serie_season"].delete()
-					csv["serie_season_credits"].delete()
-					csv["serie_season_translations"].delete()
-					csv["serie_episode"].delete()
-					csv["serie_episode_credits"].delete()
-				except Exception as e:
-					conn.rollback()
-					raise
-				finally:
-					conn.autocommit = True
+			load_tables(self.db_client, self.tables, rows, parallelism=self.load_parallelism, mode=self.load_merge_mode, filter_references=self.fk_filter_mode == "sql")
+			self.reference_ids.add(self.table_serie, rows["serie"].column("id"))
 		except Exception as e:
 			raise ValueError(f"Failed to push series to the database: {e}")
-		finally:
-			self.db_client.return_connection(conn)
\ No newline at end of file
+
+	def replace_seasons_and_episodes(self, cursor, staging_tables: dict[str, str]):
+		"""
+		Delete the seasons and episodes that are no longer in the loaded series, and give the
+		remaining ones the id of the season or episode with the same number (ids can change on TMDB).
+		"""
+		# Delete all outdated seasons before inserting
+		cursor.execute(f"""
+			DELETE FROM {self.table_serie_season}
+			WHERE {self.serie_season_columns[1]} IN (SELECT id FROM {staging_tables['serie']})
+				AND NOT EXISTS (
+					SELECT 1 FROM {staging_tables['serie_season']} temp
+					WHERE temp.tv_series_id = {self.table_serie_season}.tv_series_id
+					AND temp.season_number = {self.table_serie_season}.season_number
+				);
+		""")
+
+		cursor.execute(f"""
+			DELETE FROM {self.table_serie_episode}
+			WHERE {self.serie_episode_columns[1]} IN (SELECT id FROM {staging_tables['serie_season']})
+				AND NOT EXISTS (
+					SELECT 1 FROM {staging_tables['serie_episode']} temp
+					WHERE temp.tv_season_id = {self.table_serie_episode}.tv_season_id
+					AND temp.episode_number = {self.table_serie_episode}.episode_number
+				);
+		""")
+
+		# Only the seasons and episodes whose id changed are moved out of the way then given their new id,
+		# the other ones are left untouched (no dead tuple, no WAL)
+		cursor.execute(f"""
+			UPDATE {self.table_serie_season} AS s
+			SET id = -s.id
+			FROM {staging_tables['serie_season']} AS temp
+			WHERE s.tv_series_id = temp.tv_series_id
+				AND s.season_number = temp.season_number
+				AND s.id <> temp.id;
+		""")
+
+		if cursor.rowcount > 0:
+			cursor.execute(f"""
+				UPDATE {self.table_serie_season} AS s
+				SET id = temp.id
+				FROM {staging_tables['serie_season']} AS temp
+				WHERE s.tv_series_id = temp.tv_series_id
+					AND s.season_number = temp.season_number
+					AND s.id < 0;
+			""")
+
+		cursor.execute(f"""
+			UPDATE {self.table_serie_episode} AS e
+			SET id = -e.id
+			FROM {staging_tables['serie_episode']} AS temp
+			WHERE e.tv_season_id = temp.tv_season_id
+				AND e.episode_number = temp.episode_number
+				AND e.id <> temp.id;
+		""")
+
+		if cursor.rowcount > 0:
+			cursor.execute(f"""
+				UPDATE {self.table_serie_episode} AS e
+				SET id = temp.id
+				FROM {staging_tables['serie_episode']} AS temp
+				WHERE e.tv_season_id = temp.tv_season_id
+					AND e.episode_number = temp.episode_number
+					AND e.id < 0;
+			""")
@@ -2,8 +2,9 @@
 #                                    Imports                                   #
 # ---------------------------------------------------------------------------- #
 
+import asyncio
 from datetime import date
-from more_itertools import chunked
+from functools import partial
 import gc
 
 # ---------------------------------- Prefect --------------------------------- #
@@ -12,25 +13,17 @@ from prefect.logging import get_run_logger
 
 from .config import SerieConfig
 from .mapper import Mapper
-from ...models.csv_file import CSVFile
-
-# ---------------------------------------------------------------------------- #
+from ...models.export_snapshot import PopularityUpdate
+from ...models.row_buffer import RowBuffer
+from ...models.tmdb_fetcher import TMDBNotFoundError
+from ...models.tmdb_request_plan import TMDBRequestPlan
+from ...utils.loader import new_buffers
+from ...utils.retry import process_with_retry_pass
 
 # ---------------------------------------------------------------------------- #
 #                                    Getters                                   #
 # ---------------------------------------------------------------------------- #
 
-def get_db_series(config: SerieConfig) -> set:
-	conn = config.db_client.get_connection()
-	try:
-		with conn.cursor() as cursor:
-			cursor.execute(f"SELECT id FROM {config.table_serie}")
-			return {item[0] for item in cursor}
-	except Exception as e:
-		raise ValueError(f"Failed to get database series: {e}")
-	finally:
-		config.db_client.return_connection(conn)
-	
 def get_tmdb_series_changed(config: SerieConfig):
 	try:
 		config.logger.info("Getting changed series...")
@@ -39,223 +32,165 @@ def get_tmdb_series_changed(config: SerieConfig):
 	except Exception as e:
 		raise ValueError(f"Failed to get changed series: {e}")
 
-@task(cache_policy=None, log_prints=False)
-def get_tmdb_serie_details(config: SerieConfig, serie_id: int) -> dict:
+async def get_tmdb_season_details(config: SerieConfig, serie_id: int, season_number: int) -> dict:
+	try:
+		return await config.tmdb_client.fetcher.get(f"tv/{serie_id}/season/{season_number}", {"append_to_response": "credits,translations"})
+	except TMDBNotFoundError:
+		# A season that failed for another reason fails the serie, so that it is retried as a whole
+		config.logger.warning(f"Season {season_number} of serie {serie_id} not found on TMDB")
+		return None
+
+async def get_tmdb_serie_seasons(config: SerieConfig, serie_id: int, season_numbers: list) -> list:
+	"""
+	Get the seasons of a serie with their credits and translations, one request
+	per season on the season endpoint, all sent at once instead of one after another.
+	The `season/N` appends of the serie endpoint are not used, they do not carry
+	the credits and translations of the season.
+	"""
+	seasons = await asyncio.gather(*(get_tmdb_season_details(config, serie_id, number) for number in season_numbers))
+	return [season for season in seasons if season is not None]
+
+async def get_tmdb_serie_details(config: SerieConfig, serie_id: int) -> dict:
 	try:
-		main_video_languages = "en,fr,es,ja,de"
-		# TMDB limit the number of languages to 5 
-		serie = config.tmdb_client.request(f"tv/{serie_id}", {"append_to_response": "alternative_titles,content_ratings,external_ids,images,keywords,videos,aggregate_credits,translations", "include_video_language": main_video_languages})
+		main_video_languages = ["en", "fr", "es", "ja", "de"]
+		plan = TMDBRequestPlan(
+			f"tv/{serie_id}",
+			appends=["alternative_titles", "content_ratings", "external_ids", "images", "keywords", "videos", "aggregate_credits", "translations"],
+			video_languages=main_video_languages,
+			image_languages=config.tmdb_client.image_languages,
+		)
+		serie = await plan.fetch(config.tmdb_client.fetcher)
 
 		# Protect against adult content
 		if serie["adult"]:
 			return None
 		
 		# Get the each season details
-		seasons = []
-		for season in serie["seasons"]:
-			try:
-				season_details = config.tmdb_client.request(f"tv/{serie_id}/season/{season['season_number']}", {"append_to_response": "credits,translations"})
-				seasons.append(season_details)
-			except Exception as e:
-				config.logger.error(f"Failed to get season details for {serie_id} season {season['season_number']}: {e}")
-
-		serie["seasons"] = seasons
+		serie["seasons"] = await get_tmdb_serie_seasons(config, serie_id, [season["season_number"] for season in serie["seasons"]])
 		return serie
-	except Exception as e:
-		config.logger.error(f"Failed to get serie details for {serie_id}: {e}")
+	except TMDBNotFoundError:
+		# Deleted from TMDB since the export was generated
+		config.logger.warning(f"Serie {serie_id} not found on TMDB")
 		return None
 
 # ---------------------------------------------------------------------------- #
 	
-def process_missing_series(config: SerieConfig):
-	try:
-		if len(config.missing_series) > 0:
-			config.get_db_data()
-			chunks = list(chunked(config.missing_series, 500))
-			for chunk in chunks:
-				csv: dict[str, CSVFile] = {}
-
-				csv["serie"] = CSVFile(
-					columns=config.serie_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=config.flow_name
-				)
-
-				csv["serie_alternative_titles"] = CSVFile(
-					columns=config.serie_alternative_titles_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_alternative_titles"
-				)
-
-				csv["serie_content_ratings"] = CSVFile(
-					columns=config.serie_content_ratings_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_content_ratings"
-				)
-
-				csv["serie_external_ids"] = CSVFile(
-					columns=config.serie_external_ids_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_external_ids"
-				)
-
-				csv["serie_genres"] = CSVFile(
-					columns=config.serie_genres_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_genres"
-				)
-
-				csv["serie_images"] = CSVFile(
-					columns=config.serie_images_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_images"
-				)
-
-				csv["serie_keywords"] = CSVFile(
-					columns=config.serie_keywords_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_keywords"
-				)
-
-				csv["serie_languages"] = CSVFile(
-					columns=config.serie_languages_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_languages"
-				)
-
-				csv["serie_networks"] = CSVFile(
-					columns=config.serie_networks_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_networks"
-				)
-
-				csv["serie_origin_country"] = CSVFile(
-					columns=config.serie_origin_country_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_origin_country"
-				)
-
-				csv["serie_production_companies"] = CSVFile(
-					columns=config.serie_production_companies_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_production_companies"
-				)
-
-				csv["serie_production_countries"] = CSVFile(
-					columns=config.serie_production_countries_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_production_countries"
-				)
-
-				csv["serie_spoken_languages"] = CSVFile(
-					columns=config.serie_spoken_languages_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_spoken_languages"
-				)
-
-				csv["serie_translations"] = CSVFile(
-					columns=config.serie_translations_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_translations"
-				)
-
-				csv["serie_videos"] = CSVFile(
-					columns=config.serie_videos_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_videos"
-				)
-
-				csv["serie_credits"] = CSVFile(
-					columns=config.serie_credits_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_credits"
-				)
-				
-				csv["serie_roles"] = CSVFile(
-					columns=config.serie_roles_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_roles"
-				)
+@task(cache_policy=None)
+def fetch_series_chunk(config: SerieConfig, chunk: list) -> dict:
+	"""
+	Fetch and map a chunk of series (first stage of the pipeline).
+	One Prefect task covers the whole chunk, the ids are fetched by the TMDB fetch engine.
+	The batch keeps the ids of the series that could not be fetched.
+	"""
+	failed: set = set()
+	unchanged: set = set()
+	rows: dict[str, RowBuffer] = new_buffers(config.tables)
+	fingerprints = config.fingerprints.get(chunk)
+
+	typesense_documents = []
+	fingerprint_rows = []
+
+	for serie_id, serie_details in config.tmdb_client.fetch_many(partial(get_tmdb_serie_details, config), chunk):
+		if isinstance(serie_details, Exception):
+			config.logger.error(f"Failed to get serie details for {serie_id}: {serie_details}")
+			failed.add(serie_id)
+			continue
+		if serie_details is not None:
+			# Credits first, the season and episode credits are filtered on their ids
+			serie_credits, serie_roles = Mapper.serie_credits(config=config,serie=serie_details)
+			serie_rows = {
+				"serie": Mapper.serie(config=config,serie=serie_details),
+				"serie_alternative_titles": Mapper.serie_alternative_titles(config=config,serie=serie_details),
+				"serie_content_ratings": Mapper.serie_content_ratings(config=config,serie=serie_details),
+				"serie_external_ids": Mapper.serie_external_ids(config=config,serie=serie_details),
+				"serie_genres": Mapper.serie_genres(config=config,serie=serie_details),
+				"serie_images": Mapper.serie_images(config=config,serie=serie_details),
+				"serie_keywords": Mapper.serie_keywords(config=config,serie=serie_details),
+				"serie_languages": Mapper.serie_languages(config=config,serie=serie_details),
+				"serie_networks": Mapper.serie_networks(config=config,serie=serie_details),
+				"serie_origin_country": Mapper.serie_origin_country(config=config,serie=serie_details),
+				"serie_production_companies": Mapper.serie_production_companies(config=config,serie=serie_details),
+				"serie_production_countries": Mapper.serie_production_countries(config=config,serie=serie_details),
+				"serie_spoken_languages": Mapper.serie_spoken_languages(config=config,serie=serie_details),
+				"serie_translations": Mapper.serie_translations(config=config,serie=serie_details),
+				"serie_videos": Mapper.serie_videos(config=config,serie=serie_details),
+				"serie_credits": serie_credits,
+				"serie_roles": serie_roles,
 
 				# Seasons
-				csv["serie_season"] = CSVFile(
-					columns=config.serie_season_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_season"
-				)
-
-				csv["serie_season_credits"] = CSVFile(
-					columns=config.serie_season_credits_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_season_credits"
-				)
-
-				csv["serie_season_translations"] = CSVFile(
-					columns=config.serie_season_translations_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_season_translations"
-				)
+				"serie_season": Mapper.serie_season(config=config,serie=serie_details),
+				"serie_season_credits": Mapper.serie_season_credits(config=config,serie=serie_details),
+				"serie_season_translations": Mapper.serie_season_translations(config=config,serie=serie_details),
 
 				# Episodes
-				csv["serie_episode"] = CSVFile(
-					columns=config.serie_episode_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_episode"
-				)
-
-				csv["serie_episode_credits"] = CSVFile(
-					columns=config.serie_episode_credits_columns,
-					tmp_directory=config.tmp_directory,
-					prefix=f"{config.flow_name}_episode_credits"
-				)
-
-				typesense_documents = []
+				"serie_episode": Mapper.serie_episode(config=config,serie=serie_details),
+				"serie_episode_credits": Mapper.serie_episode_credits(config=config,serie=serie_details),
+			}
+			typesense_document = Mapper.typesense(config=config,serie=serie_details)
+
+			# Skip the serie when nothing we store changed since it was last loaded
+			fingerprint = config.fingerprints.compute(serie_rows, typesense_document)
+			if fingerprint == fingerprints.get(serie_id):
+				unchanged.add(serie_id)
+			else:
+				for name, entity_rows in serie_rows.items():
+					rows[name].extend(entity_rows)
+				fingerprint_rows.append(config.fingerprints.row(serie_id, fingerprint))
+				typesense_documents.append(typesense_document)
+
+		# Release the payload as soon as it is mapped, not when the next one arrives
+		del serie_details
+
+	config.logger.info(f"Fetched {len(chunk) - len(failed)}/{len(chunk)} series ({len(failed)} failed, {len(unchanged)} unchanged)")
+	return {
+		"rows": rows,
+		"typesense_documents": typesense_documents,
+		"fingerprints": fingerprint_rows,
+		"failed": failed,
+	}
+
+def push_series_chunk(config: SerieConfig, batch: dict) -> dict:
+	"""
+	Push a batch of series to the database.
+	"""
+	config.logger.info(f"Pushing series to the database...")
+	push_future = config.push.submit(rows=batch["rows"])
+	push_future.result(raise_on_failure=True)
+	config.logger.info(f"Successfully pushed series to the database")
+	return batch
+
+def index_series_chunk(config: SerieConfig, batch: dict) -> set:
+	"""
+	Push a batch of series to Typesense.
+	Returns the ids of the series that could not be fetched.
+	"""
+	# Push to Typesense
+	if batch["typesense_documents"]:
+		config.logger.info(f"Pushing series to Typesense...")
+		config.typesense_client.upsert_documents("tv_series", documents=batch["typesense_documents"])
+		config.logger.info(f"Successfully pushed series to Typesense")
+
+	# Saved once indexed, so that a serie whose indexing failed is loaded and indexed again by the next run
+	config.fingerprints.save(batch["fingerprints"])
+
+	return batch["failed"]
 
-				series_details_futures = get_tmdb_serie_details.map(config=config, serie_id=chunk)
-				for serie_details_response in series_details_futures:
-					serie_details = serie_details_response.result()
-					if serie_details is not None:
-						csv["serie"].append(rows_data=Mapper.serie(config=config,serie=serie_details))
-						csv["serie_alternative_titles"].append(rows_data=Mapper.serie_alternative_titles(config=config,serie=serie_details))
-						csv["serie_content_ratings"].append(rows_data=Mapper.serie_content_ratings(config=config,serie=serie_details))
-						csv["serie_external_ids"].append(rows_data=Mapper.serie_external_ids(config=config,serie=serie_details))
-						csv["serie_genres"].append(rows_data=Mapper.serie_genres(config=config,serie=serie_details))
-						csv["serie_images"].append(rows_data=Mapper.serie_images(config=config,serie=serie_details))
-						csv["serie_keywords"].append(rows_data=Mapper.serie_keywords(config=config,serie=serie_details))
-						csv["serie_languages"].append(rows_data=Mapper.serie_languages(config=config,serie=serie_details))
-						csv["serie_networks"].append(rows_data=Mapper.serie_networks(config=config,serie=serie_details))
-						csv["serie_origin_country"].append(rows_data=Mapper.serie_origin_country(config=config,serie=serie_details))
-						csv["serie_production_companies"].append(rows_data=Mapper.serie_production_companies(config=config,serie=serie_details))
-						csv["serie_production_countries"].append(rows_data=Mapper.serie_production_countries(config=config,serie=serie_details))
-						csv["serie_spoken_languages"].append(rows_data=Mapper.serie_spoken_languages(config=config,serie=serie_details))
-						csv["serie_translations"].append(rows_data=Mapper.serie_translations(config=config,serie=serie_details))
-						csv["serie_videos"].append(rows_data=Mapper.serie_videos(config=config,serie=serie_details))
-						serie_credits_df, serie_roles_df = Mapper.serie_credits(config=config,serie=serie_details)
-						csv["serie_credits"].append(rows_data=serie_credits_df)
-						csv["serie_roles"].append(rows_data=serie_roles_df)
-
-						# Seasons
-						csv["serie_season"].append(rows_data=Mapper.serie_season(config=config,serie=serie_details))
-						csv["serie_season_credits"].append(rows_data=Mapper.serie_season_credits(config=config,serie=serie_details))
-						csv["serie_season_translations"].append(rows_data=Mapper.serie_season_translations(config=config,serie=serie_details))
-
-						# Episodes
-						csv["serie_episode"].append(rows_data=Mapper.serie_episode(config=config,serie=serie_details))
-						csv["serie_episode_credits"].append(rows_data=Mapper.serie_episode_credits(config=config,serie=serie_details))
-
-						# Typesense documents
-						typesense_documents.append(Mapper.typesense(config=config,serie=serie_details))
-
-				config.logger.info(f"Pushing series to the database...")
-				push_future = config.push.submit(csv=csv)
-				push_future.result(raise_on_failure=True)
-				config.logger.info(f"Successfully pushed series to the database")
-
-				# Push to Typesense
-				if typesense_documents:
-					config.logger.info(f"Pushing series to Typesense...")
-					config.typesense_client.upsert_documents("tv_series", documents=typesense_documents)
-					config.logger.info(f"Successfully pushed series to Typesense")
+def process_missing_series(config: SerieConfig):
+	try:
+		if len(config.missing_series) > 0:
+			config.get_db_data()
+			failed = process_with_retry_pass(
+				stages=[partial(fetch_series_chunk, config), partial(push_series_chunk, config), partial(index_series_chunk, config)],
+				ids=config.missing_series,
+				chunk_size=500,
+				logger=config.logger,
+				name="series",
+			)
+			config.logger.info(f"TMDB requests: {config.tmdb_client.request_stats()}")
+			config.logger.info(f"TMDB API keys usage: {config.tmdb_client.rate_limit_usage()}")
+			config.logger.info(f"TMDB concurrency limits: {config.tmdb_client.concurrency_limits()}")
+			return failed
+		return set()
 
 	except Exception as e:
 		raise ValueError(f"Failed to process missing series: {e}")
@@ -273,19 +208,15 @@ def sync_tmdb_serie(date: date = date.today(), update_popularity: bool = True):
 		# Get the list of series from TMDB and the database
 		config.log_manager.fetching_data()
 		tmdb_series_df = config.tmdb_client.get_export_ids(type="tv_series", date=config.date)
-		tmdb_series_set = set(tmdb_series_df["id"])
-		if update_popularity and 'popularity' in tmdb_series_df.columns:
-			tmdb_series_popularity = tmdb_series_df.set_index('id')['popularity'].to_dict()
-		else:
-			tmdb_series_popularity = {}
-		db_series_set = get_db_series(config)
+
+		# Compare the series with the previous export snapshot (or the database) and process missing series
+		config.extra_series, config.missing_series, tmdb_series_popularity = config.diff_export(type="serie", table_name=config.table_serie, export=tmdb_series_df)
+		if not update_popularity:
+			tmdb_series_popularity = PopularityUpdate.empty()
 
 		del tmdb_series_df
 		gc.collect()
 
-		# Compare the series and process missing serries
-		config.extra_series = db_series_set - tmdb_series_set
-		config.missing_series = tmdb_series_set - db_series_set
 		get_tmdb_series_changed(config)
 		logger.info(f"Found {len(config.extra_series)} extra series and {len(config.missing_series)} missing series")
 		config.log_manager.data_fetched()
@@ -293,7 +224,7 @@ def sync_tmdb_serie(date: date = date.today(), update_popularity: bool = True):
 		# Sync the series to the database
 		config.log_manager.syncing_to_db()
 		config.prune()
-		process_missing_series(config=config)
+		failed_series = process_missing_series(config=config)
 
 		if update_popularity:
 			config.log_manager.updating_popularity()
@@ -302,6 +233,8 @@ def sync_tmdb_serie(date: date = date.today(), update_popularity: bool = True):
 				table_name=config.table_serie,
 				content_type=config.flow_name,
 			)
+		# Saved even when the popularity is not updated, the next run then compares with the previous popularity
+		config.save_export_snapshot(type="serie", failed=failed_series, popularity_updated=update_popularity)
 		
 		config.log_manager.success()
 	except Exception as e:
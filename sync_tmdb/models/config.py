@@ -1,3 +1,4 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import date
 from .db_client import DBClient
 from .typesense_client import TypesenseClient
@@ -5,12 +6,14 @@ from .language import Language
 from .extra_languages import ExtraLanguages
 from .tmdb import TMDBClient
 from .sync_logs_manager import SyncLogsManager
-from .csv_file import CSVFile
+from .reference_ids import ReferenceIds
+from .export_snapshot import DatabaseExportSnapshotStore, ExportSnapshot, ExportSnapshotStore, PopularityUpdate
 from prefect.variables import Variable
 from prefect.logging import get_run_logger
 from prefect import task
+from ..utils.pg_copy import copy_arrays
+import numpy as np
 import pandas as pd
-import gc
 import uuid
 
 class Config:
@@ -18,78 +21,196 @@ class Config:
 		self.date = date
 		self.logger = get_run_logger()
 		self.config = Variable.get("sync_tmdb_config", {})
-		self.tmp_directory: str = self.config.get("tmp_directory", ".tmp")
 		self.default_language = Language(name="English", code="en-US", tmdb_language="en-US")
 		self.extra_languages = ExtraLanguages(languages=self.config.get("extra_languages", []))
-		self.db_client = DBClient()
+		# Number of staging tables copied at once, each on its own pooled connection
+		self.load_parallelism = self.config.get("load_parallelism", 4)
+		# Popularity updates are split into id ranges of this many ids, updated in parallel in short transactions
+		self.popularity_slice_size: int = self.config.get("popularity_slice_size", 50000)
+		self.popularity_parallelism: int = self.config.get("popularity_parallelism", 4)
+		# Without an explicit size, the pool has room for every subflow running at once (see `subflow_budget`),
+		# each with its parallel connections, its merge connection and the reads of its next chunk
+		db_pool = {"max": self.config.get("subflow_budget", 4) * (max(self.load_parallelism, self.popularity_parallelism) + 2), **self.config.get("db_pool", {})}
+		self.db_client = DBClient.shared(config=db_pool)
+		# The parallel connections of a subflow never wait on each other for a slot of the pool
+		self.load_parallelism = max(1, min(self.load_parallelism, self.db_client.max_connections - 1))
+		self.popularity_parallelism = max(1, min(self.popularity_parallelism, self.db_client.max_connections))
+		self.reference_ids = ReferenceIds.shared(db_client=self.db_client)
 		self.typesense_client = TypesenseClient()
 		self.tmdb_client = TMDBClient(config=self.config)
 		self.log_manager = SyncLogsManager(config=self)
 		self.chunk_size = self.config.get("chunk_size", 1000)
+		# "diff" only writes the rows that changed, "replace" deletes and inserts again the rows of every loaded entity
+		self.load_merge_mode = self.config.get("load_merge_mode", "diff")
+		# "memory" filters the foreign keys in the mappers with the reference ids, "sql" lets the merge filter them
+		self.fk_filter_mode = self.config.get("fk_filter_mode", "memory")
+		export_snapshot_config = self.config.get("export_snapshot", {})
+		# The workers are ephemeral, the snapshots are kept in the database unless a persistent directory is set up
+		if export_snapshot_config.get("storage", "database") == "disk":
+			self.export_snapshots = ExportSnapshotStore(
+				directory=export_snapshot_config.get("directory", ".snapshots"),
+				keep=export_snapshot_config.get("keep", 3),
+			)
+		else:
+			self.export_snapshots = DatabaseExportSnapshotStore(
+				db_client=self.db_client,
+				table=self.config.get("db_tables", {}).get("sync_export_snapshot", "tmdb.sync_export_snapshot"),
+				keep=export_snapshot_config.get("keep", 3),
+			)
+		self.export_snapshot: ExportSnapshot = None
+		self.previous_export_snapshot: ExportSnapshot = None
+		# Popularity changes of at most this value are not written, they add up until they exceed it
+		self.popularity_epsilon: float = self.config.get("popularity_epsilon", 0.0)
 
-	# @task(cache_policy=None)
-	def update_popularity(self, tmdb_popularity_data: dict, table_name: str, content_type: str = "items"):
+	def get_db_ids(self, table_name: str, ids=None) -> set:
 		"""
-		Updates popularity in the database by comparing against the full TMDB dataset.
-		The comparison and update logic is handled efficiently by the database itself.
+		Get the ids of the table, restricted to `ids` when given.
 		"""
-		if not tmdb_popularity_data:
-			self.logger.info(f"No TMDB popularity data to process for {content_type}")
-			return
-
-		self.logger.info(f"Updating popularity for {content_type} by comparing against {len(tmdb_popularity_data)} TMDB records...")
-		
+		if ids is not None and len(ids) == 0:
+			return set()
 		conn = self.db_client.get_connection()
-		popularity_csv = None
 		try:
-			popularity_df = pd.DataFrame(list(tmdb_popularity_data.items()), columns=['id', 'popularity'])
+			with conn.cursor() as cursor:
+				if ids is None:
+					cursor.execute(f"SELECT id FROM {table_name}")
+				else:
+					cursor.execute(f"SELECT id FROM {table_name} WHERE id = ANY(%s)", ([int(id) for id in ids],))
+				return {item[0] for item in cursor}
+		except Exception as e:
+			raise ValueError(f"Failed to get database ids from {table_name}: {e}")
+		finally:
+			self.db_client.return_connection(conn)
 
-			popularity_csv = CSVFile(
-				columns=['id', 'popularity'],
-				tmp_directory=self.tmp_directory,
-				prefix=f"{content_type}_popularity_update"
-			)
-			popularity_csv.append(rows_data=popularity_df)
+	def diff_ids(self, table_name: str, ids) -> tuple[set, set]:
+		"""
+		Compare ids with every id of the table. The ids of the table are kept in
+		the shared registry, loaded once per run and reused by the later subflows.
+
+		Returns:
+			tuple: (extra ids, missing ids)
+		"""
+		db_ids = self.reference_ids.get(table_name).ids()
+		ids = np.unique(np.asarray(ids, dtype=np.int64))
+		extra = np.setdiff1d(db_ids, ids, assume_unique=True)
+		missing = np.setdiff1d(ids, db_ids, assume_unique=True)
+		return set(extra.tolist()), set(missing.tolist())
+
+	def diff_export(self, type: str, table_name: str, export: pd.DataFrame) -> tuple[set, set, PopularityUpdate]:
+		"""
+		Compare the TMDB export with the database.
+
+		When the snapshot of the last successful run is available, only the ids
+		added and removed since then are looked up in the database to verify them.
+		Otherwise the export is compared with every id of the table.
+
+		Returns:
+			tuple: (extra ids, missing ids, popularity to update)
+		"""
+		self.export_snapshot = ExportSnapshot.from_dataframe(export)
+		last_success_log = self.log_manager.last_success_log
+		previous = self.export_snapshots.load(type, last_success_log.date) if last_success_log else None
+		self.previous_export_snapshot = previous
+
+		if previous is None:
+			self.logger.info(f"No previous {type} export snapshot, comparing the export with the database...")
+			extra, missing = self.diff_ids(table_name, self.export_snapshot.ids)
+			return extra, missing, self.export_snapshot.popularity_update()
+
+		diff = self.export_snapshot.diff(previous, epsilon=self.popularity_epsilon)
+		self.logger.info(f"Export snapshot diff for {type}: {len(diff.added)} added, {len(diff.removed)} removed, {len(diff.popularity_ids)} popularity changes")
+		extra = self.get_db_ids(table_name, ids=diff.removed)
+		added = set(diff.added.tolist())
+		missing = added - self.get_db_ids(table_name, ids=diff.added)
+		return extra, missing, diff.popularity_update()
+
+	def save_export_snapshot(self, type: str, failed: set = None, popularity_updated: bool = True):
+		"""
+		Save the export snapshot of the run. The ids that could not be synced
+		are left out, so that the next run sees them as added and retries them.
 
-			del popularity_df
-			gc.collect()
-		
+		Args:
+			type (str): The type of the export.
+			failed (set, optionnel): The ids that could not be synced. Default: None.
+			popularity_updated (bool, optionnel): Whether the popularity of the snapshot was written
+				to the database. If not, the snapshot keeps the popularity of the previous one,
+				which is still the one of the database. Default: True.
+		"""
+		if self.export_snapshot is None:
+			return
+		snapshot = self.export_snapshot.without(failed or set())
+		if not popularity_updated:
+			snapshot = snapshot.with_popularity_of(self.previous_export_snapshot)
+		try:
+			self.export_snapshots.save(type, self.date, snapshot)
+		except Exception as e:
+			# The next run falls back to a full comparison with the database
+			self.logger.warning(f"Failed to save {type} export snapshot: {e}")
+
+	def _update_popularity_slice(self, table_name: str, popularity_slice: PopularityUpdate) -> int:
+		"""
+		Update the popularity of one id range, in its own short transaction.
+		"""
+		conn = self.db_client.get_connection()
+		try:
 			with conn.cursor() as cursor:
 				conn.autocommit = False
 
 				temp_table_name = f"{table_name.replace('.', '_')}_temp_popularity_update_{uuid.uuid4().hex}"
 				cursor.execute(f"CREATE TEMP TABLE {temp_table_name} (id INTEGER PRIMARY KEY, popularity REAL) ON COMMIT DROP;")
 
-				with open(popularity_csv.file_path, "r", encoding="utf-8") as f:
-					cursor.copy_expert(f"COPY {temp_table_name} ({','.join(popularity_csv.columns)}) FROM STDIN WITH CSV HEADER", f)
+				# Both columns are numeric, they are encoded in the binary format of COPY in one pass
+				copy_arrays(cursor, temp_table_name, ["id", "popularity"], [popularity_slice.ids, popularity_slice.popularity], types=["int4", "float4"])
 
+				# The range bounds let the planner scan only the slice of the primary key
 				update_query = f"""
 				UPDATE {table_name} AS main_table
 				SET popularity = temp_table.popularity
 				FROM {temp_table_name} AS temp_table
 				WHERE 
-					main_table.id = temp_table.id 
-					AND main_table.popularity IS DISTINCT FROM temp_table.popularity;
+					main_table.id BETWEEN %s AND %s
+					AND main_table.id = temp_table.id 
+					AND (main_table.popularity IS NULL OR abs(main_table.popularity - temp_table.popularity) > %s);
 				"""
-				cursor.execute(update_query)
-				
+				cursor.execute(update_query, (int(popularity_slice.ids[0]), int(popularity_slice.ids[-1]), self.popularity_epsilon))
+
 				updated_count = cursor.rowcount
 				conn.commit()
-				
-				self.logger.info(f"Successfully updated popularity for {updated_count} {content_type} whose values had changed.")
-				
-		except Exception as e:
+				return updated_count
+		except Exception:
 			conn.rollback()
-			raise ValueError(f"Failed to update popularity for {content_type}: {e}")
+			raise
 		finally:
-			if conn:
-				self.db_client.return_connection(conn)
-			if popularity_csv:
-				popularity_csv.delete()
+			self.db_client.return_connection(conn)
 
+	# @task(cache_policy=None)
+	def update_popularity(self, tmdb_popularity_data: PopularityUpdate, table_name: str, content_type: str = "items"):
+		"""
+		Updates popularity in the database by comparing against the TMDB dataset.
+		The comparison and update logic is handled efficiently by the database itself,
+		only the rows whose popularity moved by more than `popularity_epsilon` are updated.
 
-	# def __del__(self):
-	# 	self.logger.info("Cleaning up...")
-	# 	if self.tmp_directory and os.path.exists(self.tmp_directory):
-	# 		shutil.rmtree(self.tmp_directory)
+		The ids are split into ranges of `popularity_slice_size` ids, each updated in its own
+		short transaction, `popularity_parallelism` at once over the connections of the pool,
+		so that the row locks are held briefly and the WAL is written in small bursts.
+		"""
+		if len(tmdb_popularity_data) == 0:
+			self.logger.info(f"No TMDB popularity data to process for {content_type}")
+			return
+
+		slices = tmdb_popularity_data.slices(self.popularity_slice_size)
+		self.logger.info(f"Updating popularity for {content_type} by comparing against {len(tmdb_popularity_data)} TMDB records in {len(slices)} slices...")
+
+		updated_count = 0
+		try:
+			with ThreadPoolExecutor(max_workers=max(1, self.popularity_parallelism), thread_name_prefix="popularity") as executor:
+				futures = {executor.submit(self._update_popularity_slice, table_name, popularity_slice): index for index, popularity_slice in enumerate(slices)}
+				for future in as_completed(futures):
+					index = futures[future]
+					slice_count = future.result()
+					updated_count += slice_count
+					self.logger.info(f"Updated popularity for {slice_count} {content_type} in slice {index + 1}/{len(slices)} (ids {slices[index].ids[0]}-{slices[index].ids[-1]})")
+		except Exception as e:
+			# The slices already committed are kept, they are consistent on their own
+			raise ValueError(f"Failed to update popularity for {content_type}: {e}")
 
+		self.logger.info(f"Successfully updated popularity for {updated_count} {content_type} whose values had changed.")
@@ -1,25 +1,161 @@
+import threading
+import time
 import psycopg2
+import psycopg2.extensions
+from psycopg2.pool import ThreadedConnectionPool
 from prefect.blocks.system import Secret
 from contextlib import contextmanager
 
+class PooledConnection(psycopg2.extensions.connection):
+	"""Connection of the pool, remembers whether its session is set up and when it was last used"""
+	def __init__(self, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+		self.configured = False
+		self.last_used = time.monotonic()
+
 class DBClient:
-	def __init__(self):
-		self.connection_string = self._get_postgres_connection_string("postgres-connection-string")
-	
+	"""
+	Postgres client backed by a thread-safe connection pool.
+
+	The pool is shared by every DBClient of the process (see `shared`), so the
+	subflows of a run reuse the same connections instead of opening a new
+	TLS connection for each query. A connection is health-checked when it has
+	been idle for a while, and its session settings (statement timeout,
+	synchronous_commit) are applied once, when it is first handed out.
+	"""
+	_instances: dict = {}
+	_instances_lock = threading.Lock()
+
+	def __init__(self, connection_string: str = None, min_connections: int = 1, max_connections: int = 8, acquire_timeout: float = 300.0, health_check_interval: float = 30.0, statement_timeout: str = None, synchronous_commit: str = None):
+		self.connection_string = connection_string or self._get_postgres_connection_string("postgres-connection-string")
+		self.min_connections = min_connections
+		self.max_connections = max_connections
+		self.acquire_timeout = acquire_timeout
+		self.health_check_interval = health_check_interval
+		self.session_settings: dict = {
+			"statement_timeout": statement_timeout,
+			"synchronous_commit": synchronous_commit,
+		}
+		self.connection_pool: ThreadedConnectionPool = None
+		# ThreadedConnectionPool raises when exhausted, callers wait for a free slot instead
+		self._slots = threading.BoundedSemaphore(max_connections)
+		self._lock = threading.Lock()
+
+	@classmethod
+	def shared(cls, config: dict = None) -> "DBClient":
+		"""
+		Return the client shared by every config of the process for the Postgres database.
+
+		Args:
+			config (dict, optionnel): The `db_pool` options: min, max, acquire_timeout,
+				health_check_interval, statement_timeout and synchronous_commit. Default: None.
+				synchronous_commit is left to the server default unless set (e.g. "off",
+				which can lose the last commits on a server crash).
+		"""
+		config = config or {}
+		with cls._instances_lock:
+			instance = cls._instances.get("postgres")
+			if instance is None:
+				instance = cls(
+					min_connections=config.get("min", 1),
+					max_connections=config.get("max", 8),
+					acquire_timeout=config.get("acquire_timeout", 300.0),
+					health_check_interval=config.get("health_check_interval", 30.0),
+					statement_timeout=config.get("statement_timeout"),
+					synchronous_commit=config.get("synchronous_commit"),
+				)
+				cls._instances["postgres"] = instance
+			return instance
+
+	@classmethod
+	def close_all(cls):
+		"""
+		Close the pools of the shared clients.
+		"""
+		with cls._instances_lock:
+			instances = list(cls._instances.values())
+			cls._instances.clear()
+		for instance in instances:
+			instance.close_connection()
+
 	def _get_postgres_connection_string(self, secret_name: str) -> str:
 		try:
 			return Secret.load(secret_name).get()
 		except Exception as e:
 			raise ValueError(f"Postgres connection string not found: {e}")
-		
-	def get_connection(self):
-		return psycopg2.connect(self.connection_string)
-	
-	def return_connection(self, conn):
-		return conn.close()
+
+	def _get_pool(self) -> ThreadedConnectionPool:
+		with self._lock:
+			if self.connection_pool is None:
+				self.connection_pool = ThreadedConnectionPool(
+					self.min_connections,
+					self.max_connections,
+					self.connection_string,
+					connection_factory=PooledConnection,
+				)
+			return self.connection_pool
+
+	def _configure(self, conn: PooledConnection):
+		with conn.cursor() as cursor:
+			for name, value in self.session_settings.items():
+				if value is not None:
+					cursor.execute(f"SET {name} = %s", (str(value),))
+		conn.commit()
+		conn.configured = True
+
+	def _is_healthy(self, conn: PooledConnection) -> bool:
+		if conn.closed:
+			return False
+		if time.monotonic() - conn.last_used < self.health_check_interval:
+			return True
+		try:
+			with conn.cursor() as cursor:
+				cursor.execute("SELECT 1")
+			conn.rollback()
+			return True
+		except psycopg2.Error:
+			return False
+
+	def get_connection(self) -> PooledConnection:
+		if not self._slots.acquire(timeout=self.acquire_timeout):
+			raise ValueError(f"No database connection available after {self.acquire_timeout}s")
+		try:
+			pool = self._get_pool()
+			while True:
+				conn = pool.getconn()
+				if self._is_healthy(conn):
+					break
+				# Broken connection (server restart, idle timeout...), replaced by a new one
+				pool.putconn(conn, close=True)
+			if not conn.configured:
+				self._configure(conn)
+			return conn
+		except Exception:
+			self._slots.release()
+			raise
+
+	def return_connection(self, conn: PooledConnection):
+		try:
+			if conn.closed:
+				self._get_pool().putconn(conn, close=True)
+				return
+			try:
+				if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+					conn.rollback()
+				# Connections are handed out in the default (non autocommit) mode
+				conn.autocommit = False
+				conn.last_used = time.monotonic()
+				self._get_pool().putconn(conn)
+			except psycopg2.Error:
+				self._get_pool().putconn(conn, close=True)
+		finally:
+			self._slots.release()
 
 	def close_connection(self):
-		self.connection_pool.closeall()
+		with self._lock:
+			if self.connection_pool is not None and not self.connection_pool.closed:
+				self.connection_pool.closeall()
+			self.connection_pool = None
 
 	def get_table(self, table_name: str, columns: list) -> list:
 		conn = self.get_connection()
@@ -31,7 +167,7 @@ class DBClient:
 			raise ValueError(f"Failed to get table {table_name}: {e}")
 		finally:
 			self.return_connection(conn)
-	
+
 	@contextmanager
 	def connection(self):
 		conn = self.get_connection()
@@ -39,4 +175,3 @@ class DBClient:
 			yield conn
 		finally:
 			self.return_connection(conn)
-
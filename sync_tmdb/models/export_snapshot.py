@@ -0,0 +1,240 @@
+from datetime import date
+import os
+import shutil
+import uuid
+import numpy as np
+import pandas as pd
+import psycopg2
+import psycopg2.errors
+from .db_client import DBClient
+
+class PopularityUpdate:
+	"""
+	Popularity to write to the database: ids sorted ascending (int32) and their
+	new popularity (float32), kept as arrays down to the binary COPY.
+	"""
+	def __init__(self, ids: np.ndarray, popularity: np.ndarray):
+		self.ids = ids
+		self.popularity = popularity
+
+	def __len__(self) -> int:
+		return len(self.ids)
+
+	@classmethod
+	def empty(cls) -> "PopularityUpdate":
+		return cls(ids=np.empty(0, dtype=np.int32), popularity=np.empty(0, dtype=np.float32))
+
+	def slices(self, size: int) -> list["PopularityUpdate"]:
+		"""
+		Split the update into consecutive id ranges of at most `size` ids.
+		"""
+		size = max(1, size)
+		return [
+			PopularityUpdate(ids=self.ids[start:start + size], popularity=self.popularity[start:start + size])
+			for start in range(0, len(self.ids), size)
+		]
+
+class ExportDiff:
+	def __init__(self, added: np.ndarray, removed: np.ndarray, popularity_ids: np.ndarray, popularity: np.ndarray):
+		self.added = added
+		self.removed = removed
+		self.popularity_ids = popularity_ids
+		self.popularity = popularity
+
+	def popularity_update(self) -> PopularityUpdate:
+		return PopularityUpdate(ids=self.popularity_ids, popularity=self.popularity)
+
+class ExportSnapshot:
+	"""
+	Compact columnar copy of a TMDB daily export: ids sorted ascending (int32)
+	and their popularity (float32).
+	"""
+	def __init__(self, ids: np.ndarray, popularity: np.ndarray):
+		self.ids = ids
+		self.popularity = popularity
+
+	def __len__(self) -> int:
+		return len(self.ids)
+
+	@classmethod
+	def from_dataframe(cls, df: pd.DataFrame) -> "ExportSnapshot":
+		ids = df["id"].to_numpy(dtype=np.int32)
+		popularity = df["popularity"].to_numpy(dtype=np.float32) if "popularity" in df.columns else np.zeros(len(ids), dtype=np.float32)
+		# Sorted and unique, the first occurrence of an id wins
+		ids, index = np.unique(ids, return_index=True)
+		return cls(ids=ids, popularity=popularity[index])
+
+	def without(self, ids: set) -> "ExportSnapshot":
+		"""
+		Return a copy of the snapshot without the given ids.
+		"""
+		if not ids:
+			return self
+		mask = ~np.isin(self.ids, np.fromiter(ids, dtype=np.int32, count=len(ids)))
+		return ExportSnapshot(ids=self.ids[mask], popularity=self.popularity[mask])
+
+	def with_popularity_of(self, previous: "ExportSnapshot") -> "ExportSnapshot":
+		"""
+		Return a copy of the snapshot with the popularity of a previous one, e.g. when
+		the popularity was not written to the database. The ids missing from the previous
+		snapshot get NaN, which `diff` always reports as changed.
+		"""
+		popularity = np.full(len(self.ids), np.nan, dtype=np.float32)
+		if previous is not None:
+			_, current_index, previous_index = np.intersect1d(self.ids, previous.ids, assume_unique=True, return_indices=True)
+			popularity[current_index] = previous.popularity[previous_index]
+		return ExportSnapshot(ids=self.ids, popularity=popularity)
+
+	def popularity_update(self) -> PopularityUpdate:
+		"""
+		Return the popularity of every id of the snapshot.
+		"""
+		return PopularityUpdate(ids=self.ids, popularity=self.popularity)
+
+	def diff(self, previous: "ExportSnapshot", epsilon: float = 0.0) -> ExportDiff:
+		"""
+		Compare the snapshot with a previous one using sorted array set operations.
+
+		The popularity changes of at most `epsilon` are not reported, and the previous
+		popularity is kept in this snapshot for those ids: the snapshot keeps matching
+		the database, so that small changes add up until they are reported.
+
+		Args:
+			previous (ExportSnapshot): The snapshot of the last successful run.
+			epsilon (float, optionnel): The smallest popularity change reported. Default: 0.0.
+
+		Returns:
+			ExportDiff: The ids added and removed since the previous snapshot, and
+				the ids (with their new value) whose popularity changed.
+		"""
+		added = np.setdiff1d(self.ids, previous.ids, assume_unique=True)
+		removed = np.setdiff1d(previous.ids, self.ids, assume_unique=True)
+		common, current_index, previous_index = np.intersect1d(self.ids, previous.ids, assume_unique=True, return_indices=True)
+		current_popularity = self.popularity[current_index]
+		previous_popularity = previous.popularity[previous_index]
+		if epsilon > 0:
+			# Written as a negation so that an unknown previous popularity (NaN) is reported
+			changed = ~(np.abs(current_popularity - previous_popularity) <= epsilon)
+			self.popularity[current_index[~changed]] = previous_popularity[~changed]
+		else:
+			changed = current_popularity != previous_popularity
+		return ExportDiff(
+			added=added,
+			removed=removed,
+			popularity_ids=common[changed],
+			popularity=current_popularity[changed],
+		)
+
+class ExportSnapshotStore:
+	"""
+	Stores export snapshots on the local disk, one directory per type and date:
+	`{directory}/{type}/{YYYY-MM-DD}/{ids,popularity}.npy`.
+	Snapshots are memory-mapped when loaded.
+	"""
+	def __init__(self, directory: str = ".snapshots", keep: int = 3):
+		self.directory = directory
+		self.keep = keep
+
+	def _path(self, type: str, date: date) -> str:
+		return os.path.join(self.directory, type, date.strftime("%Y-%m-%d"))
+
+	def load(self, type: str, date: date) -> ExportSnapshot:
+		"""
+		Load the snapshot of the given type and date, or None if there is none.
+		"""
+		path = self._path(type, date)
+		try:
+			return ExportSnapshot(
+				ids=np.load(os.path.join(path, "ids.npy"), mmap_mode="r"),
+				popularity=np.load(os.path.join(path, "popularity.npy"), mmap_mode="r"),
+			)
+		except (FileNotFoundError, ValueError):
+			return None
+
+	def save(self, type: str, date: date, snapshot: ExportSnapshot):
+		"""
+		Save the snapshot atomically and remove the oldest snapshots of the type.
+		"""
+		path = self._path(type, date)
+		tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+		os.makedirs(tmp_path)
+		try:
+			np.save(os.path.join(tmp_path, "ids.npy"), np.ascontiguousarray(snapshot.ids, dtype=np.int32))
+			np.save(os.path.join(tmp_path, "popularity.npy"), np.ascontiguousarray(snapshot.popularity, dtype=np.float32))
+			if os.path.exists(path):
+				shutil.rmtree(path)
+			os.replace(tmp_path, path)
+		finally:
+			if os.path.exists(tmp_path):
+				shutil.rmtree(tmp_path)
+
+		type_directory = os.path.join(self.directory, type)
+		snapshots = sorted(name for name in os.listdir(type_directory) if not name.endswith(".tmp"))
+		for name in snapshots[:-self.keep]:
+			shutil.rmtree(os.path.join(type_directory, name), ignore_errors=True)
+
+class DatabaseExportSnapshotStore:
+	"""
+	Stores export snapshots in the database, one row per type and date, so that
+	they outlive the ephemeral workers running the flows (unlike `ExportSnapshotStore`).
+	The ids and popularity arrays are kept as raw bytes.
+
+	The table is created by `sync_tmdb/sql/sync_export_snapshot.sql`. Until it exists,
+	no snapshot is found and every run compares the export with the database.
+	"""
+	def __init__(self, db_client: DBClient, table: str = "tmdb.sync_export_snapshot", keep: int = 3):
+		self.db_client = db_client
+		self.table = table
+		self.keep = keep
+
+	def load(self, type: str, date: date) -> ExportSnapshot:
+		"""
+		Load the snapshot of the given type and date, or None if there is none.
+		"""
+		conn = self.db_client.get_connection()
+		try:
+			with conn.cursor() as cursor:
+				cursor.execute(f"SELECT ids, popularity FROM {self.table} WHERE type = %s AND date = %s", (type, date))
+				row = cursor.fetchone()
+			conn.commit()
+		except psycopg2.errors.UndefinedTable:
+			return None
+		finally:
+			self.db_client.return_connection(conn)
+		if row is None:
+			return None
+		return ExportSnapshot(
+			ids=np.frombuffer(row[0], dtype=np.int32),
+			popularity=np.frombuffer(row[1], dtype=np.float32),
+		)
+
+	def save(self, type: str, date: date, snapshot: ExportSnapshot):
+		"""
+		Save the snapshot and remove the oldest snapshots of the type, in one transaction.
+		"""
+		conn = self.db_client.get_connection()
+		try:
+			with conn.cursor() as cursor:
+				cursor.execute(f"""
+					INSERT INTO {self.table} (type, date, ids, popularity)
+					VALUES (%s, %s, %s, %s)
+					ON CONFLICT (type, date) DO UPDATE
+					SET ids = EXCLUDED.ids, popularity = EXCLUDED.popularity;
+				""", (
+					type,
+					date,
+					psycopg2.Binary(np.ascontiguousarray(snapshot.ids, dtype=np.int32).tobytes()),
+					psycopg2.Binary(np.ascontiguousarray(snapshot.popularity, dtype=np.float32).tobytes()),
+				))
+				cursor.execute(f"""
+					DELETE FROM {self.table}
+					WHERE type = %s AND date NOT IN (
+						SELECT date FROM {self.table} WHERE type = %s ORDER BY date DESC LIMIT %s
+					);
+				""", (type, type, self.keep))
+			conn.commit()
+		except Exception:
+			conn.rollback()
+			raise
+		finally:
+			self.db_client.return_connection(conn)
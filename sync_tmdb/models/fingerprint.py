@@ -0,0 +1,149 @@
+import hashlib
+from .db_client import DBClient
+from .table_spec import TableSpec
+from ..utils.loader import load_tables
+
+class FingerprintStore:
+	"""
+	Content fingerprints of the entities of a flow, used to skip the entities
+	whose mapped rows did not change since they were last loaded.
+
+	The fingerprint is a hash of the normalized mapped rows of the entity (all
+	its tables, rows sorted) and of its Typesense document, without the columns
+	that change on their own every day (`popularity`, `updated_at`), which are kept up
+	to date by `update_popularity`.
+
+	The fingerprints are saved once the entities are loaded and indexed in Typesense,
+	so that an entity whose load or indexing failed is processed again by the next run.
+
+	The table is created by `sync_tmdb/sql/sync_fingerprint.sql`. Until it exists,
+	the store is disabled: no entity is skipped and no fingerprint is saved.
+
+	When the merge filters the foreign keys (`fk_filter_mode="sql"`), the hashed rows
+	are not the loaded ones: a row dropped for a missing reference would never be
+	loaded once the reference exists. No entity is skipped then, the fingerprints
+	are still saved.
+	"""
+	name = "fingerprint"
+	columns: list[str] = ["type", "id", "fingerprint"]
+	on_conflict: list[str] = ["type", "id"]
+	excluded_columns: set[str] = {"popularity", "updated_at"}
+
+	def __init__(self, db_client: DBClient, table: str, type: str, specs: list[TableSpec], filter_references: bool = False, logger = None):
+		"""
+		Args:
+			db_client (DBClient): The client used to read the stored fingerprints.
+			table (str): The fingerprint table.
+			type (str): The type of the entities (e.g. "movie").
+			specs (list[TableSpec]): The tables of the entities, used to find the excluded columns.
+			filter_references (bool, optionnel): Whether the merge filters the references of the tables. Default: False.
+			logger (optionnel): The logger warning when the table is missing. Default: None.
+		"""
+		self.db_client = db_client
+		self.table = table
+		self.type = type
+		self.logger = logger
+		self._enabled: bool = None
+		# Unchanged entities are only skipped when their rows are loaded as hashed
+		self.skip_unchanged: bool = not (filter_references and any(spec.references or spec.optional_references for spec in specs))
+		# Positions of the hashed columns of each table
+		self.hashed_columns: dict[str, list[int]] = {
+			spec.name: [index for index, column in enumerate(spec.columns) if column.strip('"') not in self.excluded_columns]
+			for spec in specs
+		}
+
+	@property
+	def enabled(self) -> bool:
+		"""
+		Whether the fingerprint table exists, checked once.
+		"""
+		if self._enabled is None:
+			conn = self.db_client.get_connection()
+			try:
+				with conn.cursor() as cursor:
+					cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (self.table,))
+					self._enabled = cursor.fetchone()[0]
+			except Exception as e:
+				raise ValueError(f"Failed to check fingerprint table {self.table}: {e}")
+			finally:
+				self.db_client.return_connection(conn)
+			if not self._enabled and self.logger:
+				self.logger.warning(f"Fingerprint table {self.table} not found, every {self.type} is loaded (see sync_tmdb/sql/sync_fingerprint.sql)")
+		return self._enabled
+
+	@property
+	def spec(self) -> TableSpec:
+		"""
+		The spec loading the fingerprints.
+		"""
+		return TableSpec(self.name, self.table, self.columns, self.on_conflict, upsert=True)
+
+	def compute(self, rows: dict[str, list[tuple]], document: dict = None) -> str:
+		"""
+		Compute the fingerprint of an entity.
+
+		Args:
+			rows (dict[str, list[tuple]]): The mapped rows of the entity, by table name.
+			document (dict, optionnel): The Typesense document of the entity. Default: None.
+
+		Returns:
+			str: The hex digest of the normalized rows.
+		"""
+		digest = hashlib.blake2b(digest_size=16)
+		for name in sorted(rows):
+			hashed_columns = self.hashed_columns[name]
+			digest.update(f"\x1e{name}".encode())
+			# The order of the lists of TMDB is not stable, the rows are sorted
+			for row in sorted(repr(tuple(row[index] for index in hashed_columns)) for row in rows[name]):
+				digest.update(f"\x1f{row}".encode())
+		if document is not None:
+			# Lists built from sets (e.g. titles) have no stable order either
+			items = sorted(
+				(key, sorted(value, key=repr) if isinstance(value, list) else value)
+				for key, value in document.items() if key not in self.excluded_columns
+			)
+			digest.update(f"\x1edocument{items!r}".encode())
+		return digest.hexdigest()
+
+	def row(self, id: int, fingerprint: str) -> tuple:
+		"""
+		Return the row of the fingerprint table for an entity.
+		"""
+		return (self.type, id, fingerprint)
+
+	def get(self, ids) -> dict[int, str]:
+		"""
+		Get the stored fingerprints of the given ids, none when unchanged entities are not skipped.
+		"""
+		if len(ids) == 0 or not self.skip_unchanged or not self.enabled:
+			return {}
+		conn = self.db_client.get_connection()
+		try:
+			with conn.cursor() as cursor:
+				cursor.execute(f"SELECT id, fingerprint FROM {self.table} WHERE type = %s AND id = ANY(%s)", (self.type, list(ids)))
+				return dict(cursor.fetchall())
+		except Exception as e:
+			raise ValueError(f"Failed to get fingerprints of {self.type}: {e}")
+		finally:
+			self.db_client.return_connection(conn)
+
+	def save(self, rows: list[tuple]):
+		"""
+		Save the fingerprints of loaded and indexed entities (see `row`).
+		"""
+		if len(rows) == 0 or not self.enabled:
+			return
+		buffer = self.spec.buffer()
+		buffer.extend(rows)
+		try:
+			load_tables(self.db_client, [self.spec], {self.name: buffer})
+		except Exception as e:
+			raise ValueError(f"Failed to save fingerprints of {self.type}: {e}")
+
+	def delete(self, cursor, ids):
+		"""
+		Delete the fingerprints of the given ids, in the transaction of the cursor
+		(e.g. when the entities are pruned, so that they are loaded again if they come back).
+		"""
+		if len(ids) > 0 and self.enabled:
+			cursor.execute(f"DELETE FROM {self.table} WHERE type = %s AND id = ANY(%s)", (self.type, list(ids)))
@@ -0,0 +1,198 @@
+import threading
+import numpy as np
+from .db_client import DBClient
+
+class IdBitmap:
+	"""
+	Compact set of non-negative integer ids: one byte per id up to the largest one,
+	instead of a boxed int and a hash slot per id in a Python set.
+	Only `in`, `add` and `discard` are supported, which is what the mappers need.
+	"""
+	def __init__(self, ids: np.ndarray = None):
+		ids = np.asarray(ids if ids is not None else [], dtype=np.int64)
+		self.bits = np.zeros(int(ids.max()) + 1 if len(ids) > 0 else 0, dtype=np.uint8)
+		self.bits[ids] = 1
+		# Indexing a memoryview is much cheaper than indexing the numpy array
+		self._view = memoryview(self.bits)
+		self._lock = threading.Lock()
+
+	def __contains__(self, id) -> bool:
+		view = self._view
+		try:
+			return 0 <= id < len(view) and view[id] == 1
+		except (TypeError, IndexError):
+			# Not an integer id (e.g. None)
+			return False
+
+	def __len__(self) -> int:
+		return int(np.count_nonzero(self.bits))
+
+	def ids(self) -> np.ndarray:
+		"""
+		Return the ids, sorted ascending.
+		"""
+		return np.flatnonzero(self.bits).astype(np.int32)
+
+	def add(self, ids):
+		"""
+		Add ids, growing the bitmap when needed.
+		"""
+		ids = np.fromiter(ids, dtype=np.int64) if not isinstance(ids, np.ndarray) else ids.astype(np.int64, copy=False)
+		if len(ids) == 0:
+			return
+		with self._lock:
+			size = int(ids.max()) + 1
+			if size > len(self.bits):
+				# Grown with some headroom, the new array is swapped in at once for the readers
+				bits = np.zeros(max(size, len(self.bits) + len(self.bits) // 8), dtype=np.uint8)
+				bits[:len(self.bits)] = self.bits
+				bits[ids] = 1
+				self.bits = bits
+				self._view = memoryview(bits)
+			else:
+				self.bits[ids] = 1
+
+	def discard(self, ids):
+		"""
+		Remove ids, if present.
+		"""
+		ids = np.fromiter(ids, dtype=np.int64) if not isinstance(ids, np.ndarray) else ids.astype(np.int64, copy=False)
+		with self._lock:
+			ids = ids[(ids >= 0) & (ids < len(self.bits))]
+			self.bits[ids] = 0
+
+class AllIds:
+	"""
+	Stands for every id, when the foreign keys are filtered by the database
+	instead of the mappers (`fk_filter_mode="sql"`): the mappers keep every row.
+	"""
+	def __contains__(self, id) -> bool:
+		return id is not None
+
+class ReferenceIds:
+	"""
+	Registry of the ids of the reference tables (person, keyword, company...)
+	used by the mappers to filter out the rows referencing missing entities.
+
+	Each table is loaded once per process, when first needed, and shared by
+	every subflow. Integer ids are kept in an `IdBitmap`, other keys (e.g. the
+	ISO codes of the languages) in a set. The subflows that insert or delete
+	rows of a reference table keep the loaded ids up to date with `add` and
+	`discard`, so a table loaded by an earlier subflow is never read again.
+	"""
+	_instances: dict = {}
+	_instances_lock = threading.Lock()
+	# OIDs of int2, int4 and int8
+	INTEGER_TYPES = (21, 23, 20)
+
+	def __init__(self, db_client: DBClient, fetch_size: int = 100000):
+		self.db_client = db_client
+		self.fetch_size = fetch_size
+		self.tables: dict[tuple[str, str], IdBitmap | set] = {}
+		self._lock = threading.Lock()
+		# One lock per table, so that loading a large table only holds back the callers of that table
+		self._table_locks: dict[tuple[str, str], threading.Lock] = {}
+
+	@classmethod
+	def shared(cls, db_client: DBClient) -> "ReferenceIds":
+		"""
+		Return the registry shared by every config of the process.
+		"""
+		with cls._instances_lock:
+			instance = cls._instances.get("postgres")
+			if instance is None:
+				instance = cls(db_client=db_client)
+				cls._instances["postgres"] = instance
+			return instance
+
+	@classmethod
+	def clear_all(cls):
+		"""
+		Forget the ids loaded by the shared registries, e.g. at the end of a run.
+		"""
+		with cls._instances_lock:
+			cls._instances.clear()
+
+	def _load(self, table: str, column: str) -> IdBitmap | set:
+		conn = self.db_client.get_connection()
+		try:
+			batches = []
+			keys = set()
+			# Server-side cursor, the ids are read in batches instead of all at once
+			with conn.cursor(name=f"reference_ids_{column}") as cursor:
+				cursor.itersize = self.fetch_size
+				cursor.execute(f"SELECT {column} FROM {table}")
+				while True:
+					rows = cursor.fetchmany(self.fetch_size)
+					if not rows:
+						break
+					if isinstance(rows[0][0], int):
+						batches.append(np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)))
+					else:
+						keys.update(row[0] for row in rows)
+				is_integer = cursor.description[0].type_code in self.INTEGER_TYPES
+			conn.commit()
+			return IdBitmap(np.concatenate(batches) if batches else None) if is_integer else keys
+		except Exception as e:
+			raise ValueError(f"Failed to load the ids of {table}: {e}")
+		finally:
+			self.db_client.return_connection(conn)
+
+	def get(self, table: str, column: str = "id") -> IdBitmap | set:
+		"""
+		Get the ids of a table, loaded the first time.
+
+		Args:
+			table (str): The table.
+			column (str, optionnel): The key column. Default: "id".
+		"""
+		key = (table, column)
+		with self._lock:
+			if key in self.tables:
+				return self.tables[key]
+			table_lock = self._table_locks.setdefault(key, threading.Lock())
+		with table_lock:
+			with self._lock:
+				if key in self.tables:
+					return self.tables[key]
+			ids = self._load(table, column)
+			with self._lock:
+				self.tables[key] = ids
+			return ids
+
+	def _loaded(self, key: tuple[str, str]) -> IdBitmap | set:
+		"""
+		Return the ids of a table if it is loaded, waiting for a load in progress
+		(the ids inserted or deleted meanwhile may be missing from it).
+		"""
+		with self._lock:
+			table_lock = self._table_locks.get(key)
+		if table_lock is not None:
+			with table_lock:
+				pass
+		with self._lock:
+			return self.tables.get(key)
+
+	def add(self, table: str, ids, column: str = "id"):
+		"""
+		Add inserted ids to a table, if it is loaded.
+		"""
+		ids_set = self._loaded((table, column))
+		if ids_set is None:
+			return
+		if isinstance(ids_set, IdBitmap):
+			ids_set.add(ids)
+		else:
+			ids_set.update(ids)
+
+	def discard(self, table: str, ids, column: str = "id"):
+		"""
+		Remove deleted ids from a table, if it is loaded.
+		"""
+		ids_set = self._loaded((table, column))
+		if ids_set is None:
+			return
+		if isinstance(ids_set, IdBitmap):
+			ids_set.discard(ids)
+		else:
+			ids_set.difference_update(ids)
@@ -0,0 +1,96 @@
+from typing import Iterable, Iterator
+
+class RowBuffer:
+	"""
+	Columnar buffer of the rows of one table.
+
+	Mappers return plain tuples, one value per column in the order of the
+	`*_columns` list of the config. The values are kept in one list per column,
+	and the whole buffer is loaded once per chunk instead of once per entity.
+
+	When key columns are given (usually the conflict columns of the table),
+	duplicated rows are dropped as they are added: the first row wins. Only the
+	hash of each key is kept, the key itself is compared on a hash match.
+	"""
+	def __init__(self, columns: list[str], key_columns: list[str] = None):
+		"""
+		Args:
+			columns (list[str]): The column names of the table.
+			key_columns (list[str], optionnel): The columns identifying a row. Default: None (no deduplication).
+		"""
+		if not columns:
+			raise ValueError("Columns must be provided")
+		self.columns: list[str] = columns
+		self.data: list[list] = [[] for _ in columns]
+		self.key_columns: list[str] = key_columns
+		self.key_indexes: list[int] = [columns.index(column) for column in key_columns] if key_columns else None
+		# Hash of each key -> index of the first row with this hash
+		self._seen: dict[int, int] = {}
+		# Keys whose hash is already used by another key
+		self._collisions: set[tuple] = set()
+		self.duplicates = 0
+
+	def __len__(self) -> int:
+		return len(self.data[0])
+
+	def _is_duplicate(self, row: tuple) -> bool:
+		key = tuple(row[index] for index in self.key_indexes)
+		key_hash = hash(key)
+		index = self._seen.get(key_hash)
+		if index is None:
+			self._seen[key_hash] = len(self)
+			return False
+		if all(self.data[i][index] == value for i, value in zip(self.key_indexes, key)):
+			return True
+		if key in self._collisions:
+			return True
+		self._collisions.add(key)
+		return False
+
+	def append(self, row: tuple):
+		"""
+		Append a single row.
+		"""
+		if len(row) != len(self.columns):
+			raise ValueError(f"Expected {len(self.columns)} values, got {len(row)}: {row}")
+		if self.key_indexes is not None and self._is_duplicate(row):
+			self.duplicates += 1
+			return
+		for values, value in zip(self.data, row):
+			values.append(value)
+
+	def extend(self, rows: Iterable[tuple]):
+		"""
+		Append the rows returned by a mapper.
+		"""
+		if self.key_indexes is not None:
+			for row in rows:
+				self.append(row)
+			return
+		rows = rows if isinstance(rows, list) else list(rows)
+		if not rows:
+			return
+		for row in rows:
+			if len(row) != len(self.columns):
+				raise ValueError(f"Expected {len(self.columns)} values, got {len(row)}: {row}")
+		for values, column in zip(self.data, zip(*rows)):
+			values.extend(column)
+
+	def column(self, name: str) -> list:
+		"""
+		Return the values of a column.
+		"""
+		return self.data[self.columns.index(name)]
+
+	def rows(self) -> Iterator[tuple]:
+		"""
+		Iterate over the rows, as tuples in column order.
+		"""
+		return zip(*self.data)
+
+	def clear(self):
+		for values in self.data:
+			values.clear()
+		self._seen.clear()
+		self._collisions.clear()
+		self.duplicates = 0
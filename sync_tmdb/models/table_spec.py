@@ -0,0 +1,80 @@
+from typing import Callable
+from .row_buffer import RowBuffer
+
+class TableSpec:
+	"""
+	Declarative description of how the rows of one table are loaded.
+
+	The specs of an entity flow are listed in load order (parents before
+	children) and executed by `load_tables`:
+	- stage: the rows are copied into an UNLOGGED staging table created LIKE the table
+	- pre-delete: for `delete="replace"`, the rows of the loaded parents are deleted,
+	  and the `before_insert` hook of the spec is run
+	- insert: the rows are inserted, upserted on the conflict columns when `upsert` is set
+	- prune: for `delete="prune"`, the rows of the loaded parents that are no longer
+	  in the batch are deleted
+	In the "diff" merge mode, "replace" only deletes the rows missing from the batch,
+	and only the new or changed rows are written (see `merge_tables`).
+
+	When the foreign keys are filtered by the database (`fk_filter_mode="sql"`), the
+	staged rows whose `references` do not exist are dropped, and the `optional_references`
+	that do not exist are set to NULL, before the merge.
+	"""
+	REPLACE = "replace"
+	PRUNE = "prune"
+
+	def __init__(
+		self,
+		name: str,
+		table: str,
+		columns: list[str],
+		on_conflict: list[str],
+		upsert: bool = False,
+		parent: str = None,
+		parent_key: str = None,
+		delete: str = None,
+		key_columns: list[str] = None,
+		before_insert: Callable = None,
+		references: dict[str, str] = None,
+		optional_references: dict[str, str] = None,
+	):
+		"""
+		Args:
+			name (str): The name of the rows of the table (e.g. "movie_images").
+			table (str): The table.
+			columns (list[str]): The columns, in the order of the mapped rows.
+			on_conflict (list[str]): The conflict columns of the table.
+			upsert (bool, optionnel): Whether to update the existing rows on conflict. Default: False.
+			parent (str, optionnel): The name of the parent spec, whose `id` is referenced by `parent_key`. Default: None.
+			parent_key (str, optionnel): The column referencing the parent. Default: None.
+			delete (str, optionnel): How the outdated rows of the loaded parents are deleted:
+				"replace" (before inserting) or "prune" (after upserting). Default: None.
+			key_columns (list[str], optionnel): The columns used to drop duplicated rows. Default: the conflict columns.
+			before_insert (Callable, optionnel): Called with (cursor, staging_tables) in the pre-delete phase. Default: None.
+			references (dict[str, str], optionnel): The table referenced by the `id` of each foreign key column,
+				the rows referencing a missing id are dropped. Default: None.
+			optional_references (dict[str, str], optionnel): Same as `references`, but the missing ids are set to NULL. Default: None.
+		"""
+		if delete not in (None, self.REPLACE, self.PRUNE):
+			raise ValueError(f"Invalid delete strategy for {table}: {delete}")
+		if delete and not (parent and parent_key):
+			raise ValueError(f"A parent and a parent key are required to delete outdated rows of {table}")
+		self.name = name
+		self.table = table
+		self.columns = columns
+		self.on_conflict = on_conflict
+		self.on_conflict_update: list[str] = [col for col in columns if col not in on_conflict]
+		self.upsert = upsert
+		self.parent = parent
+		self.parent_key = parent_key
+		self.delete = delete
+		self.key_columns = key_columns or on_conflict
+		self.before_insert = before_insert
+		self.references = references or {}
+		self.optional_references = optional_references or {}
+
+	def buffer(self) -> RowBuffer:
+		"""
+		Return an empty buffer for the rows of the table.
+		"""
+		return RowBuffer(self.columns, self.key_columns)
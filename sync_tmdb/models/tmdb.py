@@ -1,12 +1,13 @@
 from prefect import task
 from prefect.logging import get_run_logger
 from prefect.blocks.system import Secret
-from itertools import cycle
-import requests
 from datetime import date
-from ..utils.file_manager import download_file, decompress_file
-from ..utils.concurreny import limit_concurrency
-import os
+from typing import Any, Awaitable, Callable, Iterable, Iterator
+from ..utils.file_manager import stream_gzip_lines
+from .tmdb_fetcher import TMDBFetcher
+from array import array
+import json
+import numpy as np
 import pandas as pd
 
 class TMDBClient:
@@ -14,10 +15,23 @@ class TMDBClient:
 		api_keys = self._get_tmdb_api_keys()
 		if not api_keys or len(api_keys) == 0:
 			raise ValueError("No API keys found")
-		self.api_key_cycle = cycle(api_keys)
-		self.api_key: str = self._get_next_api_key()
 		self.logger = get_run_logger()
 		self.base_url = config.get("tmdb_base_url", "https://api.themoviedb.org/3")
+		# Languages of the images appended to detail requests ("null" for images without text), all of them when None.
+		# The stored images in other languages are deleted by the next load of their movie, serie or collection.
+		self.image_languages: list = config.get("tmdb_image_languages", None)
+		self.fetcher = TMDBFetcher.shared(
+			base_url=self.base_url,
+			api_keys=api_keys,
+			max_connections=config.get("tmdb_max_connections", 64),
+			timeout=config.get("tmdb_timeout", 30),
+			rate_limit=config.get("tmdb_rate_limit", {}),
+			concurrency=config.get("tmdb_concurrency", {}),
+			retry=config.get("tmdb_retry", {}),
+			circuit_breaker=config.get("tmdb_circuit_breaker", {}),
+		)
+		# Payloads fetched ahead of the mapping, bounds the memory used by a chunk
+		self.max_pending: int = config.get("tmdb_max_pending", 128)
 	
 	def _get_tmdb_api_keys(self) -> list:
 		try:
@@ -28,65 +42,96 @@ class TMDBClient:
 		except Exception as e:
 			raise ValueError(f"No API keys found")
 		
-	def _get_next_api_key(self) -> str:
-		return next(self.api_key_cycle)
-	
-	@task(cache_policy=None)
-	@limit_concurrency(max_workers=20)
-	def request(self, endpoint: str, params: dict = {}) -> dict:
-		# rate_limit("tmdb-api")
-		self.api_key = self._get_next_api_key()
-		url = f"{self.base_url}/{endpoint}"
-		params["api_key"] = self.api_key
-		response = requests.get(url, params=params)
-		response.raise_for_status()
-		data = response.json()
-		if "success" in data and not data["success"]:
-			raise ValueError(f"Failed to get data from TMDB: {data}")
-		return data
+	def request(self, endpoint: str, params: dict = None) -> dict:
+		"""
+		Request a TMDB endpoint. Plain method on purpose, a Prefect task per
+		request is far too much orchestration overhead.
+		"""
+		return self.fetcher.request(endpoint, params)
+
+	def fetch_many(self, fn: Callable[[Any], Awaitable], ids: Iterable) -> Iterator[tuple[Any, Any]]:
+		"""
+		Feed a batch of ids to the async fetch engine.
+
+		Args:
+			fn (Callable): Coroutine function fetching one id (e.g. get_tmdb_movie_details).
+			ids (Iterable): The ids to fetch.
+
+		Yields:
+			tuple: (id, payload) in completion order, the payload is the exception
+				raised by `fn` when the id could not be fetched. At most `max_pending`
+				payloads are fetched ahead of the consumer.
+		"""
+		return self.fetcher.map(fn, ids, return_exceptions=True, max_pending=self.max_pending)
+
+	def rate_limit_usage(self) -> dict[str, dict]:
+		"""
+		Return how much of each API key quota is used.
+		"""
+		return self.fetcher.rate_limiter.usage()
+
+	def concurrency_limits(self) -> dict[str, int]:
+		"""
+		Return the current concurrency limit of each endpoint family.
+		"""
+		return self.fetcher.concurrency.limits()
+
+	def request_stats(self) -> dict[str, int]:
+		"""
+		Return the aggregated outcome of the requests sent so far.
+		"""
+		return dict(self.fetcher.stats)
+
+	def circuit_breaker_states(self) -> dict[str, dict]:
+		"""
+		Return the state of the circuit breaker of each endpoint family.
+		"""
+		return self.fetcher.circuit_breakers.states()
 
 	@task(cache_policy=None)
 	def get_export_ids(self, type: str, date: date, columns_to_keep: list = ['id', 'popularity']) -> pd.DataFrame:
 		"""
-		Downloads, reads, and filters a TMDB export file efficiently.
-		- Reads the file in chunks to avoid loading everything into memory.
-		- Keeps only the 'id' and 'popularity' columns.
-		- Downcasts data types to further reduce memory usage.
+		Streams and parses a TMDB export file.
+		- Downloads, decompresses and parses the file in a single pass, without touching the disk.
+		- Keeps only the requested columns.
+		- Stores ids as int32 and popularity as float32 while parsing, so the
+		  full file is never held in memory.
 		"""
-		file = None
 		try:
 			tmdb_export_collection_url_template = "http://files.tmdb.org/p/exports/{type}_ids_{date}.json.gz"
 			url = tmdb_export_collection_url_template.format(type=type, date=date.strftime("%m_%d_%Y"))
 
-			self.logger.info(f"Downloading and processing {url}...")
-			file = download_file(url=url, tmp_directory=".tmp", prefix=f"{type}_ids_{date}")
-			file = decompress_file(file)
+			self.logger.info(f"Streaming and processing {url}...")
+			columns = {column: self._export_column(column) for column in columns_to_keep}
+			for line in stream_gzip_lines(url):
+				item = json.loads(line)
+				for column, values in columns.items():
+					value = item.get(column)
+					if value is None and isinstance(values, array):
+						value = 0
+					values.append(value)
 
-			chunk_iterator = pd.read_json(file, lines=True, chunksize=100000)
-			
-			processed_chunks = []
-			
-			for chunk in chunk_iterator:
-				existing_columns = [col for col in columns_to_keep if col in chunk.columns]
-				processed_chunks.append(chunk[existing_columns])
-	
-			df = pd.concat(processed_chunks, ignore_index=True)
+			df = pd.DataFrame({
+				column: np.frombuffer(values, dtype=np.int32 if values.typecode == "i" else np.float32) if isinstance(values, array) else values
+				for column, values in columns.items()
+			})
 			self.logger.info(f"Successfully loaded {len(df)} records with relevant columns.")
 
 			if len(df) == 0:
 				raise ValueError(f"No export ids found for {type} on {date}")
 
-			df['id'] = pd.to_numeric(df['id'], downcast='integer')
-			if 'popularity' in df.columns:
-				df['popularity'] = pd.to_numeric(df['popularity'], downcast='float')
-				
 			return df
 
 		except Exception as e:
 			raise ValueError(f"Failed to get export ids: {e}")
-		finally:
-			if file and os.path.exists(file):
-				os.remove(file)
+
+	@staticmethod
+	def _export_column(column: str) -> array | list:
+		if column == "id":
+			return array("i")
+		if column == "popularity":
+			return array("f")
+		return []
 	
 	@task(cache_policy=None, log_prints=False)
 	def get_changed_ids(self, type: str, start_date: date, end_date: date) -> set:
@@ -94,20 +139,21 @@ class TMDBClient:
 			ids: set = set()
 			self.logger.info(f"Getting changed ids for {type} from {start_date} to {end_date}")
 
-			data = self.request(f"{type}/changes", {"start_date": start_date.strftime("%Y-%m-%d"), "end_date": end_date.strftime("%Y-%m-%d")})
+			params = {"start_date": start_date.strftime("%Y-%m-%d"), "end_date": end_date.strftime("%Y-%m-%d")}
+			data = self.request(f"{type}/changes", params)
 			numbers_of_pages = data["total_pages"]
 			number_of_results = data["total_results"]
+			ids |= {item["id"] for item in data.get("results", [])}
 
-			responses = []
-			for i in range(1, numbers_of_pages+1):
-				responses.append(self.request.submit(f"{type}/changes", {"page": i, "start_date": start_date.strftime("%Y-%m-%d"), "end_date": end_date.strftime("%Y-%m-%d")}))
+			# The remaining pages are fetched concurrently by the fetch engine
+			async def get_page(page: int) -> dict:
+				return await self.fetcher.get(f"{type}/changes", {**params, "page": page})
 
-			for i, response in enumerate(responses, start=1):
-				results = response.result()
+			for page, results in self.fetcher.map(get_page, range(2, numbers_of_pages + 1)):
 				if "results" in results:
-					ids |= set([item["id"] for item in results["results"]])
+					ids |= {item["id"] for item in results["results"]}
 				else:
-					raise ValueError(f"Failed to get changed ids for page {i}: {results}")
+					raise ValueError(f"Failed to get changed ids for page {page}: {results}")
 			
 			if len(ids) != number_of_results:
 				self.logger.warning(f"Number of ids does not match the number of results: {len(ids)} != {number_of_results}")
@@ -116,4 +162,3 @@ class TMDBClient:
 			return ids
 		except Exception as e:
 			raise ValueError(f"Failed to get changed ids: {e}")
-	
\ No newline at end of file
@@ -0,0 +1,316 @@
+import asyncio
+import queue
+from collections import Counter
+import threading
+import time
+from typing import Any, Awaitable, Callable, Iterable, Iterator
+import httpx
+from ..utils.rate_limit import APIKeyRateLimiter, parse_retry_after
+from ..utils.concurreny import AdaptiveConcurrency, endpoint_family
+from ..utils.retry import RetryPolicy, CircuitBreakers, CircuitOpenError
+
+class TMDBRequestError(Exception):
+	"""Raised when TMDB answers with an error status."""
+	def __init__(self, message: str, status_code: int = None):
+		super().__init__(message)
+		self.status_code = status_code
+
+class TMDBNotFoundError(TMDBRequestError):
+	"""Raised when the requested resource does not exist (anymore) on TMDB."""
+
+class TMDBFetcher:
+	"""
+	Asynchronous fetch engine for the TMDB API.
+
+	An asyncio event loop runs in a background thread and owns a single
+	httpx.AsyncClient, so every request of the run reuses the same keep-alive
+	connection pool instead of opening a new TCP/TLS connection each time.
+	Synchronous code (flows, tasks) talks to it through `request` and `map`.
+	Every request goes through the shared APIKeyRateLimiter, and the number of
+	in-flight requests is adapted per endpoint family (AIMD). Timeouts, network
+	errors and 5xx are retried with jittered backoff until the request deadline,
+	and a circuit breaker per endpoint family holds requests back while the
+	endpoint keeps failing.
+	"""
+	_instances: dict = {}
+	_instances_lock = threading.Lock()
+
+	def __init__(self, base_url: str, api_keys: list, max_connections: int = 64, timeout: float = 30.0, rate_limit: dict = None, concurrency: dict = None, retry: dict = None, circuit_breaker: dict = None, max_throttled_retries: int = 5):
+		rate_limit = rate_limit or {}
+		concurrency = concurrency or {}
+		retry = retry or {}
+		circuit_breaker = circuit_breaker or {}
+		self.base_url = base_url
+		self.rate_limiter = APIKeyRateLimiter(
+			api_keys=api_keys,
+			requests_per_second=rate_limit.get("requests_per_second", 40),
+			burst=rate_limit.get("burst"),
+		)
+		self.concurrency = AdaptiveConcurrency(
+			initial=concurrency.get("initial", 10),
+			minimum=concurrency.get("min", 2),
+			maximum=concurrency.get("max", max_connections),
+			target_latency=concurrency.get("target_p95_latency", 1.5),
+			max_error_rate=concurrency.get("max_error_rate", 0.05),
+		)
+		self.retry_policy = RetryPolicy(
+			max_attempts=retry.get("max_attempts", 5),
+			base_delay=retry.get("base_delay", 0.5),
+			max_delay=retry.get("max_delay", 30.0),
+			deadline=retry.get("deadline", 120.0),
+		)
+		self.circuit_breakers = CircuitBreakers(
+			failure_threshold=circuit_breaker.get("failure_threshold", 20),
+			reset_timeout=circuit_breaker.get("reset_timeout", 30.0),
+		)
+		self.max_throttled_retries = max_throttled_retries
+		self.max_connections = max_connections
+		# Aggregated outcome of the requests, updated from the event loop thread only
+		self.stats: Counter = Counter()
+		self.timeout = timeout
+
+		self._loop: asyncio.AbstractEventLoop = None
+		self._thread: threading.Thread = None
+		self._client: httpx.AsyncClient = None
+		self._lock = threading.Lock()
+
+	@classmethod
+	def shared(cls, base_url: str, api_keys: list, **kwargs) -> "TMDBFetcher":
+		"""
+		Return the fetcher shared by every TMDBClient of the process for the given base url.
+		"""
+		with cls._instances_lock:
+			if base_url not in cls._instances:
+				cls._instances[base_url] = cls(base_url=base_url, api_keys=api_keys, **kwargs)
+			return cls._instances[base_url]
+
+	@classmethod
+	def close_all(cls):
+		"""
+		Close the shared fetchers, their connection pools and event loops.
+		"""
+		with cls._instances_lock:
+			instances = list(cls._instances.values())
+			cls._instances.clear()
+		for instance in instances:
+			instance.close()
+
+	# --------------------------------- Lifecycle -------------------------------- #
+	def _start(self):
+		with self._lock:
+			if self._loop is not None:
+				return
+			loop = asyncio.new_event_loop()
+			ready = threading.Event()
+
+			def run():
+				asyncio.set_event_loop(loop)
+				self._client = httpx.AsyncClient(
+					limits=httpx.Limits(
+						max_connections=self.max_connections,
+						max_keepalive_connections=self.max_connections,
+					),
+					# Requests wait for a free connection as long as needed, the AIMD limiters do the throttling
+					timeout=httpx.Timeout(self.timeout, pool=None),
+				)
+				ready.set()
+				loop.run_forever()
+
+			thread = threading.Thread(target=run, name="tmdb-fetcher", daemon=True)
+			thread.start()
+			ready.wait()
+			self._loop = loop
+			self._thread = thread
+
+	def close(self):
+		"""
+		Close the connection pool and stop the event loop.
+		"""
+		with self._lock:
+			if self._loop is None:
+				return
+			asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result()
+			self._loop.call_soon_threadsafe(self._loop.stop)
+			self._thread.join()
+			self._loop.close()
+			self._loop = None
+			self._thread = None
+			self._client = None
+
+	# --------------------------------- Requests --------------------------------- #
+	async def _acquire(self, endpoint: str) -> tuple[str, Any]:
+		"""
+		Wait for the rate limiter and the concurrency limiter of the endpoint family.
+		"""
+		api_key = await self.rate_limiter.acquire()
+		limiter = self.concurrency.get(endpoint)
+		await limiter.acquire()
+		return api_key, limiter
+
+	async def _send(self, endpoint: str, params: dict, api_key: str, limiter, timeout: float) -> httpx.Response:
+		"""
+		Send a single request and release the slots taken by `_acquire`.
+		"""
+		started_at = time.monotonic()
+		response = None
+		try:
+			response = await self._client.get(
+				f"{self.base_url}/{endpoint}",
+				params={**params, "api_key": api_key},
+				timeout=httpx.Timeout(max(timeout, 0.001), pool=None),
+			)
+		finally:
+			await limiter.release(
+				latency=time.monotonic() - started_at,
+				error=response is None or response.status_code == 429 or response.status_code >= 500,
+			)
+			self.rate_limiter.release(
+				api_key,
+				response.status_code if response is not None else 599,
+				parse_retry_after(response.headers.get("Retry-After")) if response is not None else None,
+			)
+		return response
+
+	async def get(self, endpoint: str, params: dict = None) -> Any:
+		"""
+		Request a TMDB endpoint and return the parsed JSON payload.
+		Must be awaited from the fetcher event loop (i.e. inside a coroutine given to `map` or `run`).
+
+		Raises:
+			TMDBNotFoundError: The resource does not exist on TMDB.
+			TMDBRequestError: TMDB answered with an error that is not worth retrying, or kept failing.
+			CircuitOpenError: The endpoint family is failing and the deadline does not allow to wait for it.
+			httpx.TransportError: The request kept failing on network errors or timeouts.
+		"""
+		params = dict(params or {})
+		breaker = self.circuit_breakers.get(endpoint)
+		# The deadline starts with the first attempt, time spent queued behind the limiters does not count
+		deadline = None
+		# Waiting for an open circuit is bounded from the start, the first attempt may never come
+		circuit_deadline = time.monotonic() + self.retry_policy.deadline
+		attempt = 0
+		throttled = 0
+		while True:
+			now = time.monotonic()
+			wait = breaker.retry_after(now)
+			if wait > 0:
+				if now + wait >= (deadline if deadline is not None else circuit_deadline):
+					self.stats["circuit_open"] += 1
+					raise CircuitOpenError(f"Circuit open for {endpoint_family(endpoint)}")
+				await asyncio.sleep(wait)
+				continue
+
+			api_key, limiter = await self._acquire(endpoint)
+			self.stats["requests"] += 1
+			if deadline is None:
+				deadline = time.monotonic() + self.retry_policy.deadline
+			try:
+				response = await self._send(endpoint, params, api_key, limiter, timeout=min(self.timeout, deadline - time.monotonic()))
+			except httpx.TransportError as e:
+				breaker.record_failure(time.monotonic())
+				self.stats["network_errors"] += 1
+				error = e
+			else:
+				if response.status_code == 429:
+					# Throttled: the key is penalized, try again with the key that has the most headroom
+					breaker.record_success()
+					self.stats["throttled"] += 1
+					throttled += 1
+					if throttled <= self.max_throttled_retries:
+						continue
+					self.stats["failed"] += 1
+					raise TMDBRequestError(f"Too many throttled requests for {endpoint}", response.status_code)
+				if response.status_code < 500:
+					breaker.record_success()
+					break
+				breaker.record_failure(time.monotonic())
+				self.stats["server_errors"] += 1
+				error = TMDBRequestError(f"TMDB answered {response.status_code} for {endpoint}", response.status_code)
+
+			attempt += 1
+			delay = self.retry_policy.backoff(attempt)
+			if attempt >= self.retry_policy.max_attempts or time.monotonic() + delay >= deadline:
+				self.stats["failed"] += 1
+				raise error
+			self.stats["retries"] += 1
+			await asyncio.sleep(delay)
+
+		if response.status_code == 404:
+			self.stats["not_found"] += 1
+			raise TMDBNotFoundError(f"{endpoint} not found", response.status_code)
+		if response.status_code >= 400:
+			self.stats["failed"] += 1
+			raise TMDBRequestError(f"TMDB answered {response.status_code} for {endpoint}: {response.text}", response.status_code)
+		self.stats["succeeded"] += 1
+		data = response.json()
+		if isinstance(data, dict) and data.get("success") is False:
+			raise ValueError(f"Failed to get data from TMDB: {data}")
+		return data
+
+	def run(self, coroutine: Awaitable) -> Any:
+		"""
+		Run a coroutine on the fetcher event loop and wait for its result.
+		"""
+		self._start()
+		return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+	def request(self, endpoint: str, params: dict = None) -> Any:
+		"""
+		Blocking version of `get`.
+		"""
+		return self.run(self.get(endpoint, params))
+
+	def map(self, fn: Callable[[Any], Awaitable], items: Iterable, return_exceptions: bool = False, max_pending: int = None) -> Iterator[tuple[Any, Any]]:
+		"""
+		Run the coroutine function `fn` for every item concurrently and yield
+		(item, result) tuples in completion order.
+
+		Args:
+			fn (Callable): Coroutine function called with a single item.
+			items (Iterable): The items to process (e.g. TMDB ids).
+			return_exceptions (bool): Yield the exception raised for an item as its result instead of raising it.
+			max_pending (int): Maximum number of items scheduled or completed but not yet consumed,
+				a new item is only scheduled once a result has been consumed. Default: no limit.
+
+		Yields:
+			tuple: (item, result) as soon as each call completes.
+		"""
+		self._start()
+		results: queue.Queue = queue.Queue()
+
+		async def run_one(item):
+			try:
+				results.put((item, await fn(item), None))
+			except BaseException as e:
+				results.put((item, None, e))
+
+		items = iter(items)
+		futures = set()
+
+		def schedule() -> bool:
+			for item in items:
+				future = asyncio.run_coroutine_threadsafe(run_one(item), self._loop)
+				futures.add(future)
+				future.add_done_callback(futures.discard)
+				return True
+			return False
+
+		pending = 0
+		while (max_pending is None or pending < max_pending) and schedule():
+			pending += 1
+		try:
+			while pending > 0:
+				item, result, error = results.get()
+				pending -= 1
+				if schedule():
+					pending += 1
+				if error is not None:
+					if not return_exceptions or not isinstance(error, Exception):
+						raise error
+					result = error
+				yield item, result
+				# Do not keep the last payload alive while waiting for the next one
+				del result
+		finally:
+			for future in list(futures):
+				future.cancel()
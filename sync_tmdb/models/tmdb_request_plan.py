@@ -0,0 +1,68 @@
+import asyncio
+from typing import Iterable
+from .tmdb_fetcher import TMDBFetcher
+
+class TMDBRequestPlan:
+	"""
+	Plans the requests needed to get a TMDB resource with its sub-resources.
+
+	Sub-resources are merged into `append_to_response` calls on the resource
+	endpoint, split into as few requests as the TMDB limit allows. Groups
+	of sub-resources given as tuples are never split across requests. The
+	requests are sent concurrently and their payloads merged into a single
+	dict, as if TMDB had no limit.
+	"""
+	# Maximum number of items in append_to_response, TMDB applies the same limit to every endpoint
+	APPEND_TO_RESPONSE_LIMIT = 20
+	# TMDB limit the number of languages of include_video_language to 5
+	VIDEO_LANGUAGES_LIMIT = 5
+
+	def __init__(self, endpoint: str, appends: Iterable[str | tuple] = (), params: dict = None, image_languages: list = None, video_languages: list = None):
+		self.endpoint = endpoint
+		self.groups: list[tuple] = [(append,) if isinstance(append, str) else tuple(append) for append in appends]
+		self.params = dict(params or {})
+		if image_languages:
+			self.params["include_image_language"] = ",".join(image_languages)
+		if video_languages:
+			if len(video_languages) > self.VIDEO_LANGUAGES_LIMIT:
+				raise ValueError(f"TMDB accepts at most {self.VIDEO_LANGUAGES_LIMIT} video languages, got {len(video_languages)}")
+			self.params["include_video_language"] = ",".join(video_languages)
+
+	def batches(self) -> list[list[str]]:
+		"""
+		Split the sub-resources into the append_to_response list of each request.
+		"""
+		batches: list[list[str]] = []
+		current: list[str] = []
+		for group in self.groups:
+			if len(group) > self.APPEND_TO_RESPONSE_LIMIT:
+				raise ValueError(f"Group {group} exceeds the append_to_response limit of {self.endpoint}")
+			if len(current) + len(group) > self.APPEND_TO_RESPONSE_LIMIT:
+				batches.append(current)
+				current = []
+			current.extend(group)
+		if current or not batches:
+			batches.append(current)
+		return batches
+
+	def requests(self) -> list[tuple[str, dict]]:
+		"""
+		Return the (endpoint, params) of each planned request.
+		"""
+		return [
+			(self.endpoint, {**self.params, "append_to_response": ",".join(batch)} if batch else dict(self.params))
+			for batch in self.batches()
+		]
+
+	async def fetch(self, fetcher: TMDBFetcher) -> dict:
+		"""
+		Send the planned requests concurrently and merge their payloads.
+		"""
+		batches = self.batches()
+		responses = await asyncio.gather(*(fetcher.get(endpoint, params) for endpoint, params in self.requests()))
+		data = responses[0]
+		for batch, response in zip(batches[1:], responses[1:]):
+			for append in batch:
+				if append in response:
+					data[append] = response[append]
+		return data
@@ -0,0 +1,9 @@
+-- Snapshots of the TMDB daily exports, compared with the next export to find the changed ids (see DatabaseExportSnapshotStore)
+CREATE TABLE IF NOT EXISTS tmdb.sync_export_snapshot (
+	type text NOT NULL,
+	date date NOT NULL,
+	-- Sorted ids (int32) and their popularity (float32), as raw little-endian arrays
+	ids bytea NOT NULL,
+	popularity bytea NOT NULL,
+	PRIMARY KEY (type, date)
+);
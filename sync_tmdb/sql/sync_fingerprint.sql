@@ -0,0 +1,7 @@
+-- Content fingerprints of the movies, series and persons, used to skip the unchanged ones (see FingerprintStore)
+CREATE TABLE IF NOT EXISTS tmdb.sync_fingerprint (
+	type text NOT NULL,
+	id bigint NOT NULL,
+	fingerprint text NOT NULL,
+	PRIMARY KEY (type, id)
+);
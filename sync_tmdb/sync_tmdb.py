@@ -3,18 +3,43 @@
 # ---------------------------------------------------------------------------- #
 
 from datetime import date
-import os
-import shutil
+from functools import partial
 
 # ---------------------------------- Prefect --------------------------------- #
 
 from prefect import flow
 from prefect.logging import get_run_logger
+from prefect.variables import Variable
 
 # ----------------------------------- Flows ---------------------------------- #
 from . import flows
+from .models.db_client import DBClient
+from .models.reference_ids import ReferenceIds
+from .models.tmdb_fetcher import TMDBFetcher
+from .utils.scheduler import run_dag
 # ---------------------------------------------------------------------------- #
 
+# Subflows to finish before each subflow, whose rows it references
+SUBFLOW_DEPENDENCIES: dict[str, list[str]] = {
+    "language": [],
+    "country": [],
+    "genre": [],
+    "keyword": ["language", "country"],
+    "collection": ["language", "country"],
+    "company": ["language", "country"],
+    "network": ["language", "country"],
+    "person": ["language", "country"],
+    "movie": ["language", "country", "genre", "keyword", "collection", "company", "person"],
+    "serie": ["language", "country", "genre", "keyword", "company", "network", "person"],
+}
+
+# Share of the subflow budget taken by each subflow, the ones fetching the most details weigh more
+SUBFLOW_WEIGHTS: dict[str, int] = {
+    "person": 2,
+    "movie": 2,
+    "serie": 2,
+}
+
 @flow(name="sync_tmdb", log_prints=True)
 def sync_tmdb(
     current_date: date = date.today(),
@@ -33,31 +58,35 @@ def sync_tmdb(
     logger.info(f"Starting synchronization with TMDb for {current_date}...")
 
     try:
-        if language:
-            flows.sync_tmdb_language(date=current_date)
-        if country:
-            flows.sync_tmdb_country(date=current_date)
-        if genre:
-            flows.sync_tmdb_genre(date=current_date)
-        if keyword:
-            flows.sync_tmdb_keyword(date=current_date)
-        if collection:
-            flows.sync_tmdb_collection(date=current_date)
-        if company:
-            flows.sync_tmdb_company(date=current_date)
-        if network:
-            flows.sync_tmdb_network(date=current_date)
-        if person:
-            flows.sync_tmdb_person(date=current_date)
-        if movie:
-            flows.sync_tmdb_movie(date=current_date)
-        if serie:
-            flows.sync_tmdb_serie(date=current_date)
+        subflows = {
+            "language": (language, flows.sync_tmdb_language),
+            "country": (country, flows.sync_tmdb_country),
+            "genre": (genre, flows.sync_tmdb_genre),
+            "keyword": (keyword, flows.sync_tmdb_keyword),
+            "collection": (collection, flows.sync_tmdb_collection),
+            "company": (company, flows.sync_tmdb_company),
+            "network": (network, flows.sync_tmdb_network),
+            "person": (person, flows.sync_tmdb_person),
+            "movie": (movie, flows.sync_tmdb_movie),
+            "serie": (serie, flows.sync_tmdb_serie),
+        }
+        # Independent subflows run concurrently, a budget of 1 runs them one after another
+        config = Variable.get("sync_tmdb_config", {})
+        run_dag(
+            jobs={name: partial(subflow, date=current_date) for name, (enabled, subflow) in subflows.items() if enabled},
+            dependencies=SUBFLOW_DEPENDENCIES,
+            weights={**SUBFLOW_WEIGHTS, **config.get("subflow_weights", {})},
+            budget=config.get("subflow_budget", 4),
+            logger=logger,
+        )
 
         logger.info(f"Successfully synchronized with TMDb for {current_date}.")
 
     except Exception as e:
         logger.error(f"Syncing with TMDb failed: {e}")
-        if os.path.exists(".tmp"):
-            shutil.rmtree(".tmp")
-        raise
\ No newline at end of file
+        raise
+    finally:
+        # The subflows share the same database connections, reference ids and TMDB fetchers, released once every subflow is done
+        DBClient.close_all()
+        ReferenceIds.clear_all()
+        TMDBFetcher.close_all()
\ No newline at end of file
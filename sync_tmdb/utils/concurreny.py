@@ -1,35 +1,93 @@
-from functools import wraps
-from threading import Semaphore
-from typing import Callable
+import asyncio
 
-def limit_concurrency(max_workers: int) -> Callable[[Callable], Callable]:
-    """Wraps methods to implement concurrency limit
+def endpoint_family(endpoint: str) -> str:
+    """Group an endpoint with the ones that behave the same way
+
+    Numeric path segments are replaced by a placeholder, so that
+    "tv/1399/season/2" and "tv/66732/season/1" share the "tv/{id}/season/{id}"
+    family while "person/287" falls in "person/{id}".
+    """
+
+    return "/".join("{id}" if segment.isdigit() else segment for segment in endpoint.strip("/").split("/"))
 
-    Prefect task concurrency limits use a 30 second delay between each
-    check for an available slot. This is a more performative approach
-    using a threading.Semaphore.
 
-    Prefect must be using a "local" task runner for this to work (the
-    ConcurrentTaskRunner) and not a distributed task runner like Dask
-    or Ray.
+class AIMDLimiter:
+    """Adaptive limit on the number of in-flight requests (AIMD)
 
-    Usage:
-      from prefect import task
+    Every `window` completed requests, the p95 latency and the error rate of
+    the window are compared to their targets: while both stay healthy the
+    limit grows by one (additive increase), otherwise it is multiplied by
+    `backoff` (multiplicative decrease).
 
-      @task
-      @limit_concurrency(max_workers=5)
-      def my_task():
-          pass
+    Must be used from a single asyncio event loop.
     """
 
-    semaphore = Semaphore(max_workers)
+    def __init__(
+        self,
+        initial: int = 10,
+        minimum: int = 1,
+        maximum: int = 64,
+        target_latency: float = 1.5,
+        max_error_rate: float = 0.05,
+        window: int = 50,
+        backoff: float = 0.5,
+    ):
+        self.limit: float = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.max_error_rate = max_error_rate
+        self.window = window
+        self.backoff = backoff
+        self.in_flight = 0
+        self._latencies: list[float] = []
+        self._errors = 0
+        self._condition: asyncio.Condition = None
+
+    @property
+    def condition(self) -> asyncio.Condition:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def acquire(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, latency: float, error: bool = False):
+        async with self.condition:
+            self.in_flight -= 1
+            self._latencies.append(latency)
+            self._errors += int(error)
+            if len(self._latencies) >= self.window:
+                self._adjust()
+            self.condition.notify_all()
+
+    def _adjust(self):
+        latencies = sorted(self._latencies)
+        p95 = latencies[int(0.95 * (len(latencies) - 1))]
+        error_rate = self._errors / len(latencies)
+        if p95 > self.target_latency or error_rate > self.max_error_rate:
+            self.limit = max(self.minimum, self.limit * self.backoff)
+        else:
+            self.limit = min(self.maximum, self.limit + 1)
+        self._latencies = []
+        self._errors = 0
+
+
+class AdaptiveConcurrency:
+    """One AIMDLimiter per endpoint family, created on first use"""
 
-    def pseudo_decorator(func: Callable):
-        @wraps(func)
-        def limited_concurrent_func(*args, **kwargs):
-            with semaphore:
-                return func(*args, **kwargs)
+    def __init__(self, **limiter_options):
+        self.limiter_options = limiter_options
+        self.limiters: dict[str, AIMDLimiter] = {}
 
-        return limited_concurrent_func
+    def get(self, endpoint: str) -> AIMDLimiter:
+        family = endpoint_family(endpoint)
+        if family not in self.limiters:
+            self.limiters[family] = AIMDLimiter(**self.limiter_options)
+        return self.limiters[family]
 
-    return pseudo_decorator
\ No newline at end of file
+    def limits(self) -> dict[str, int]:
+        return {family: int(limiter.limit) for family, limiter in self.limiters.items()}
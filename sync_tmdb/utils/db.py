@@ -1,3 +1,5 @@
+import threading
+
 def insert_into(cursor, table: str, columns: list, temp_table: str, on_conflict: list = None, on_conflict_update: list = None):
 	if on_conflict and on_conflict_update:
 		update_clause = f"DO UPDATE SET {','.join([f'{column}=EXCLUDED.{column}' for column in on_conflict_update])}"
@@ -17,4 +19,24 @@ def insert_into(cursor, table: str, columns: list, temp_table: str, on_conflict:
 	else:
 		query += ";"
 
-	cursor.execute(query)
\ No newline at end of file
+	cursor.execute(query)
+
+_not_null_columns: dict[str, set[str]] = {}
+_not_null_columns_lock = threading.Lock()
+
+def get_not_null_columns(cursor, table: str) -> set[str]:
+	"""
+	Get the NOT NULL columns of a table from the catalog, cached for the rest of the process.
+	"""
+	with _not_null_columns_lock:
+		if table in _not_null_columns:
+			return _not_null_columns[table]
+	cursor.execute("""
+		SELECT attname
+		FROM pg_attribute
+		WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped AND attnotnull
+	""", (table,))
+	result = {row[0] for row in cursor.fetchall()}
+	with _not_null_columns_lock:
+		_not_null_columns[table] = result
+	return result
@@ -0,0 +1,289 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+import uuid
+from ..models.db_client import DBClient
+from ..models.row_buffer import RowBuffer
+from ..models.table_spec import TableSpec
+from .db import insert_into, get_not_null_columns
+from .pg_copy import copy_rows, get_column_types
+
+# Merge modes
+MERGE_REPLACE = "replace"
+MERGE_DIFF = "diff"
+
+# Staging tables older than this (in seconds) were left behind by a killed run
+STAGING_TABLE_MAX_AGE = 24 * 3600
+# The stale staging tables are dropped by the first load of the process
+_stale_staging_tables_dropped = False
+_stale_staging_tables_lock = threading.Lock()
+
+def new_buffers(specs: list[TableSpec]) -> dict[str, RowBuffer]:
+	"""
+	Return an empty buffer for each table, by name.
+	"""
+	return {spec.name: spec.buffer() for spec in specs}
+
+def staging_table_name(table: str, batch_id: str) -> str:
+	"""
+	Return the name of the staging table of a table for a batch, in the schema of the table.
+	"""
+	return f"{table}_stage_{batch_id}"
+
+def new_batch_id() -> str:
+	"""
+	Return a batch id starting with its creation time, so that leftover staging tables can be aged.
+	"""
+	return f"{int(time.time())}_{uuid.uuid4().hex[:8]}"
+
+def drop_stale_staging_tables(db_client: DBClient, max_age: float = STAGING_TABLE_MAX_AGE) -> list[str]:
+	"""
+	Drop the staging tables left behind by a killed or out of memory run,
+	which never reached the cleanup of `load_tables`.
+
+	Args:
+		db_client (DBClient): The database client.
+		max_age (float, optionnel): The age in seconds from which a staging table is stale,
+			the ones of the batches still loading are younger. Default: one day.
+
+	Returns:
+		list[str]: The dropped tables.
+	"""
+	with db_client.connection() as conn:
+		try:
+			with conn.cursor() as cursor:
+				cursor.execute(r"""
+					SELECT schemaname, tablename, substring(tablename from '_stage_(\d{10})_[0-9a-f]{8}$')::bigint
+					FROM pg_tables
+					WHERE tablename ~ '_stage_\d{10}_[0-9a-f]{8}$';
+				""")
+				stale = [f'"{schema}"."{table}"' for schema, table, created_at in cursor.fetchall() if created_at < time.time() - max_age]
+				if stale:
+					cursor.execute(f"DROP TABLE IF EXISTS {', '.join(stale)};")
+			conn.commit()
+			return stale
+		except Exception as e:
+			conn.rollback()
+			raise ValueError(f"Failed to drop stale staging tables: {e}")
+
+def _copy_to_staging(db_client: DBClient, spec: TableSpec, staging_table: str, rows: RowBuffer):
+	conn = db_client.get_connection()
+	try:
+		with conn.cursor() as cursor:
+			copy_rows(cursor, staging_table, spec.columns, rows.rows(), like=spec.table)
+		conn.commit()
+	except Exception as e:
+		conn.rollback()
+		raise ValueError(f"Failed to copy rows into {staging_table}: {e}")
+	finally:
+		db_client.return_connection(conn)
+
+def _match(cursor, spec: TableSpec, left: str = "t", right: str = "s") -> str:
+	"""
+	Return the condition matching the rows of two aliases on the conflict columns of the table,
+	NULL-safe for the nullable columns.
+	"""
+	not_null = get_not_null_columns(cursor, spec.table)
+	return " AND ".join(
+		f"{left}.{column} = {right}.{column}" if column.strip('"') in not_null
+		else f"{left}.{column} IS NOT DISTINCT FROM {right}.{column}"
+		for column in spec.on_conflict
+	)
+
+def _delete_missing(cursor, spec: TableSpec, staging_tables: dict[str, str]):
+	"""
+	Delete the rows of the loaded parents that are not in the staged rows.
+	"""
+	cursor.execute(f"""
+		DELETE FROM {spec.table} AS t
+		WHERE t.{spec.parent_key} IN (
+			SELECT id FROM {staging_tables[spec.parent]}
+		)
+		AND NOT EXISTS (
+			SELECT 1 FROM {staging_tables[spec.name]} AS s
+			WHERE {_match(cursor, spec)}
+		);
+	""")
+
+def _update_changed(cursor, spec: TableSpec, staging_tables: dict[str, str]):
+	"""
+	Update the rows whose values differ from the staged rows.
+	"""
+	if not spec.on_conflict_update:
+		return
+	types = get_column_types(cursor, spec.table, spec.on_conflict_update)
+	# json has no equality operator, its values are compared as text
+	values = [f"{column}::text" if typname == "json" else column for column, (typname, _) in zip(spec.on_conflict_update, types)]
+	cursor.execute(f"""
+		UPDATE {spec.table} AS t
+		SET {','.join(f'{column}=s.{column}' for column in spec.on_conflict_update)}
+		FROM {staging_tables[spec.name]} AS s
+		WHERE {_match(cursor, spec)}
+		AND ({','.join(f't.{value}' for value in values)}) IS DISTINCT FROM ({','.join(f's.{value}' for value in values)});
+	""")
+
+def _insert_new(cursor, spec: TableSpec, staging_tables: dict[str, str]):
+	"""
+	Insert the staged rows that are not in the table yet.
+	"""
+	cursor.execute(f"""
+		INSERT INTO {spec.table} ({','.join(spec.columns)})
+		SELECT {','.join(f's.{column}' for column in spec.columns)}
+		FROM {staging_tables[spec.name]} AS s
+		WHERE NOT EXISTS (
+			SELECT 1 FROM {spec.table} AS t
+			WHERE {_match(cursor, spec)}
+		)
+		ON CONFLICT DO NOTHING;
+	""")
+
+def _filter_references(cursor, specs: list[TableSpec], staging_tables: dict[str, str]):
+	"""
+	Drop the staged rows referencing missing ids, and set the missing optional references to NULL.
+
+	A reference to a table loaded in the same batch (e.g. the roles referencing the credits)
+	is checked against its staging table, which has already been filtered.
+	"""
+	loaded = {spec.table: staging_tables[spec.name] for spec in specs}
+	for spec in specs:
+		for column, table in spec.references.items():
+			cursor.execute(f"""
+				DELETE FROM {staging_tables[spec.name]} AS s
+				WHERE NOT EXISTS (
+					SELECT 1 FROM {loaded.get(table, table)} AS r
+					WHERE r.id = s.{column}
+				);
+			""")
+		for column, table in spec.optional_references.items():
+			cursor.execute(f"""
+				UPDATE {staging_tables[spec.name]} AS s
+				SET {column} = NULL
+				WHERE s.{column} IS NOT NULL
+				AND NOT EXISTS (
+					SELECT 1 FROM {loaded.get(table, table)} AS r
+					WHERE r.id = s.{column}
+				);
+			""")
+
+def merge_tables(cursor, specs: list[TableSpec], rows: dict[str, RowBuffer], staging_tables: dict[str, str], mode: str = MERGE_DIFF, filter_references: bool = False):
+	"""
+	Merge the staged rows of every table into the tables, in the transaction of the cursor.
+
+	The phases are run for every table before moving on to the next phase:
+	pre-delete and hooks, insert, prune. See `TableSpec` for the meaning of each field.
+
+	In "replace" mode, the rows of the loaded parents are deleted and inserted again,
+	and the upserted rows are all updated. In "diff" mode, only the rows missing from
+	the batch are deleted, only the rows whose values differ are updated, and only the
+	new rows are inserted, so unchanged rows are left untouched (no dead tuple, no WAL).
+
+	Args:
+		cursor: The cursor of the merge transaction.
+		specs (list[TableSpec]): The tables, in load order.
+		rows (dict[str, RowBuffer]): The rows of each table, by name.
+		staging_tables (dict[str, str]): The staging table of each table, by name.
+		mode (str, optionnel): "replace" or "diff". Default: "diff".
+		filter_references (bool, optionnel): Whether to filter the references of the staged rows
+			(see `TableSpec`), when the mappers do not. Default: False.
+	"""
+	if mode not in (MERGE_REPLACE, MERGE_DIFF):
+		raise ValueError(f"Invalid merge mode: {mode}")
+
+	if filter_references:
+		_filter_references(cursor, specs, staging_tables)
+
+	# Pre-delete
+	for spec in specs:
+		if spec.delete == TableSpec.REPLACE:
+			if mode == MERGE_DIFF:
+				_delete_missing(cursor, spec, staging_tables)
+			else:
+				cursor.execute(f"""
+					DELETE FROM {spec.table}
+					WHERE {spec.parent_key} IN (
+						SELECT id FROM {staging_tables[spec.parent]}
+					);
+				""")
+		if spec.before_insert is not None:
+			spec.before_insert(cursor, staging_tables)
+
+	# Insert
+	for spec in specs:
+		if len(rows[spec.name]) > 0:
+			if mode == MERGE_DIFF:
+				_update_changed(cursor, spec, staging_tables)
+				_insert_new(cursor, spec, staging_tables)
+			else:
+				insert_into(
+					cursor=cursor,
+					table=spec.table,
+					temp_table=staging_tables[spec.name],
+					columns=spec.columns,
+					on_conflict=spec.on_conflict if spec.upsert else None,
+					on_conflict_update=spec.on_conflict_update if spec.upsert else None,
+				)
+
+	# Prune
+	for spec in specs:
+		if spec.delete == TableSpec.PRUNE:
+			_delete_missing(cursor, spec, staging_tables)
+
+def load_tables(db_client: DBClient, specs: list[TableSpec], rows: dict[str, RowBuffer], parallelism: int = 4, mode: str = MERGE_DIFF, filter_references: bool = False):
+	"""
+	Load the buffered rows of every table.
+
+	The rows are first copied into UNLOGGED staging tables keyed by a batch id,
+	in parallel over `parallelism` connections of the pool, so that the server
+	parses several tables at once. The staged rows are then merged in a single
+	short transaction, and the staging tables are dropped (or later by
+	`drop_stale_staging_tables` if the process is killed).
+
+	Args:
+		db_client (DBClient): The client whose pool provides the connections.
+		specs (list[TableSpec]): The tables, in load order.
+		rows (dict[str, RowBuffer]): The rows of each table, by name.
+		parallelism (int, optionnel): The number of tables copied at once. Default: 4.
+		mode (str, optionnel): The merge mode, see `merge_tables`. Default: "diff".
+		filter_references (bool, optionnel): Whether the merge filters the foreign keys, see `merge_tables`. Default: False.
+	"""
+	# Nothing to load, e.g. every entity of the batch is unchanged
+	if all(len(rows[spec.name]) == 0 for spec in specs):
+		return
+
+	global _stale_staging_tables_dropped
+	with _stale_staging_tables_lock:
+		if not _stale_staging_tables_dropped:
+			drop_stale_staging_tables(db_client)
+			_stale_staging_tables_dropped = True
+
+	batch_id = new_batch_id()
+	staging_tables = {spec.name: staging_table_name(spec.table, batch_id) for spec in specs}
+
+	with db_client.connection() as conn:
+		with conn.cursor() as cursor:
+			cursor.execute("".join(f"CREATE UNLOGGED TABLE {staging_tables[spec.name]} (LIKE {spec.table} INCLUDING DEFAULTS);" for spec in specs))
+		conn.commit()
+	try:
+		# Stage
+		with ThreadPoolExecutor(max_workers=max(1, parallelism), thread_name_prefix="load-copy") as executor:
+			futures = [
+				executor.submit(_copy_to_staging, db_client, spec, staging_tables[spec.name], rows[spec.name])
+				for spec in specs if len(rows[spec.name]) > 0
+			]
+			for future in futures:
+				future.result()
+
+		# Merge
+		with db_client.connection() as conn:
+			with conn.cursor() as cursor:
+				try:
+					merge_tables(cursor, specs, rows, staging_tables, mode=mode, filter_references=filter_references)
+					conn.commit()
+				except Exception:
+					conn.rollback()
+					raise
+	finally:
+		with db_client.connection() as conn:
+			with conn.cursor() as cursor:
+				cursor.execute(f"DROP TABLE IF EXISTS {', '.join(staging_tables.values())};")
+			conn.commit()
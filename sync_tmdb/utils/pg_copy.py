@@ -0,0 +1,267 @@
+from datetime import date, datetime
+from itertools import islice
+import struct
+import threading
+from typing import Callable, Iterable, Iterator
+import numpy as np
+
+# Characters that must be escaped in the text format of COPY
+_COPY_ESCAPES = str.maketrans({
+	"\\": "\\\\",
+	"\n": "\\n",
+	"\r": "\\r",
+	"\t": "\\t",
+})
+
+def format_copy_value(value) -> str:
+	"""
+	Format a value for the text format of COPY.
+
+	None, NaN and empty strings are written as \\N (NULL, like empty CSV
+	fields), booleans as t/f, strings are escaped and every other
+	value is written with str().
+	"""
+	if value is None:
+		return "\\N"
+	if isinstance(value, str):
+		return value.translate(_COPY_ESCAPES) if value else "\\N"
+	if isinstance(value, bool):
+		return "t" if value else "f"
+	if isinstance(value, float) and value != value:
+		return "\\N"
+	return str(value)
+
+# ---------------------------------------------------------------------------- #
+#                                 Binary format                                #
+# ---------------------------------------------------------------------------- #
+
+_BINARY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+_BINARY_TRAILER = struct.pack("!h", -1)
+_BINARY_NULL = struct.pack("!i", -1)
+_FIELD_COUNT = struct.Struct("!h")
+_FIELD_LENGTH = struct.Struct("!i")
+_POSTGRES_EPOCH = date(2000, 1, 1).toordinal()
+
+def _fixed_encoder(format: str, cast: Callable) -> Callable:
+	packer = struct.Struct(f"!i{format}")
+	size = packer.size - 4
+	return lambda value: packer.pack(size, cast(value))
+
+def _encode_text(value) -> bytes:
+	data = (value if isinstance(value, str) else str(value)).encode("utf-8")
+	return _FIELD_LENGTH.pack(len(data)) + data
+
+def _to_date(value) -> int:
+	if isinstance(value, str):
+		value = date.fromisoformat(value[:10])
+	elif isinstance(value, datetime):
+		value = value.date()
+	return value.toordinal() - _POSTGRES_EPOCH
+
+# Binary encoders by type name, each one returns the length-prefixed field
+BINARY_ENCODERS: dict[str, Callable] = {
+	"int2": _fixed_encoder("h", int),
+	"int4": _fixed_encoder("i", int),
+	"int8": _fixed_encoder("q", int),
+	"float4": _fixed_encoder("f", float),
+	"float8": _fixed_encoder("d", float),
+	"bool": _fixed_encoder("?", bool),
+	"date": _fixed_encoder("i", _to_date),
+	"text": _encode_text,
+	"varchar": _encode_text,
+	"bpchar": _encode_text,
+}
+
+# Numpy dtypes of the binary format, by type name
+BINARY_DTYPES: dict[str, str] = {
+	"int2": ">i2",
+	"int4": ">i4",
+	"int8": ">i8",
+	"float4": ">f4",
+	"float8": ">f8",
+}
+
+def binary_encoders(types: list[tuple[str, str]]) -> list[Callable]:
+	"""
+	Get the binary encoder of each column.
+
+	Args:
+		types (list[tuple[str, str]]): The (typname, typtype) of each column.
+
+	Returns:
+		list[Callable]: The encoders, or None if a column has no binary encoder (e.g. numeric, timestamptz, arrays).
+	"""
+	encoders = []
+	for typname, typtype in types:
+		if typtype == "e":
+			# The binary representation of an enum is its label
+			encoders.append(_encode_text)
+		elif typname in BINARY_ENCODERS:
+			encoders.append(BINARY_ENCODERS[typname])
+		else:
+			return None
+	return encoders
+
+def encode_binary_row(encoders: list[Callable], row: tuple) -> bytes:
+	"""
+	Encode a row in the binary format of COPY.
+	None, NaN and empty strings are NULL, as in the text format.
+	"""
+	fields = [_FIELD_COUNT.pack(len(row))]
+	for encoder, value in zip(encoders, row):
+		if value is None or value == "" or (isinstance(value, float) and value != value):
+			fields.append(_BINARY_NULL)
+		else:
+			fields.append(encoder(value))
+	return b"".join(fields)
+
+def encode_binary_arrays(arrays: list[np.ndarray], types: list[str]) -> bytes:
+	"""
+	Encode numeric columns without NULL in the binary format of COPY (header
+	and trailer included), in a single vectorized pass.
+
+	Args:
+		arrays (list[np.ndarray]): The values of each column, all of the same length.
+		types (list[str]): The type name of each column (int2, int4, int8, float4 or float8).
+	"""
+	fields = [("count", ">i2")]
+	for i, typname in enumerate(types):
+		fields += [(f"length_{i}", ">i4"), (f"value_{i}", BINARY_DTYPES[typname])]
+	records = np.empty(len(arrays[0]), dtype=np.dtype(fields))
+	records["count"] = len(arrays)
+	for i, (array, typname) in enumerate(zip(arrays, types)):
+		records[f"length_{i}"] = np.dtype(BINARY_DTYPES[typname]).itemsize
+		records[f"value_{i}"] = array
+	return _BINARY_HEADER + records.tobytes() + _BINARY_TRAILER
+
+# ---------------------------------------------------------------------------- #
+
+class CopyStream:
+	"""
+	Read-only file-like object over the chunks of a COPY (text lines or binary rows).
+
+	Chunks are produced lazily as psycopg2 reads the stream, so the data is
+	never written to disk nor fully rendered in memory.
+	"""
+	def __init__(self, chunks: Iterable[str | bytes], binary: bool = False, batch_size: int = 1000):
+		"""
+		Args:
+			chunks (Iterable[str | bytes]): The chunks to stream, str for the text format and bytes for the binary format.
+			binary (bool, optionnel): Whether the chunks are bytes. Default: False.
+			batch_size (int, optionnel): The number of chunks produced at once. Default: 1000.
+		"""
+		self.chunks: Iterator = iter(chunks)
+		self.batch_size = batch_size
+		self.empty = b"" if binary else ""
+		self.newline = b"\n" if binary else "\n"
+		self.buffer = self.empty
+
+	def _fill(self) -> bool:
+		chunks = list(islice(self.chunks, self.batch_size))
+		if not chunks:
+			return False
+		self.buffer += self.empty.join(chunks)
+		return True
+
+	def read(self, size: int = -1) -> str | bytes:
+		while (size < 0 or len(self.buffer) < size) and self._fill():
+			pass
+		if size < 0 or size >= len(self.buffer):
+			data, self.buffer = self.buffer, self.empty
+		else:
+			data, self.buffer = self.buffer[:size], self.buffer[size:]
+		return data
+
+	def readline(self, size: int = -1) -> str | bytes:
+		while self.newline not in self.buffer and self._fill():
+			pass
+		end = self.buffer.find(self.newline) + 1 or len(self.buffer)
+		data, self.buffer = self.buffer[:end], self.buffer[end:]
+		return data
+
+# ---------------------------------------------------------------------------- #
+
+_column_types: dict[tuple, list[tuple[str, str]]] = {}
+_column_types_lock = threading.Lock()
+
+def get_column_types(cursor, table: str, columns: list, cache: bool = True) -> list[tuple[str, str]]:
+	"""
+	Get the type of the given columns of a table from the catalog.
+
+	Args:
+		cursor: The cursor used to query the catalog.
+		table (str): The table.
+		columns (list): The columns, possibly quoted (e.g. '"order"').
+		cache (bool, optionnel): Whether to keep the result for the rest of the process. Default: True.
+
+	Returns:
+		list[tuple[str, str]]: The (typname, typtype) of each column.
+	"""
+	key = (table, tuple(columns))
+	if cache:
+		with _column_types_lock:
+			if key in _column_types:
+				return _column_types[key]
+
+	cursor.execute("""
+		SELECT a.attname, t.typname, t.typtype
+		FROM pg_attribute a
+		JOIN pg_type t ON t.oid = a.atttypid
+		WHERE a.attrelid = %s::regclass AND a.attnum > 0 AND NOT a.attisdropped
+	""", (table,))
+	types = {name: (typname, typtype) for name, typname, typtype in cursor.fetchall()}
+	missing = [column for column in columns if column.strip('"') not in types]
+	if missing:
+		raise ValueError(f"Columns {missing} not found in {table}")
+	result = [types[column.strip('"')] for column in columns]
+
+	if cache:
+		with _column_types_lock:
+			_column_types[key] = result
+	return result
+
+def copy_rows(cursor, table: str, columns: list, rows: Iterable[tuple], like: str = None, size: int = 1 << 16):
+	"""
+	Stream rows into a table with COPY ... FROM STDIN.
+
+	The binary format is used when every column has a binary encoder (numbers,
+	booleans, dates, text and enums), the text format otherwise.
+
+	Args:
+		cursor: The cursor used to run the COPY.
+		table (str): The table to copy the rows into.
+		columns (list): The columns of the rows, in order.
+		rows (Iterable[tuple]): The rows to copy.
+		like (str, optionnel): The permanent table the temp table was created LIKE. Its column
+			types are read once per process instead of once per COPY. Default: None.
+		size (int, optionnel): The size of the chunks sent to the server. Default: 64 KiB.
+	"""
+	encoders = binary_encoders(get_column_types(cursor, like or table, columns, cache=like is not None))
+	if encoders is None:
+		lines = ("\t".join(map(format_copy_value, row)) + "\n" for row in rows)
+		cursor.copy_expert(f"COPY {table} ({','.join(columns)}) FROM STDIN", CopyStream(lines), size=size)
+		return
+
+	def chunks():
+		yield _BINARY_HEADER
+		for row in rows:
+			yield encode_binary_row(encoders, row)
+		yield _BINARY_TRAILER
+
+	cursor.copy_expert(f"COPY {table} ({','.join(columns)}) FROM STDIN WITH (FORMAT binary)", CopyStream(chunks(), binary=True), size=size)
+
+def copy_arrays(cursor, table: str, columns: list, arrays: list[np.ndarray], types: list[str], size: int = 1 << 16):
+	"""
+	Copy numeric columns without NULL into a table, encoded with numpy in the binary format.
+
+	Args:
+		cursor: The cursor used to run the COPY.
+		table (str): The table to copy the rows into.
+		columns (list): The columns, in order.
+		arrays (list[np.ndarray]): The values of each column.
+		types (list[str]): The type name of each column (int2, int4, int8, float4 or float8).
+		size (int, optionnel): The size of the chunks sent to the server. Default: 64 KiB.
+	"""
+	data = encode_binary_arrays(arrays, types)
+	chunks = (data[i:i + size] for i in range(0, len(data), size))
+	cursor.copy_expert(f"COPY {table} ({','.join(columns)}) FROM STDIN WITH (FORMAT binary)", CopyStream(chunks, binary=True, batch_size=1), size=size)
@@ -0,0 +1,95 @@
+import contextvars
+import queue
+import threading
+from typing import Any, Callable, Iterable, Iterator
+
+_DONE = object()
+
+class Pipeline:
+	"""
+	Runs items through a sequence of stages, each stage in its own thread.
+
+	Stages are connected with bounded queues, so while a stage works on item N
+	the previous one already works on item N+1 and at most `maxsize` results
+	wait between two stages. Each thread runs in a copy of the caller context,
+	so Prefect loggers and task submissions keep working inside the stages.
+	The first error raised by a stage stops the pipeline and is re-raised.
+	"""
+	def __init__(self, stages: list[Callable[[Any], Any]], maxsize: int = 1):
+		if not stages:
+			raise ValueError("A pipeline needs at least one stage")
+		self.stages = stages
+		self.maxsize = maxsize
+
+	def run(self, items: Iterable) -> Iterator[Any]:
+		"""
+		Feed the items to the first stage and yield the results of the last stage, in order.
+		"""
+		stop = threading.Event()
+		errors: list[BaseException] = []
+		queues = [queue.Queue(maxsize=self.maxsize) for _ in self.stages] + [queue.Queue()]
+
+		def put(q: queue.Queue, item: Any):
+			while not stop.is_set():
+				try:
+					q.put(item, timeout=0.1)
+					return
+				except queue.Full:
+					continue
+
+		def get(q: queue.Queue) -> Any:
+			while True:
+				try:
+					return q.get(timeout=0.1)
+				except queue.Empty:
+					if stop.is_set():
+						return _DONE
+
+		def feed():
+			try:
+				for item in items:
+					if stop.is_set():
+						break
+					put(queues[0], item)
+			except BaseException as e:
+				errors.append(e)
+				stop.set()
+			finally:
+				put(queues[0], _DONE)
+
+		def work(stage: Callable, inbox: queue.Queue, outbox: queue.Queue):
+			try:
+				while True:
+					item = get(inbox)
+					if item is _DONE:
+						break
+					put(outbox, stage(item))
+			except BaseException as e:
+				errors.append(e)
+				stop.set()
+			finally:
+				put(outbox, _DONE)
+
+		threads = [threading.Thread(target=contextvars.copy_context().run, args=(feed,), name="pipeline-feed", daemon=True)]
+		for i, stage in enumerate(self.stages):
+			threads.append(threading.Thread(
+				target=contextvars.copy_context().run,
+				args=(work, stage, queues[i], queues[i + 1]),
+				name=f"pipeline-{getattr(stage, '__name__', i)}",
+				daemon=True,
+			))
+		for thread in threads:
+			thread.start()
+
+		try:
+			while True:
+				result = get(queues[-1])
+				if result is _DONE:
+					break
+				yield result
+		finally:
+			stop.set()
+			for thread in threads:
+				thread.join()
+		if errors:
+			raise errors[0]
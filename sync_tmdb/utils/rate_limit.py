@@ -0,0 +1,143 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+class TokenBucket:
+	"""
+	Token bucket for a single API key.
+
+	The bucket refills at `rate` tokens per second up to `capacity`. When the
+	API answers 429 the rate is halved and the bucket is blocked until the
+	Retry-After delay has elapsed; successful requests slowly bring the rate
+	back to its configured value.
+	"""
+	def __init__(self, rate: float, capacity: float, min_rate_factor: float = 0.1, recovery_factor: float = 0.02):
+		self.base_rate = rate
+		self.rate = rate
+		self.capacity = capacity
+		self.tokens = capacity
+		self.min_rate = rate * min_rate_factor
+		self.recovery_step = rate * recovery_factor
+		self.updated_at = time.monotonic()
+		self.blocked_until = 0.0
+
+		# Stats
+		self.requests = 0
+		self.throttled = 0
+
+	def _refill(self, now: float):
+		self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+		self.updated_at = now
+
+	def headroom(self, now: float) -> float:
+		"""Number of tokens available right now (negative while blocked)."""
+		self._refill(now)
+		if now < self.blocked_until:
+			return -(self.blocked_until - now) * self.rate
+		return self.tokens
+
+	def wait_time(self, now: float) -> float:
+		"""Seconds to wait before a token is available."""
+		self._refill(now)
+		wait = max(0.0, self.blocked_until - now)
+		if self.tokens < 1:
+			wait = max(wait, (1 - self.tokens) / self.rate)
+		return wait
+
+	def consume(self):
+		self.tokens -= 1
+		self.requests += 1
+
+	def on_success(self):
+		if self.rate < self.base_rate:
+			self.rate = min(self.base_rate, self.rate + self.recovery_step)
+
+	def on_throttled(self, now: float, retry_after: float = None):
+		self.throttled += 1
+		self.rate = max(self.min_rate, self.rate / 2)
+		self.tokens = 0
+		self.blocked_until = max(self.blocked_until, now + (retry_after if retry_after is not None else 1 / self.rate))
+
+	def usage(self, now: float) -> dict:
+		self._refill(now)
+		return {
+			"requests": self.requests,
+			"throttled": self.throttled,
+			"rate": round(self.rate, 2),
+			"base_rate": self.base_rate,
+			"quota_used": round(1 - max(self.tokens, 0) / self.capacity, 3),
+			"blocked_for": round(max(0.0, self.blocked_until - now), 2),
+		}
+
+class APIKeyRateLimiter:
+	"""
+	Rate limiter shared by every request made with a set of API keys.
+
+	Keeps one token bucket per key and routes each request to the key with
+	the most headroom, so the keys are used at the highest throughput they
+	allow without bursts of 429.
+	"""
+	def __init__(self, api_keys: list, requests_per_second: float = 40, burst: float = None):
+		if not api_keys:
+			raise ValueError("No API keys found")
+		self.buckets: dict[str, TokenBucket] = {
+			api_key: TokenBucket(rate=requests_per_second, capacity=burst or requests_per_second)
+			for api_key in api_keys
+		}
+		self._lock = threading.Lock()
+
+	def _reserve(self) -> tuple[str, float]:
+		with self._lock:
+			now = time.monotonic()
+			api_key, bucket = max(self.buckets.items(), key=lambda item: item[1].headroom(now))
+			wait = bucket.wait_time(now)
+			if wait <= 0:
+				bucket.consume()
+				return api_key, 0.0
+			return None, min(b.wait_time(now) for b in self.buckets.values())
+
+	async def acquire(self) -> str:
+		"""
+		Wait for a token and return the API key to use for the request.
+		"""
+		while True:
+			api_key, wait = self._reserve()
+			if api_key is not None:
+				return api_key
+			await asyncio.sleep(wait)
+
+	def release(self, api_key: str, status_code: int, retry_after: float = None):
+		"""
+		Report the outcome of a request made with `api_key`.
+		"""
+		with self._lock:
+			bucket = self.buckets[api_key]
+			if status_code == 429:
+				bucket.on_throttled(now=time.monotonic(), retry_after=retry_after)
+			elif status_code < 500:
+				bucket.on_success()
+
+	def usage(self) -> dict[str, dict]:
+		"""
+		Return the quota usage of each key (keys are masked).
+		"""
+		with self._lock:
+			now = time.monotonic()
+			return {f"{api_key[:4]}…{api_key[-4:]}": bucket.usage(now) for api_key, bucket in self.buckets.items()}
+
+def parse_retry_after(value: str) -> float:
+	"""
+	Parse a Retry-After header (delay in seconds or HTTP date) into seconds.
+	"""
+	if not value:
+		return None
+	try:
+		return max(0.0, float(value))
+	except ValueError:
+		pass
+	try:
+		return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+	except (TypeError, ValueError):
+		return None
@@ -0,0 +1,124 @@
+import random
+from typing import Callable, Iterable
+from more_itertools import chunked
+from .concurreny import endpoint_family
+from .pipeline import Pipeline
+
+class CircuitOpenError(Exception):
+	"""Raised when a request is refused because its endpoint family is failing."""
+
+class RetryPolicy:
+	"""
+	Exponential backoff with full jitter, bounded by a deadline per request.
+
+	The n-th retry waits a random delay between 0 and min(max_delay, base_delay * 2^n),
+	so that clients failing at the same time do not retry at the same time.
+	"""
+	def __init__(self, max_attempts: int = 5, base_delay: float = 0.5, max_delay: float = 30.0, deadline: float = 120.0):
+		self.max_attempts = max_attempts
+		self.base_delay = base_delay
+		self.max_delay = max_delay
+		self.deadline = deadline
+
+	def backoff(self, attempt: int) -> float:
+		"""Delay to wait before the given retry (1 for the first retry)."""
+		return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+class CircuitBreaker:
+	"""
+	Circuit breaker for a single endpoint family.
+
+	After `failure_threshold` consecutive failures the circuit opens and
+	requests are held back for `reset_timeout` seconds. A single probe request
+	is then let through: if it succeeds the circuit closes, otherwise it opens
+	again.
+
+	Must be used from a single asyncio event loop.
+	"""
+	def __init__(self, failure_threshold: int = 20, reset_timeout: float = 30.0):
+		self.failure_threshold = failure_threshold
+		self.reset_timeout = reset_timeout
+		self.failures = 0
+		self.opened_at: float = None
+		self.probe_started_at: float = None
+		self.trips = 0
+
+	@property
+	def state(self) -> str:
+		if self.opened_at is None:
+			return "closed"
+		return "half-open" if self.probe_started_at is not None else "open"
+
+	def retry_after(self, now: float) -> float:
+		"""
+		Return 0 when a request may be sent now, otherwise the number of seconds to wait.
+		"""
+		if self.opened_at is None:
+			return 0.0
+		remaining = self.opened_at + self.reset_timeout - now
+		if remaining > 0:
+			return remaining
+		# Only one probe at a time, a probe that never reported back is replaced
+		if self.probe_started_at is None or now - self.probe_started_at > self.reset_timeout:
+			self.probe_started_at = now
+			return 0.0
+		return min(1.0, self.reset_timeout)
+
+	def record_success(self):
+		self.failures = 0
+		self.opened_at = None
+		self.probe_started_at = None
+
+	def record_failure(self, now: float):
+		self.failures += 1
+		if self.probe_started_at is not None or (self.opened_at is None and self.failures >= self.failure_threshold):
+			self.opened_at = now
+			self.probe_started_at = None
+			self.trips += 1
+
+class CircuitBreakers:
+	"""One CircuitBreaker per endpoint family, created on first use."""
+	def __init__(self, **breaker_options):
+		self.breaker_options = breaker_options
+		self.breakers: dict[str, CircuitBreaker] = {}
+
+	def get(self, endpoint: str) -> CircuitBreaker:
+		family = endpoint_family(endpoint)
+		if family not in self.breakers:
+			self.breakers[family] = CircuitBreaker(**self.breaker_options)
+		return self.breakers[family]
+
+	def states(self) -> dict[str, dict]:
+		return {family: {"state": breaker.state, "trips": breaker.trips} for family, breaker in self.breakers.items()}
+
+def process_with_retry_pass(stages: list[Callable], ids: Iterable, chunk_size: int, logger, name: str) -> set:
+	"""
+	Process ids chunk by chunk through a pipeline of stages, then give the ids
+	that failed one more chance in an end-of-run retry pass.
+
+	Args:
+		stages (list[Callable]): The stages of the pipeline. The first one receives a
+			chunk of ids and the last one returns the ids of the chunk that failed.
+		ids (Iterable): The ids to process.
+		chunk_size (int): The number of ids per chunk.
+		logger: The logger used to report the failures.
+		name (str): The name of the entities in the logs (e.g. "movies").
+
+	Returns:
+		set: The ids that still failed after the retry pass.
+	"""
+	failed: set = set()
+	for chunk_failed in Pipeline(stages).run(chunked(ids, chunk_size)):
+		failed |= chunk_failed
+
+	if failed:
+		logger.warning(f"Retrying {len(failed)} {name} that failed...")
+		retried = failed
+		failed = set()
+		for chunk_failed in Pipeline(stages).run(chunked(retried, chunk_size)):
+			failed |= chunk_failed
+		if failed:
+			logger.error(f"Failed to get {len(failed)} {name} after the retry pass: {sorted(failed)[:100]}")
+		else:
+			logger.info(f"Successfully retried {len(retried)} {name}")
+	return failed
@@ -0,0 +1,75 @@
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import contextvars
+from typing import Callable
+
+def run_dag(jobs: dict[str, Callable[[], None]], dependencies: dict[str, list[str]], weights: dict[str, int] = None, budget: int = 1, logger = None):
+	"""
+	Run jobs concurrently, each one once all of its dependencies have succeeded.
+
+	Each job has a weight (default: 1) and the running jobs never weigh more than
+	`budget` in total, a job heavier than the budget running alone. With a budget
+	of 1, the jobs run one after another in the order of `jobs`. The jobs are
+	started in the order of `jobs` among the ready ones, in threads running a copy
+	of the context of the caller (e.g. the Prefect flow run).
+
+	When a job fails, the jobs depending on it are skipped and the others keep
+	running, the failures are raised once every job is done.
+
+	Args:
+		jobs (dict[str, Callable[[], None]]): The jobs to run, by name, in priority order.
+		dependencies (dict[str, list[str]]): The names of the jobs each job depends on.
+			Dependencies that are not in `jobs` (e.g. disabled) are ignored.
+		weights (dict[str, int], optionnel): The weight of each job. Default: None.
+		budget (int, optionnel): The total weight of the jobs running at once. Default: 1.
+		logger (optionnel): The logger reporting the progress. Default: None.
+	"""
+	weights = weights or {}
+	budget = max(1, budget)
+	waiting_for = {name: {dependency for dependency in dependencies.get(name, []) if dependency in jobs} for name in jobs}
+	weight = {name: min(max(1, weights.get(name, 1)), budget) for name in jobs}
+	pending = list(jobs)
+	running: dict[Future, str] = {}
+	errors: dict[str, Exception] = {}
+	available = budget
+
+	with ThreadPoolExecutor(max_workers=budget, thread_name_prefix="subflow") as executor:
+		while pending or running:
+			# Skip the jobs depending on a failed or skipped one
+			for name in [name for name in pending if waiting_for[name] & errors.keys()]:
+				pending.remove(name)
+				errors[name] = ValueError(f"Skipped, {', '.join(sorted(waiting_for[name] & errors.keys()))} failed")
+				if logger:
+					logger.warning(f"Skipping {name}: {errors[name]}")
+
+			# Start the ready jobs that fit in the remaining budget
+			for name in list(pending):
+				if not waiting_for[name] and weight[name] <= available:
+					pending.remove(name)
+					available -= weight[name]
+					if logger:
+						logger.info(f"Starting {name}...")
+					# A context can only be entered by one thread at a time, each job runs its own copy
+					running[executor.submit(contextvars.copy_context().run, jobs[name])] = name
+
+			if not running:
+				if pending:
+					raise ValueError(f"Circular dependencies between {', '.join(pending)}")
+				break
+
+			done, _ = wait(running, return_when=FIRST_COMPLETED)
+			for future in done:
+				name = running.pop(future)
+				available += weight[name]
+				try:
+					future.result()
+					if logger:
+						logger.info(f"Finished {name}.")
+					for dependencies_left in waiting_for.values():
+						dependencies_left.discard(name)
+				except Exception as e:
+					errors[name] = e
+					if logger:
+						logger.error(f"Failed {name}: {e}")
+
+	if errors:
+		raise ValueError(f"Failed to run {', '.join(errors)}: {'; '.join(f'{name}: {e}' for name, e in errors.items())}")